@@ -46,10 +46,24 @@
 
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-get_ipython().run_line_magic('matplotlib', 'inline')
-import seaborn as sns
-sns.set()
+# matplotlib and seaborn are loaded by the first cell that draws
+from tmdb_tools.plots import notebook_pyplot
+from tmdb_tools.genres import genre_year_counts, most_frequent_by_year, genre_distribution
+from tmdb_tools.multivalue import build_indexes
+from tmdb_tools.loader import load_movies
+from tmdb_tools.cleaning import ZERO_RULES, clean, rule_counts
+from tmdb_tools.cast import CastTable
+from tmdb_tools.compact import compact, memory_report
+from tmdb_tools.store import MovieStore, write_store
+from tmdb_tools.directors import DirectorTable
+from tmdb_tools.fences import iqr_fences, split_outliers, fence_error_report
+from tmdb_tools.filters import Between, select
+from tmdb_tools.overlap import contingency, conditional
+from tmdb_tools.stats import correlations, grouped
+from tmdb_tools.topk import Leaderboard
+from tmdb_tools.trends import GenreTrends
+# run with TMDB_PROFILE=1 to time every stage below (see the last cell)
+from tmdb_tools import profiling
 
 
 # <a id='wrangle'></a>
@@ -60,7 +74,8 @@ sns.set()
 # In[2]:
 
 
-dataset = pd.read_csv('tmdb-movies.csv');
+# a few rows are enough to look at the features
+dataset = pd.read_csv('tmdb-movies.csv', nrows=5);
 dataset.head()
 
 
@@ -90,7 +105,11 @@ dataset.columns
 
 
 list_drop = ['id', 'imdb_id', 'budget', 'revenue', 'homepage', 'tagline', 'overview', 'vote_count', 'vote_average', 'keywords']
-dataset.drop(list_drop, axis=1, inplace=True)
+
+# load only the remaining features, with compact dtypes;
+# the parsed table is cached so later runs skip the CSV parsing
+list_keep = [feature for feature in dataset.columns if feature not in list_drop]
+dataset = load_movies('tmdb-movies.csv', columns=list_keep)
 dataset.info()
 
 
@@ -108,22 +127,9 @@ dataset.info()
 dataset[dataset.cast.isnull()].head()
 
 
-# In[6]:
-
-
-dataset[dataset.cast.isnull()].shape
-
-
 # We see that adjusted budget and revenue seem to be missing as well. (They cannot be zero!) 
 # Moreover, there are just 76 such items out of 10754, less than one percent. 
-# I therefore drop these entries in the following. 
-
-# In[7]:
-
-
-dataset = dataset[pd.notnull(dataset['cast'])]
-dataset.info()
-
+# I therefore drop these entries (see below). 
 
 # #### Director
 
@@ -136,23 +142,10 @@ dataset.info()
 dataset[dataset.director.isnull()].head()
 
 
-# In[9]:
-
-
-dataset[dataset.director.isnull()].shape
-
-
 # Budget and revenue are missing for these ones as well. 
 # There are just 38 of them. 
 # I shall remove them too. 
 
-# In[10]:
-
-
-dataset = dataset[pd.notnull(dataset['director'])]
-dataset.info()
-
-
 # #### Genre
 
 # Some genre entries are missing. 
@@ -163,20 +156,26 @@ dataset.info()
 dataset[dataset.genres.isnull()].head()
 
 
-# In[12]:
+# And these too have missing budget and revenue and are few in numbers. 
+# Drop them!
 
+# #### Drop
 
-dataset[dataset.genres.isnull()].shape
+# I now drop the movies with missing cast, director, or genres. 
+# The three rules are combined into a single filter, so the dataframe is rebuilt only once. 
+# The report counts the movies dropped by each rule, in order. 
 
+# In[ ]:
 
-# And these too have missing budget and revenue and are few in numbers. 
-# Drop them!
 
-# In[13]:
+dataset, clean_report = clean(dataset)
+clean_report
 
 
-dataset = dataset[pd.notnull(dataset['genres'])]
-dataset.info()
+# In[ ]:
+
+
+dataset.shape
 
 
 # #### Production company
@@ -199,6 +198,61 @@ dataset[dataset.production_companies.isnull()].shape
 # While the budget and revenue information are missing for these ones as well, they are quite large in number. 
 # I shall keep them for now. 
 # I shall disregard them while exploring revenue. 
+# The same goes for the movies with a zero budget, revenue or runtime, which are missing values too: 
+# counting the movies failing each zero-value rule, without dropping anything, shows how many there are. 
+# A movie with neither budget nor revenue is counted under both. 
+
+# In[ ]:
+
+
+rule_counts(dataset, ZERO_RULES)
+
+
+# #### Compact representation
+
+# The text columns take most of the memory of the dataset. 
+# Directors, genres and production companies repeat a lot, so I store them as categoricals; release dates become proper dates. 
+# The analyses below give the same results on the compact table. 
+
+# In[ ]:
+
+
+dataset_full = dataset
+dataset = compact(dataset)
+memory_report(dataset_full, dataset)
+
+
+# I also save the compact table as a memory-mapped store. 
+# Other notebooks and scripts open it in no time, without parsing the CSV, and share the same pages of memory. 
+
+# In[ ]:
+
+
+write_store(dataset, 'tmdb-movies.store')
+MovieStore('tmdb-movies.store')
+
+
+# #### Multi-valued columns
+
+# Genres, cast, and production companies hold several values separated by '|'. 
+# Now that the dataset is clean, I parse each of them once into an index of integer codes. 
+# The analyses below reuse these indexes instead of splitting the strings again. 
+
+# In[ ]:
+
+
+indexes = build_indexes(dataset)
+indexes
+
+
+# Some movies have several directors, also separated by '|'. 
+# The statistics of every director (movies, popularity, revenue, active years, genres) are gathered once here for questions 3, 6 and 8. 
+
+# In[ ]:
+
+
+director_table = DirectorTable(dataset)
+director_table
 
 # <a id='explore'></a>
 # ## Exploratory data analysis  
@@ -212,6 +266,7 @@ dataset[dataset.production_companies.isnull()].shape
 # In[16]:
 
 
+plt = notebook_pyplot()
 dataset.popularity.hist()
 plt.xlabel('Popularity')
 plt.ylabel('Counts')
@@ -247,19 +302,28 @@ dataset.popularity.describe()
 # In[19]:
 
 
-# Quartiles and fences
-q1_pop = dataset.popularity.describe()['25%']
-q3_pop = dataset.popularity.describe()['75%']
-iqr_pop = q3_pop - q1_pop
-fence_low_pop = q1_pop - 1.5 * iqr_pop 
-fence_high_pop = q3_pop + 1.5 * iqr_pop
+# Quartiles and fences (all quartiles come from one pass over the column)
+fences_pop = iqr_fences(dataset.popularity)
+q1_pop, q3_pop = fences_pop.q1, fences_pop.q3
+iqr_pop = fences_pop.iqr
+fence_low_pop, fence_high_pop = fences_pop.low, fences_pop.high
 
 # Regular and outlier samples
-dataset_pop_reg = dataset.query('popularity > {} and popularity < {}'.format(fence_low_pop, fence_high_pop))
-dataset_pop_out = dataset.query('popularity < {} or popularity > {}'.format(fence_low_pop, fence_high_pop))
+dataset_pop_reg, dataset_pop_out = split_outliers(dataset, 'popularity', fences_pop)
 dataset_pop_reg.shape
 
 
+# For much larger catalogs the quartiles need not be computed exactly. 
+# A quantile sketch estimates them in a single pass without sorting the column, and sketches of separate chunks can be merged. 
+# Here is how close the estimated quartiles and fences come on this dataset. 
+# (The rank error is the fraction of movies between the exact and the estimated value.) 
+
+# In[ ]:
+
+
+fence_error_report(dataset.popularity, error=0.01)
+
+
 # We now plot the histogram of typical values of popularity. 
 
 # In[20]:
@@ -289,7 +353,10 @@ dataset_pop_reg.popularity.describe()
 # In[22]:
 
 
-dataset.sort_values(by='popularity', ascending=False).head(10)
+# the 100 leading movies of each metric are selected once (without sorting the whole dataset);
+# every shorter list below is read from that selection
+leaders = Leaderboard(dataset, k=100)
+leaders.top('popularity', 10)
 
 
 # The list definitely makes sense (although I was somewhat surprised by the entry john Wick!). 
@@ -299,7 +366,7 @@ dataset.sort_values(by='popularity', ascending=False).head(10)
 # In[23]:
 
 
-dataset.sort_values(by='popularity', ascending=False).head(10).describe()
+leaders.describe('popularity', 10)
 
 
 # These are the numerical characteristics of the top ten popular movies. 
@@ -320,7 +387,7 @@ dataset.sort_values(by='popularity', ascending=False).head(10).describe()
 # In[24]:
 
 
-dataset.sort_values(by='popularity', ascending=False).head(100).director.value_counts()[:10]
+director_table.within_top('popularity', 100)
 
 
 # ### 2. Revenue
@@ -333,7 +400,7 @@ dataset.sort_values(by='popularity', ascending=False).head(100).director.value_c
 # In[25]:
 
 
-dataset.query('revenue_adj == 0').shape
+select(dataset, revenue_adj=0).shape
 
 
 # There's a lot of zeros! 
@@ -345,7 +412,7 @@ dataset.query('revenue_adj == 0').shape
 # In[26]:
 
 
-dataset_rev = dataset.query('revenue_adj > 0')
+dataset_rev = select(dataset, revenue_adj=Between(0))
 dataset_rev.revenue_adj.hist()
 plt.xlabel('Revenue (in 2010 USD)')
 plt.ylabel('Counts')
@@ -370,20 +437,14 @@ plt.title('Boxplot of revenue');
 # In[28]:
 
 
-# quartiles
-q1_rev = dataset_rev.revenue_adj.describe()['25%']
-q3_rev = dataset_rev.revenue_adj.describe()['75%']
-
-# interquartile range
-iqr_rev = q3_rev - q1_rev
-
-# fences
-fence_low_rev  = q1_rev - 1.5 * iqr_rev 
-fence_high_rev = q3_rev + 1.5 * iqr_rev
+# quartiles, interquartile range, and fences
+fences_rev = iqr_fences(dataset_rev.revenue_adj)
+q1_rev, q3_rev = fences_rev.q1, fences_rev.q3
+iqr_rev = fences_rev.iqr
+fence_low_rev, fence_high_rev = fences_rev.low, fences_rev.high
 
 # Regular and outlier samples
-dataset_rev_reg = dataset_rev.query('revenue_adj > {} and revenue_adj < {}'.format(fence_low_rev, fence_high_rev))
-dataset_rev_out = dataset_rev.query('revenue_adj < {} or revenue_adj > {}'.format(fence_low_rev, fence_high_rev))
+dataset_rev_reg, dataset_rev_out = split_outliers(dataset_rev, 'revenue_adj', fences_rev)
 
 # shape of the regular dataset
 dataset_rev_reg.shape
@@ -392,7 +453,6 @@ dataset_rev_reg.shape
 # In[29]:
 
 
-dataset_rev_reg = dataset_rev.query('revenue_adj > {} and revenue_adj < {}'.format(fence_low_rev, fence_high_rev))
 dataset_rev_reg.revenue_adj.plot.hist(bins=20)
 plt.xlabel('Revenue (in 2010 USD)')
 plt.title('Distribution of available revenue');
@@ -406,7 +466,6 @@ plt.title('Distribution of available revenue');
 # In[30]:
 
 
-dataset_rev_out = dataset_rev.query('revenue_adj < {} or revenue_adj > {}'.format(fence_low_rev, fence_high_rev))
 dataset_rev_out.revenue_adj.plot.hist(bins=20)
 plt.xlabel('Revenue (in 2010 USD)')
 plt.title('Revenue distribution of top-grossing movies');
@@ -421,13 +480,13 @@ plt.title('Revenue distribution of top-grossing movies');
 # In[31]:
 
 
-dataset.sort_values(by='revenue_adj', ascending=False).head(10)
+leaders.top('revenue_adj', 10)
 
 
 # In[32]:
 
 
-dataset.sort_values(by='revenue_adj', ascending=False).head(50).describe()
+leaders.describe('revenue_adj', 50)
 
 
 # #### Highest grossing movie directors
@@ -438,7 +497,7 @@ dataset.sort_values(by='revenue_adj', ascending=False).head(50).describe()
 # In[33]:
 
 
-dataset.sort_values(by='revenue_adj', ascending=False).head(100).director.value_counts()[:10]
+director_table.within_top('revenue_adj', 100)
 
 
 # Definitely not the same as before!
@@ -462,27 +521,42 @@ plt.title('Relation between popularity and revenue');
 # As the scatter plot portrays, there is definitely a positive correlation. 
 # The outliers have made the correlation a difficilt to see. 
 # Also, there is a lot of spread. 
+# To put numbers on it, I compute the Pearson, Spearman and Kendall coefficients of the movies with a revenue, also in log space and without the outliers, with 95% bootstrap intervals. 
+
+# In[ ]:
+
+
+correlations(dataset_rev, 'popularity', 'revenue_adj', n_resamples=1000, seed=0)
+
+
+# The same coefficients within each genre: 
+
+# In[ ]:
+
+
+grouped(dataset_rev, 'genres', 'popularity', 'revenue_adj')
+
+
 # In the following, we ask a related question: How strong is the correlation among the outliers? 
 # If a movie is an outlier in popularity, what are the chances it will be an outlier in revenue, and vice versa?
 
 # In[35]:
 
 
-# sets of popular and revenue outliers
-set_pop_out =  set(dataset_pop_out.original_title)
-set_rev_out =  set(dataset_rev_out.original_title)
-print('Popular outlier = {} and Revenue outlier = {}'
-      .format(len(set_pop_out), len(set_rev_out)))
+# popular and revenue outliers, counted by movie (different movies may share a title)
+outliers = contingency(dataset_pop_out, dataset_rev_out, dataset.index,
+                       names=('popular outlier', 'revenue outlier'))
+outliers
 
 
 # In[36]:
 
 
-# intersect of sets of popular and revenue outliers
-print('Intersect: {}'.format(len(set_pop_out.intersection(set_rev_out))))
+conditional(outliers)
 
 
-# A popular outlier has less than fift percent chance (331/930) of being a revenue outlier whereas a revenue outlier has more than fifty percent (331/470) chance of being a popular outlier. 
+# The table above counts movies, not titles, so its numbers differ slightly from the title sets I first compared. 
+# A popular outlier has less than fifty percent chance (roughly one in three: P(revenue outlier | popular outlier) above) of being a revenue outlier whereas a revenue outlier has more than fifty percent (roughly seven in ten: P(popular outlier | revenue outlier)) chance of being a popular outlier. 
 
 # ### 4. Directors
 
@@ -493,7 +567,7 @@ print('Intersect: {}'.format(len(set_pop_out.intersection(set_rev_out))))
 # In[37]:
 
 
-dataset.director.value_counts()[:10]
+director_table.top('movies', 10)
 
 
 # Not surprisingly, Woody Allen (45) comes at top followed by Clint Eastwood (34) and Steven Spielberg (20). 
@@ -503,7 +577,7 @@ dataset.director.value_counts()[:10]
 # In[38]:
 
 
-dataset.director.value_counts().describe()
+director_table.table.movies.describe()
 
 
 # It seems that a director typically makes just one movie!
@@ -544,28 +618,12 @@ plt.title('Yearly movie distribution');
 # In[41]:
 
 
-# earliest and latest years of record
-earliest = int(dataset.release_year.describe()['min'])
-latest = int(dataset.release_year.describe()['max'])
-
-# For each year, collect the genres and find out
-# the frequncy distribution
-pop_gen = {}
-for year in np.arange(earliest, latest+1):
-    # collect the genre strings of a year as a series
-    genres_year = dataset.query('release_year == {}'.format(year))['genres']
-    genres = []
-    # split and store genre strings in 'genres' list
-    for genre in genres_year:
-        genres.append(str(genre).split('|'))
-    
-    # make a flat list from 'genres' list 
-    # so that we can determine frequencies
-    flat_list = [item for sublist in genres for item in sublist]
-    # make the flat list into a pandas series 
-    # so that we can use the pd.value_counts() function
-    genres = pd.Series(flat_list)
-    pop_gen[str(year)] = genres.value_counts().idxmax()
+# count the genres of every year in a single pass:
+# rows are years and columns are genres
+genre_counts = genre_year_counts(dataset, index=indexes['genres'])
+
+# the most frequent genre of each year
+pop_gen = {str(year): genre for year, genre in most_frequent_by_year(genre_counts).items()}
 
 # print the most popular genres per year
 pop_gen
@@ -577,7 +635,64 @@ pop_gen
 # In[42]:
 
 
-pd.Series(flat_list).value_counts().plot(kind='pie', figsize=(10,10), label='Distribution of movie genres');
+genre_distribution(genre_counts).plot(kind='pie', figsize=(10,10), label='Distribution of movie genres');
+
+
+# **Is a genre getting more popular?** 
+# Over rolling windows of ten years, the share of movies of each genre and its rank; the slope of the share tells which genres gained. 
+
+# In[ ]:
+
+
+genre_trends = GenreTrends(dataset, index=indexes['genres'])
+genre_trends.window(10).share[['Drama', 'Comedy', 'Thriller']].plot(figsize=(10,5), title='Share of movies over ten-year windows');
+
+
+# In[ ]:
+
+
+genre_trends.ranks(10)[['Drama', 'Comedy', 'Thriller']].tail()
+
+
+# In[ ]:
+
+
+genre_trends.slopes(10)
+
+
+# ### 7. Cast
+
+# The cast was only used to drop movies so far. 
+# Which actors appear most often, whose movies are the most popular, and which actors keep working with the same director? 
+
+# In[ ]:
+
+
+cast_table = CastTable(dataset, index=indexes['cast'], directors=director_table.directors)
+cast_table.top('movies', 10)
+
+
+# Among the actors with at least ten movies: 
+
+# In[ ]:
+
+
+cast_table.top('popularity_mean', 10, min_movies=10)
+
+
+# In[ ]:
+
+
+cast_table.collaborations(10)
+
+
+# When the notebook runs with the TMDB_PROFILE environment variable set, every stage above (loading, cleaning, fences, selections, top lists, genres, directors) was timed. 
+# The totals show where the time went. 
+
+# In[ ]:
+
+
+pd.DataFrame(profiling.report()['totals']).T if profiling.profiler.enabled else None
 
 
 # <a id='conclude'></a>
@@ -595,7 +710,7 @@ pd.Series(flat_list).value_counts().plot(kind='pie', figsize=(10,10), label='Dis
 # Next we considered the relation between popularity and revenue with mulple metrics. 
 # They are definitely positively correlated on the average, although there is a lot of spread. 
 # I compared most popular movies with highet-grossing movies. 
-# A popular outlier has less than fift percent chance (331/930) of being a revenue outlier whereas a revenue outlier has more than fifty percent (331/470) chance of being a popular outlier.
+# A popular outlier has less than fifty percent chance (roughly one in three) of being a revenue outlier whereas a revenue outlier has more than fifty percent (roughly seven in ten) chance of being a popular outlier.
 # I also looked at the directors of these movies. 
 # While there is a definite overlap there were some interesting mossions in each. 
 # Quentin Tarantino came out in top as a popular movie make, but he was not among the top ten revenue generators. 
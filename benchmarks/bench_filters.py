@@ -0,0 +1,97 @@
+"""Compare string-formatted ``DataFrame.query`` filters with vectorized masks.
+
+Usage::
+
+    python benchmarks/bench_filters.py                 # 10k, 1M and 10M rows
+    python benchmarks/bench_filters.py --sizes 10000 --json filters.json
+
+Every case is timed with both paths and the two results are checked to be
+identical.  Times are the best of `--repeat` runs, in milliseconds.
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tmdb_tools.filters import Between, partition, partition_by, select  # noqa: E402
+from tmdb_tools.synthetic import movies  # noqa: E402
+
+
+def make_frame(n, seed=0):
+    """A synthetic frame with the columns the notebook filters on."""
+    frame = movies(n, seed, columns=['popularity', 'revenue_adj', 'release_year'])
+    return frame.astype({'release_year': np.int16})
+
+
+def cases(frame):
+    """(name, query path, mask path) triples over `frame`."""
+    low, high = frame.popularity.quantile([0.25, 0.75])
+    low, high = low - 1.5 * (high - low), high + 1.5 * (high - low)
+
+    def query_fences():
+        return (frame.query('popularity > {} and popularity < {}'.format(low, high)),
+                frame.query('popularity < {} or popularity > {}'.format(low, high)))
+
+    def query_years():
+        return {year: frame.query('release_year == {}'.format(year))
+                for year in np.arange(1960, 2016)}
+
+    return [
+        ('revenue > 0',
+         lambda: frame.query('revenue_adj > 0'),
+         lambda: select(frame, revenue_adj=Between(0))),
+        ('fence split',
+         query_fences,
+         lambda: partition(frame, 'popularity', low, high)),
+        ('per-year split',
+         query_years,
+         lambda: partition_by(frame, 'release_year')),
+    ]
+
+
+def _same(a, b):
+    if isinstance(a, dict):
+        return all(_same(a[key], b[key]) for key in a)
+    if isinstance(a, tuple):
+        return all(_same(x, y) for x, y in zip(a, b))
+    return a.index.equals(b.index)
+
+
+def run(sizes, repeat):
+    results = []
+    for n in sizes:
+        frame = make_frame(n)
+        for name, query_path, mask_path in cases(frame):
+            if not _same(query_path(), mask_path()):
+                raise AssertionError('{} differs at {} rows'.format(name, n))
+            number = max(1, 100000 // n)
+            query_ms = min(timeit.repeat(query_path, number=number, repeat=repeat)) / number * 1e3
+            mask_ms = min(timeit.repeat(mask_path, number=number, repeat=repeat)) / number * 1e3
+            results.append({'rows': n, 'case': name, 'query_ms': round(query_ms, 3),
+                            'mask_ms': round(mask_ms, 3),
+                            'speedup': round(query_ms / mask_ms, 2)})
+            print('{rows:>10} {case:<16} query {query_ms:>10.3f} ms   '
+                  'mask {mask_ms:>10.3f} ms   x{speedup}'.format(**results[-1]))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 1000000, 10000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args(argv)
+    results = run(args.sizes, args.repeat)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
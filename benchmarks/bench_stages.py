@@ -0,0 +1,213 @@
+"""Time every stage of the analysis on synthetic TMDB-shaped data.
+
+Usage::
+
+    python benchmarks/bench_stages.py                          # 10k, 100k and 1M rows
+    python benchmarks/bench_stages.py --sizes 50000000 --data-dir /tmp/tmdb
+    python benchmarks/bench_stages.py --json new.json --baseline old.json
+
+The stages run in the order of TMDb.py: load, clean, fences, top-N lists,
+per-year genres, directors and, with ``--plots``, the figures.  For each
+stage the wall time, CPU time and peak memory are recorded: the peak of
+the memory allocated through Python and numpy during the stage and the
+maximum resident size of the process so far.  Tracing allocations slows
+string-heavy stages down; ``--no-trace`` times them untraced.  The CSV
+files are generated with `tmdb_tools.synthetic` before any stage runs and
+kept in `--data-dir`, so large sizes are only generated once.
+
+With `--baseline`, the run is compared stage by stage with an earlier
+JSON report and the script exits with status 1 if a stage got slower than
+`--tolerance` times its baseline.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import tmdb_tools  # noqa: E402
+from tmdb_tools import fences  # noqa: E402
+from tmdb_tools.cleaning import clean  # noqa: E402
+from tmdb_tools.directors import DirectorTable  # noqa: E402
+from tmdb_tools.filters import Between, select  # noqa: E402
+from tmdb_tools.genres import genre_year_counts, most_frequent_by_year  # noqa: E402
+from tmdb_tools.loader import read_csv_typed  # noqa: E402
+from tmdb_tools.synthetic import write_csv  # noqa: E402
+from tmdb_tools.topk import Leaderboard  # noqa: E402
+
+
+def _fences(dataset):
+    fences.clear_cache()
+    return (fences.iqr_fences(dataset.popularity),
+            fences.iqr_fences(select(dataset, revenue_adj=Between(0)).revenue_adj))
+
+
+def _top(dataset):
+    leaders = Leaderboard(dataset, k=100)
+    return (leaders.top('popularity', 10), leaders.value_counts('popularity', 'director'),
+            leaders.top('revenue_adj', 10), leaders.value_counts('revenue_adj', 'director'))
+
+
+def _genres(dataset):
+    return most_frequent_by_year(genre_year_counts(dataset))
+
+
+def _directors(dataset):
+    return dataset.director.value_counts(), DirectorTable(dataset)
+
+
+def _plots(dataset):
+    from tmdb_tools.plots import render_figures
+
+    with tempfile.TemporaryDirectory() as directory:
+        return render_figures(dataset, directory, processes=1, cache=False)
+
+
+# stages after load and clean, in the order of the notebook
+STAGES = OrderedDict([
+    ('fences', _fences),
+    ('top', _top),
+    ('genres', _genres),
+    ('directors', _directors),
+])
+
+
+def _max_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1 << 20 if sys.platform == 'darwin' else 1 << 10)
+
+
+def measure(function, *arguments):
+    """Run `function` and return (result, measurements).
+
+    `peak_mb` is None unless tracemalloc is tracing.
+    """
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        traced = tracemalloc.get_traced_memory()[0]
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = function(*arguments)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    peak = tracemalloc.get_traced_memory()[1] - traced if tracing else None
+    return result, OrderedDict([('seconds', round(wall, 4)), ('cpu_seconds', round(cpu, 4)),
+                                ('peak_mb', None if peak is None else round(peak / 2 ** 20, 2)),
+                                ('max_rss_mb', round(_max_rss_mb(), 1))])
+
+
+def dataset_path(n, seed, directory):
+    """Path of the synthetic CSV of `n` rows, generated if missing."""
+    path = os.path.join(directory, 'synthetic-{}-{}.csv'.format(n, seed))
+    if not os.path.exists(path):
+        write_csv(path + '.partial', n, seed)
+        os.replace(path + '.partial', path)
+    return path
+
+
+def run(sizes, seed, directory, plots, trace=True):
+    stages = OrderedDict(STAGES)
+    if plots:
+        stages['plots'] = _plots
+    generated = OrderedDict((n, measure(dataset_path, n, seed, directory)) for n in sizes)
+    results = []
+    if trace:
+        tracemalloc.start()
+    try:
+        for n, (path, generate) in generated.items():
+            rows = [('generate', generate)]
+            raw, loaded = measure(read_csv_typed, path)
+            rows.append(('load', loaded))
+            (dataset, _), cleaned = measure(clean, raw)
+            rows.append(('clean', cleaned))
+            del raw
+            for name, function in stages.items():
+                rows.append((name, measure(function, dataset)[1]))
+            for stage, measurements in rows:
+                results.append(OrderedDict([('rows', n), ('stage', stage)], **measurements))
+                print('{rows:>10} {stage:<10} {seconds:>9.3f} s  cpu {cpu_seconds:>9.3f} s  '
+                      'peak {peak:>9} MB  rss {max_rss_mb:>9.1f} MB'
+                      .format(peak='-' if measurements['peak_mb'] is None else
+                              '{:.1f}'.format(measurements['peak_mb']), **results[-1]))
+    finally:
+        if trace:
+            tracemalloc.stop()
+    return results
+
+
+def environment():
+    """Versions and machine the results were measured with."""
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT,
+                                         stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return OrderedDict([
+        ('tmdb_tools', tmdb_tools.__version__), ('commit', commit),
+        ('python', platform.python_version()), ('numpy', np.__version__),
+        ('pandas', pd.__version__), ('machine', platform.platform()),
+        ('cpus', os.cpu_count()), ('time', time.strftime('%Y-%m-%dT%H:%M:%S%z')),
+    ])
+
+
+def compare(results, baseline, tolerance):
+    """Print the slowdown of every stage against `baseline`; return the regressions."""
+    before = {(row['rows'], row['stage']): row['seconds'] for row in baseline['results']}
+    regressions = []
+    for row in results:
+        key = (row['rows'], row['stage'])
+        if key not in before or row['stage'] == 'generate' or not before[key]:
+            continue
+        ratio = row['seconds'] / before[key]
+        flag = ''
+        if ratio > tolerance:
+            regressions.append(key)
+            flag = '  REGRESSION'
+        print('{:>10} {:<10} x{:.2f}{}'.format(key[0], key[1], ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'tmdb-bench'),
+                        help='where the synthetic CSV files are kept')
+    parser.add_argument('--plots', action='store_true', help='also time the figures')
+    parser.add_argument('--no-trace', action='store_true',
+                        help='do not trace allocations (no peak_mb, no tracing overhead)')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='slowdown that counts as a regression (default: 1.25)')
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    report = OrderedDict([('environment', environment()),
+                          ('results', run(args.sizes, args.seed, args.data_dir, args.plots,
+                                         trace=not args.no_trace))])
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            if compare(report['results'], json.load(f), args.tolerance):
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Measure the cold-start cost of the batch entry point.
+
+Usage::
+
+    python benchmarks/bench_startup.py [--runs 10] [--json startup.json]
+
+Reports the best and median wall time of ``python -m tmdb_tools --help``
+and of importing the modules a non-plotting report needs, each in a fresh
+interpreter, and fails if any of them pulls in matplotlib, seaborn or
+IPython.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ('matplotlib', 'seaborn', 'IPython')
+
+CASES = [
+    ('cli --help', ['-m', 'tmdb_tools', '--help']),
+    ('import report path', ['-c', 'import sys; '
+                            'import tmdb_tools.cli, tmdb_tools.loader, tmdb_tools.cleaning, '
+                            'tmdb_tools.runner; '
+                            'heavy = [m for m in {!r} if m in sys.modules]; '
+                            'sys.exit("imported " + ", ".join(heavy) if heavy else 0)'
+                            .format(HEAVY)]),
+]
+
+
+def measure(arguments, runs):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, check=True, env=env, cwd=ROOT,
+                       stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return {'best_ms': round(min(times) * 1e3, 1),
+            'median_ms': round(statistics.median(times) * 1e3, 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args(argv)
+
+    results = []
+    for name, arguments in CASES:
+        results.append(dict(case=name, **measure(arguments, args.runs)))
+        print('{case:<20} best {best_ms:>8.1f} ms   median {median_ms:>8.1f} ms'
+              .format(**results[-1]))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from tmdb_tools import cast
+from tmdb_tools.cast import CastTable
+
+
+def frame():
+    return pd.DataFrame({
+        'cast': ['X|Y', 'Y', 'X|Z', None, 'Y|Z'],
+        'director': ['A', 'A|B', 'B', 'A', 'A'],
+        'popularity': [1.0, 2.0, 3.0, 4.0, 6.0],
+        'revenue_adj': [10.0, np.nan, 30.0, 40.0, 50.0],
+        'release_year': [2000, 2004, 2001, 2002, 2010],
+    })
+
+
+def credits(dataset):
+    return dataset.assign(actor=dataset.cast.str.split('|')).explode('actor').dropna(
+        subset=['actor'])
+
+
+def test_table_matches_explode_and_groupby():
+    dataset = frame()
+    table = CastTable(dataset).table
+    grouped = credits(dataset).groupby('actor')
+    expected = pd.DataFrame({
+        'movies': grouped.size(),
+        'popularity_mean': grouped.popularity.mean(),
+        'popularity_median': grouped.popularity.median(),
+        'revenue_sum': grouped.revenue_adj.sum(),
+        'first_year': grouped.release_year.min(),
+        'last_year': grouped.release_year.max(),
+    })
+    expected['career_span'] = expected.last_year - expected.first_year + 1
+    tm.assert_frame_equal(table.sort_index(), expected, check_dtype=False,
+                          check_index_type=False)
+    assert list(CastTable(dataset).top('popularity_mean', 2).index) == ['Z', 'Y']
+
+
+@pytest.mark.parametrize('scipy', [True, False])
+def test_collaborations_match_a_crosstab(monkeypatch, scipy):
+    monkeypatch.setattr(cast, '_has_scipy', lambda: scipy)
+    dataset = frame()
+    pairs = credits(dataset)
+    pairs = pairs.assign(director=pairs.director.str.split('|')).explode('director')
+    expected = pairs.groupby(['actor', 'director']).size()
+    collaborations = CastTable(dataset).collaborations(n=100)
+    got = collaborations.set_index(['actor', 'director']).movies
+    tm.assert_series_equal(got.sort_index(), expected, check_names=False,
+                           check_dtype=False, check_index_type=False)
+    assert collaborations.movies.is_monotonic_decreasing
+    assert CastTable(dataset).collaborations(actor='X').director.tolist() == ['A', 'B']
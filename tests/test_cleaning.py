@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from tmdb_tools.cleaning import ZERO_RULES, clean_mask, rule_counts
+
+
+def frame():
+    return pd.DataFrame({'budget_adj': [0.0, 0.0, 5.0, np.nan, 1.0],
+                         'revenue_adj': [0.0, 3.0, 0.0, 0.0, 2.0],
+                         'runtime': [0, 90, 100, 0, 110]})
+
+
+def test_rule_counts_are_independent():
+    dataset = frame()
+    counts = rule_counts(dataset, ZERO_RULES)
+    expected = [int((dataset.budget_adj.fillna(0) == 0).sum()),
+                int((dataset.revenue_adj == 0).sum()), int((dataset.runtime == 0).sum())]
+    assert counts.to_dict() == dict(zip(['budget', 'revenue', 'runtime'], expected))
+
+
+def test_drop_counts_are_sequential():
+    dataset = frame()
+    keep, dropped = clean_mask(dataset, ZERO_RULES)
+    assert dropped.to_dict() == {'budget': 3, 'revenue': 1, 'runtime': 0}
+    assert dropped.sum() == len(dataset) - keep.sum()
+    assert keep.tolist() == [False, False, False, False, True]
@@ -0,0 +1,10 @@
+import pytest
+
+from tmdb_tools import cli
+
+
+def test_compare_needs_two_snapshots(capsys):
+    with pytest.raises(SystemExit) as exit:
+        cli.main(['compare', 'only.csv'])
+    assert exit.value.code == 2
+    assert 'at least two snapshot CSV files' in capsys.readouterr().err
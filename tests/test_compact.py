@@ -0,0 +1,50 @@
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from tmdb_tools import synthetic
+from tmdb_tools.cleaning import clean
+from tmdb_tools.compact import compact
+from tmdb_tools.loader import COLUMNS
+from tmdb_tools.runner import run_sections
+from tmdb_tools.topk import ranked_counts
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    return clean(synthetic.movies(20000, seed=3, columns=COLUMNS))[0]
+
+
+def assert_same(left, right, where):
+    # equal values; dtypes may differ, and release_date is parsed on one side
+    if isinstance(left, dict):
+        assert list(left) == list(right), where
+        for key in left:
+            assert_same(left[key], right[key], '{}.{}'.format(where, key))
+    elif isinstance(left, pd.DataFrame):
+        left = left.drop(columns='release_date', errors='ignore')
+        right = right.drop(columns='release_date', errors='ignore')
+        tm.assert_frame_equal(left, right, check_dtype=False, check_categorical=False,
+                              check_index_type=False, check_column_type=False, obj=where)
+    elif isinstance(left, pd.Series):
+        tm.assert_series_equal(left, right, check_dtype=False, check_categorical=False,
+                               check_index_type=False, obj=where)
+    else:
+        assert left == right, where
+
+
+def test_sections_give_the_same_results_on_the_compact_table(dataset):
+    compacted = compact(dataset)
+    assert isinstance(compacted.director.dtype, pd.CategoricalDtype)
+    full = run_sections(dataset, processes=1)
+    small = run_sections(compacted, processes=1)
+    for name in full:
+        assert_same(full[name], small[name], name)
+
+
+def test_ranked_counts_break_ties_by_first_appearance():
+    values = ['b', 'c', 'a', 'c', 'b', None, 'a']
+    for series in (pd.Series(values), pd.Series(values, dtype='category')):
+        counts = ranked_counts(series)
+        assert list(counts.index) == ['b', 'c', 'a']
+        assert list(counts) == [2, 2, 2]
@@ -0,0 +1,50 @@
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from tmdb_tools import synthetic
+from tmdb_tools.analysis import directors
+from tmdb_tools.cleaning import clean
+from tmdb_tools.directors import DirectorTable
+from tmdb_tools.incremental import IncrementalState
+from tmdb_tools.loader import load_movies
+from tmdb_tools.runner import run_sections
+from tmdb_tools.service import QueryService
+from tmdb_tools.streaming import run_streaming
+from tmdb_tools.topk import ranked_counts
+
+
+@pytest.fixture(scope='module')
+def csv(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('directors') / 'movies.csv')
+    frame = synthetic.movies(3000, seed=6)
+    assert frame.director.str.contains('|', regex=False).any()
+    frame.to_csv(path, index=False)
+    return path
+
+
+def test_a_movie_counts_for_each_of_its_directors():
+    frame = pd.DataFrame({'director': ['A|B', 'B', 'C', None, 'A']})
+    counts = ranked_counts(frame.director, '|')
+    expected = frame.director.str.split('|').explode().value_counts()
+    tm.assert_series_equal(counts, expected, check_names=False, check_index_type=False)
+    assert list(counts.index) == ['A', 'B', 'C']
+    table = DirectorTable(frame.assign(popularity=1.0, revenue_adj=0.0, release_year=2000,
+                                       genres='Drama').dropna())
+    assert table.top('movies', 3).movies.to_dict() == counts.to_dict()
+
+
+def test_every_command_counts_directors_alike(csv, tmp_path):
+    dataset = clean(load_movies(csv, cache=False))[0]
+    everyone = QueryService(csv).director_ranking(n=10 ** 6)
+    report = run_sections(dataset, ['directors'], processes=1)['directors']
+    stream = run_streaming(csv, chunksize=700)
+    state = IncrementalState.open(str(tmp_path / 'state')).apply(csv)
+    assert everyone.sum() > len(dataset)
+    tm.assert_series_equal(report['summary'], everyone.describe(), check_names=False)
+    tm.assert_series_equal(stream['director_counts_summary'], everyone.describe(),
+                           check_names=False)
+    for top in (report['top10'], stream['director_counts'], state.result()['director_counts'],
+                directors(dataset)['top10'], DirectorTable(dataset).top('movies', 10).movies):
+        assert list(top) == list(everyone[:10])
+        assert all(everyone[name] == count for name, count in top.items())
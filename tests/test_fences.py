@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+
+from tmdb_tools.fences import (FIVE, five_number_summary, iqr_fences, outlier_masks, quantiles,
+                               split_outliers)
+
+
+def frame():
+    return pd.DataFrame({'popularity': [1.0, 2.0, 3.0, 4.0, np.nan, 5.0, 6.0, 7.0, 100.0]})
+
+
+def test_quantiles_match_describe():
+    popularity = frame().popularity
+    described = popularity.describe()
+    summary = five_number_summary(popularity)
+    tm.assert_series_equal(summary, described[summary.index])
+    assert list(quantiles(popularity).index) == list(FIVE)
+
+
+def test_fences_and_masks_match_pandas():
+    popularity = frame().popularity
+    q1, q3 = popularity.quantile([0.25, 0.75])
+    fences = iqr_fences(popularity)
+    assert (fences.q1, fences.q3, fences.iqr) == (q1, q3, q3 - q1)
+    assert (fences.low, fences.high) == (q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1))
+    regular, outlier = outlier_masks(popularity, fences)
+    np.testing.assert_array_equal(regular, (popularity > fences.low) & (popularity < fences.high))
+    np.testing.assert_array_equal(outlier, (popularity < fences.low) | (popularity > fences.high))
+    kept, dropped = split_outliers(frame(), 'popularity')
+    assert list(dropped.popularity) == [100.0]
+    assert len(kept) == 7
+
+
+def test_fences_follow_in_place_edits():
+    dataset = frame()
+    before = iqr_fences(dataset.popularity)
+    assert iqr_fences(dataset.popularity) == before
+    dataset.loc[dataset.popularity > 5, 'popularity'] = 1e6
+    after = iqr_fences(dataset.popularity)
+    assert after.q3 == dataset.popularity.quantile(0.75) != before.q3
+    values = dataset.popularity.to_numpy(copy=True)
+    values[0] = -1e6
+    assert quantiles(values)[0.0] == -1e6
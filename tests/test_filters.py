@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+
+from tmdb_tools.filters import Between, partition, partition_by, select
+
+
+def frame():
+    return pd.DataFrame({'popularity': [0.5, 1.0, 2.0, np.nan, 3.0, 1.5],
+                         'revenue_adj': [0.0, 10.0, 5.0, 7.0, 0.0, 1.0],
+                         'release_year': [2001, 2002, 2001, 2003, 2002, 2001],
+                         'director': ['A', 'B', 'A', 'C', None, 'B']})
+
+
+def test_select_matches_query():
+    dataset = frame()
+    tm.assert_frame_equal(select(dataset, revenue_adj=Between(0)),
+                          dataset.query('revenue_adj > 0'))
+    tm.assert_frame_equal(select(dataset, popularity=Between(1.0, 2.0, 'both'),
+                                 director=['B', 'C']),
+                          dataset[dataset.popularity.between(1.0, 2.0) &
+                                  dataset.director.isin(['B', 'C'])])
+    tm.assert_frame_equal(select(dataset, release_year=2001,
+                                 popularity=lambda column: column > 1),
+                          dataset.query('release_year == 2001 and popularity > 1'))
+
+
+def test_partitions():
+    dataset = frame()
+    inside, outside = partition(dataset, 'popularity', 1.0, 3.0)
+    # the bounds and the missing value fall in neither part
+    tm.assert_frame_equal(inside, dataset.query('popularity > 1 and popularity < 3'))
+    tm.assert_frame_equal(outside, dataset.query('popularity < 1 or popularity > 3'))
+    parts = partition_by(dataset, 'release_year')
+    assert list(parts) == [2001, 2002, 2003]
+    for year, part in parts.items():
+        tm.assert_frame_equal(part, dataset[dataset.release_year == year])
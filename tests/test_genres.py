@@ -0,0 +1,33 @@
+import pandas as pd
+import pandas.testing as tm
+
+from tmdb_tools.genres import genre_distribution, genre_year_counts, most_frequent_by_year
+
+
+def frame():
+    return pd.DataFrame({
+        'release_year': [2001, 2001, 2001, 2002, 2002, 2002, 2003],
+        'genres': ['Drama|Comedy', 'Comedy', 'Action|Drama', 'Drama', 'Action|Comedy',
+                   'Comedy|Action', None],
+    })
+
+
+def test_counts_match_a_crosstab():
+    dataset = frame()
+    counts = genre_year_counts(dataset)
+    exploded = dataset.assign(genre=dataset.genres.str.split('|'))
+    exploded = exploded.explode('genre', ignore_index=True)
+    expected = pd.crosstab(exploded.release_year, exploded.genre)
+    # the years without a genre are left out
+    assert list(counts.index) == [2001, 2002]
+    tm.assert_frame_equal(counts.sort_index(axis=1), expected, check_names=False,
+                          check_dtype=False, check_index_type=False,
+                          check_column_type=False)
+    assert list(counts.columns) == ['Comedy', 'Drama', 'Action']
+
+
+def test_most_frequent_genre_of_every_year():
+    counts = genre_year_counts(frame())
+    # ties are won by the most frequent genre overall
+    assert most_frequent_by_year(counts).to_dict() == {2001: 'Comedy', 2002: 'Comedy'}
+    assert genre_distribution(counts).to_dict() == {'Comedy': 4, 'Drama': 3, 'Action': 3}
@@ -0,0 +1,122 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from tmdb_tools import analysis, incremental, synthetic
+from tmdb_tools.cleaning import clean
+from tmdb_tools.incremental import IncrementalState
+from tmdb_tools.loader import COLUMNS, read_csv_typed
+
+FIELDS = ['id'] + COLUMNS
+
+
+def write(frame, path):
+    frame[FIELDS].to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def deltas(tmp_path):
+    base = synthetic.movies(1500, seed=0, columns=FIELDS)
+    # new versions of known movies, and new movies
+    update = synthetic.movies(400, seed=1, columns=FIELDS)
+    update['id'] = np.concatenate([base.id.to_numpy()[:200], base.id.max() + 1 + np.arange(200)])
+    # known movies that now fail the Clean rules, and a genre new to a new year
+    dropped = base.iloc[200:260].copy()
+    dropped['director'] = None
+    extra = base.iloc[:2].copy()
+    extra['id'] = [base.id.max() + 1000, base.id.max() + 1001]
+    extra['genres'] = 'Brand New Genre'
+    extra['release_year'] = 1950
+    paths = [write(base, tmp_path / 'd1.csv'), write(update, tmp_path / 'd2.csv'),
+             write(pd.concat([dropped, extra]), tmp_path / 'd3.csv')]
+    # each delta applied to half the catalog again, so segments fill up
+    paths.append(write(base.iloc[::2], tmp_path / 'd4.csv'))
+    return paths
+
+
+def recompute(paths):
+    catalog = pd.concat([read_csv_typed(path, FIELDS, categorical=False) for path in paths])
+    catalog = catalog.drop_duplicates('id', keep='last')
+    return clean(catalog)[0]
+
+
+def assert_matches(result, dataset):
+    assert result['movies'] == len(dataset)
+    tm.assert_series_equal(result['year_counts'], analysis.years(dataset)['counts'],
+                           check_names=False, check_index_type=False)
+    expected = analysis.genres(dataset)
+    tm.assert_series_equal(result['genre_distribution'].sort_index(),
+                           expected['distribution'].sort_index(), check_names=False,
+                           check_index_type=False)
+    assert result['pop_gen'] == expected['pop_gen']
+    directors = analysis.directors(dataset)['top10']
+    assert list(result['director_counts']) == list(directors)
+    for metric in incremental.METRICS:
+        top = dataset.set_index('id')[metric].nlargest(50)
+        assert list(result['top_' + metric][metric][:50]) == list(top)
+
+
+@pytest.mark.parametrize('max_segments', [16, 1])
+def test_deltas_match_a_full_recompute(tmp_path, deltas, max_segments):
+    directory = str(tmp_path / 'state')
+    for number, path in enumerate(deltas, 1):
+        state = IncrementalState.open(directory, k=50, max_segments=max_segments)
+        state.apply(path)
+        assert_matches(state.result(), recompute(deltas[:number]))
+    reopened = IncrementalState.open(directory)
+    assert_matches(reopened.result(), recompute(deltas))
+    segments = os.listdir(os.path.join(directory, 'segments'))
+    assert sorted(segments) == sorted(reopened.segments)
+
+
+def test_crash_before_the_state_is_replaced(tmp_path, deltas, monkeypatch):
+    directory = str(tmp_path / 'state')
+    state = IncrementalState.open(directory, k=50, max_segments=1)
+    for path in deltas[:2]:
+        state.apply(path)
+    before = IncrementalState.open(directory).result()
+
+    class Crash(Exception):
+        pass
+
+    def crash(*args, **kwargs):
+        raise Crash
+
+    # the update compacts the segments and marks records dead, then dies
+    monkeypatch.setattr(incremental.pickle, 'dump', crash)
+    with pytest.raises(Crash):
+        IncrementalState.open(directory).apply(deltas[2])
+    monkeypatch.undo()
+
+    state = IncrementalState.open(directory)
+    after = state.result()
+    assert after['movies'] == before['movies']
+    tm.assert_series_equal(after['year_counts'], before['year_counts'])
+    assert_matches(after, recompute(deltas[:2]))
+    state.apply(deltas[2])
+    assert_matches(IncrementalState.open(directory).result(), recompute(deltas[:3]))
+
+
+def test_crash_during_the_first_apply(tmp_path, deltas, monkeypatch):
+    directory = str(tmp_path / 'state')
+
+    class Crash(Exception):
+        pass
+
+    def crash(*args, **kwargs):
+        raise Crash
+
+    monkeypatch.setattr(incremental.pickle, 'dump', crash)
+    with pytest.raises(Crash):
+        IncrementalState.open(directory).apply(deltas[0])
+    monkeypatch.undo()
+    assert os.listdir(os.path.join(directory, 'segments'))
+
+    state = IncrementalState.open(directory, k=50)
+    state.apply(deltas[0])
+    assert_matches(IncrementalState.open(directory).result(), recompute(deltas[:1]))
+    assert os.listdir(os.path.join(directory, 'segments')) == state.segments
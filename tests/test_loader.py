@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+
+from tmdb_tools import loader
+from tmdb_tools.loader import CACHE_DIR, COLUMNS, load_movies
+
+
+def write(path, rows=3):
+    frame = pd.DataFrame({
+        'id': np.arange(rows), 'imdb_id': ['tt{}'.format(i) for i in range(rows)],
+        'popularity': np.linspace(0.1, 3.3, rows), 'original_title': ['A', 'B', 'C'][:rows],
+        'cast': ['X|Y', None, 'Z'][:rows], 'director': ['D', 'E', 'D'][:rows],
+        'runtime': [90, 0, 120][:rows], 'genres': ['Drama', 'Comedy|Drama', None][:rows],
+        'production_companies': ['P', 'Q', 'P'][:rows],
+        'release_date': ['6/9/15', '1/1/99', '12/25/05'][:rows],
+        'release_year': [2015, 1999, 2005][:rows], 'budget_adj': [1.5e6, 0.0, 2.5e7][:rows],
+        'revenue_adj': [3.25e6, 0.0, np.nan][:rows], 'keywords': ['k', 'l', 'm'][:rows],
+    })
+    frame.to_csv(path, index=False)
+    return path
+
+
+def test_columns_and_dtypes(tmp_path):
+    path = write(str(tmp_path / 'movies.csv'))
+    dataset = load_movies(path, cache=False)
+    expected = pd.read_csv(path, usecols=COLUMNS)[COLUMNS]
+    assert list(dataset.columns) == COLUMNS
+    assert dataset.director.dtype == 'category' and dataset.runtime.dtype == np.float32
+    assert dataset.release_year.dtype == np.int16
+    tm.assert_frame_equal(dataset, expected, check_dtype=False, check_categorical=False)
+
+
+def test_snapshot_is_reused_until_the_csv_changes(tmp_path, monkeypatch):
+    path = write(str(tmp_path / 'movies.csv'))
+    first = load_movies(path)
+    snapshots = os.listdir(str(tmp_path / CACHE_DIR))
+    assert len(snapshots) == 1
+
+    def read_csv_typed(*args, **kwargs):
+        raise AssertionError('the CSV was parsed again')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(loader, 'read_csv_typed', read_csv_typed)
+        tm.assert_frame_equal(load_movies(path), first)
+    # another column selection, or other contents, get their own snapshot
+    load_movies(path, columns=['id', 'popularity'])
+    write(path, rows=2)
+    assert len(load_movies(path)) == 2
+    assert len(os.listdir(str(tmp_path / CACHE_DIR))) == 3
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from tmdb_tools.multivalue import MultiValueIndex
+
+
+def frame():
+    return pd.DataFrame({'genres': ['Drama|Comedy', None, 'Comedy', 'Action|Drama|Comedy'],
+                         'release_year': [2001, 2001, 2002, 2002],
+                         'revenue_adj': [10.0, 5.0, np.nan, 4.0]},
+                        index=[10, 11, 12, 13])
+
+
+def exploded(dataset):
+    return dataset.assign(genre=dataset.genres.str.split('|')).explode('genre').dropna(
+        subset=['genre'])
+
+
+@pytest.mark.parametrize('categorical', [False, True])
+def test_index_matches_split_and_explode(categorical):
+    dataset = frame()
+    genres = dataset.genres.astype('category') if categorical else dataset.genres
+    index = MultiValueIndex.from_series(genres)
+    pairs = exploded(dataset)
+    assert list(index.tokens) == ['Drama', 'Comedy', 'Action']
+    assert index.lengths.tolist() == [2, 0, 1, 3]
+    tm.assert_series_equal(index.counts(), pairs.genre.value_counts(), check_names=False,
+                           check_index_type=False)
+    assert list(index.rows_with('Drama')) == list(pairs.index[pairs.genre == 'Drama'])
+    assert [list(row) for row in index.explode().values] == \
+        [[row, genre] for row, genre in zip(pairs.index, pairs.genre)]
+
+
+def test_aggregates_match_groupby():
+    dataset = frame()
+    index = MultiValueIndex.from_series(dataset.genres)
+    pairs = exploded(dataset).reset_index(drop=True)
+    counts = index.group_counts(dataset.release_year)
+    expected = pd.crosstab(pairs.release_year, pairs.genre)
+    tm.assert_frame_equal(counts[expected.columns], expected, check_names=False,
+                          check_dtype=False, check_index_type=False,
+                          check_column_type=False)
+    for func in ('sum', 'mean', 'count', 'max'):
+        tm.assert_series_equal(index.aggregate(dataset.revenue_adj, func).sort_index(),
+                               pairs.groupby('genre').revenue_adj.agg(func).astype(float),
+                               check_names=False, check_dtype=False,
+                               check_index_type=False)
+    sub = index.take([3, 0])
+    assert list(sub.index) == [13, 10]
+    assert sub.tokens.take(sub.codes).tolist() == ['Action', 'Drama', 'Comedy', 'Drama',
+                                                   'Comedy']
@@ -0,0 +1,46 @@
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from tmdb_tools.overlap import conditional, contingency, intersection_sizes, overlap_table
+
+
+def frame():
+    # two different movies share a title
+    return pd.DataFrame({'original_title': ['A', 'B', 'C', 'A', 'D', 'E'],
+                         'popularity': [9.0, 1.0, 8.0, 1.0, 2.0, 7.0],
+                         'revenue_adj': [90.0, 80.0, 1.0, 2.0, 3.0, 70.0]},
+                        index=[11, 12, 13, 14, 15, 16])
+
+
+def test_contingency_matches_crosstab():
+    dataset = frame()
+    popular, grossing = dataset.popularity > 5, dataset.revenue_adj > 50
+    table = contingency(popular.to_numpy(), dataset[grossing], dataset.index,
+                        names=('popular', 'grossing'))
+    expected = pd.crosstab(popular.rename('popular'), grossing.rename('grossing'),
+                           margins=True, margins_name='total')
+    tm.assert_frame_equal(table, expected, check_dtype=False, check_index_type=False,
+                          check_column_type=False)
+    probabilities = conditional(table)
+    assert probabilities['P(grossing | popular)'] == pytest.approx(2 / 3)
+    assert probabilities['P(popular | not grossing)'] == pytest.approx(1 / 3)
+    assert probabilities['P(popular and grossing)'] == pytest.approx(2 / 6)
+
+
+def test_overlaps_of_several_groups():
+    dataset = frame()
+    groups = {'popular': dataset[dataset.popularity > 5],
+              'grossing': dataset[dataset.revenue_adj > 50],
+              'titled A': dataset.original_title == 'A'}
+    table = overlap_table(groups, dataset.index)
+    members = pd.DataFrame({name: dataset.index.isin(group.index)
+                            if isinstance(group, pd.DataFrame) else group.to_numpy()
+                            for name, group in groups.items()})
+    expected = members.value_counts().reindex(table.index, fill_value=0)
+    assert table.to_dict() == expected.to_dict()
+    sizes = intersection_sizes(groups, dataset.index)
+    assert sizes[('popular', 'grossing')] == 2
+    # the titles of the two A movies would be counted as one in a set intersection
+    assert sizes[('titled A',)] == 2 and sizes[('popular', 'titled A')] == 1
+    assert sizes[('popular', 'grossing', 'titled A')] == 1
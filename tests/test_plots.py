@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tmdb_tools import synthetic
+from tmdb_tools.cleaning import clean
+from tmdb_tools.loader import COLUMNS, DTYPES
+from tmdb_tools.plots import CACHE_DIR, _box_stats, render_figures
+
+pytest.importorskip('matplotlib')
+
+NAMES = ['popularity_hist', 'popularity_box']
+
+
+def dataset(seed):
+    frame = synthetic.movies(500, seed=seed, columns=COLUMNS)
+    frame = frame.astype({column: DTYPES[column] for column in COLUMNS if column in DTYPES})
+    return clean(frame)[0]
+
+
+def test_cache_keeps_the_latest_rendering(tmp_path):
+    directory = str(tmp_path)
+    first = render_figures(dataset(0), directory, NAMES, formats='png', processes=1)
+    assert all(drawn for _, drawn in first.values())
+    assert sorted(os.listdir(directory)) == sorted([CACHE_DIR] + [name + '.png'
+                                                                  for name in NAMES])
+    again = render_figures(dataset(0), directory, NAMES, formats='png', processes=1)
+    assert not any(drawn for _, drawn in again.values())
+
+    render_figures(dataset(1), directory, NAMES, formats=['png', 'svg'], processes=1)
+    cached = os.listdir(os.path.join(directory, CACHE_DIR))
+    assert len(cached) == 2 * len(NAMES)
+    # other figures keep their renderings
+    render_figures(dataset(1), directory, ['year_counts'], processes=1)
+    assert len(os.listdir(os.path.join(directory, CACHE_DIR))) == 2 * len(NAMES) + 1
+
+
+def test_box_stats_without_values_inside_the_whiskers():
+    stats = _box_stats(pd.Series([0.0, 0, 0, 100], name='x'))
+    assert stats['whislo'] == 0 and stats['whishi'] == stats['q3']
+    assert list(stats['fliers']) == [100]
+    stats = _box_stats(pd.Series([np.nan], name='x'))
+    assert np.isnan(stats['whislo']) and len(stats['fliers']) == 0
@@ -0,0 +1,48 @@
+import os
+import pstats
+
+import pandas as pd
+import pandas.testing as tm
+
+from tmdb_tools import profiling
+from tmdb_tools.cleaning import clean
+from tmdb_tools.filters import Between, select
+
+
+def frame():
+    return pd.DataFrame({'cast': ['X', None, 'Y', 'Z'], 'director': ['A', 'B', None, 'C'],
+                         'genres': ['Drama', 'Comedy', 'Drama', None],
+                         'revenue_adj': [1.0, 0.0, 2.0, 3.0]})
+
+
+def test_stages_record_their_rows(tmp_path, monkeypatch):
+    profiler = profiling.Profiler(enabled=True, profile_stage='clean',
+                                  directory=str(tmp_path))
+    monkeypatch.setattr(profiling, 'profiler', profiler)
+    dataset = frame()
+    with profiling.stage('explore', len(dataset)) as record:
+        cleaned, _ = clean(dataset)
+        selected = select(cleaned, revenue_adj=Between(0))
+        record.rows_out = len(selected)
+    tm.assert_frame_equal(cleaned, dataset.dropna(subset=['cast', 'director', 'genres']))
+
+    records = {record['stage']: record for record in profiler.report()['stages']}
+    assert list(records) == ['explore/clean', 'explore/select', 'explore']
+    assert (records['explore/clean']['rows_in'], records['explore/clean']['rows_out']) == (4, 1)
+    assert (records['explore/select']['rows_in'], records['explore/select']['rows_out']) == \
+        (len(cleaned), len(cleaned.query('revenue_adj > 0')))
+    assert records['explore']['wall'] >= records['explore/clean']['wall']
+    # a cProfile dump of the chosen stage only
+    assert records['explore/clean']['profile'] == str(tmp_path / 'explore.clean.prof')
+    assert records['explore/select']['profile'] is None
+    assert os.listdir(str(tmp_path)) == ['explore.clean.prof']
+    pstats.Stats(records['explore/clean']['profile'])
+    assert profiler.report()['totals']['explore/clean']['calls'] == 1
+
+
+def test_disabled_profiler_records_nothing(monkeypatch):
+    profiler = profiling.Profiler()
+    monkeypatch.setattr(profiling, 'profiler', profiler)
+    cleaned, _ = clean(frame())
+    assert len(cleaned) == 1
+    assert profiler.records == []
@@ -0,0 +1,107 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from tmdb_tools import result_cache, synthetic
+from tmdb_tools.loader import fingerprint
+from tmdb_tools.result_cache import ResultCache, code_version, run_cached
+
+
+@pytest.fixture
+def csv(tmp_path):
+    path = synthetic.write_csv(str(tmp_path / 'movies.csv'), 2000, seed=4)
+    # old enough for its fingerprint to be kept
+    old = time.time() - 60
+    os.utime(path, (old, old))
+    return path
+
+
+def test_keys():
+    key = ResultCache.key('genres', {'a': 1}, 'code', ['clean'])
+    assert key == ResultCache.key('genres', {'a': 1}, 'code', ['clean'])
+    assert key != ResultCache.key('genres', {'a': 2}, 'code', ['clean'])
+    assert key != ResultCache.key('genres', {'a': 1}, 'edited', ['clean'])
+    assert key != ResultCache.key('genres', {'a': 1}, 'code', ['other clean'])
+    assert key != ResultCache.key('years', {'a': 1}, 'code', ['clean'])
+
+
+def test_code_version_follows_used_modules():
+    from tmdb_tools.analysis import genres, popularity
+
+    assert code_version(popularity) == code_version(popularity)
+    assert code_version(popularity) != code_version(genres)
+
+
+def test_eviction_is_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results'))
+    for key in 'abc':
+        cache.put(key, 'stage', 'x' * 1000)
+    cache.get('a')
+    cache.max_bytes = 2 * cache.index['a']['bytes']
+    assert cache.evict() == ['b']
+    cache.save()
+    reopened = ResultCache(cache.directory)
+    assert list(reopened.index) == ['c', 'a']
+    assert sorted(os.listdir(cache.directory)) == ['a.pkl', 'c.pkl', 'files.json', 'index.json']
+
+
+def test_unsaved_entries_are_removed(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results'))
+    cache.put('a', 'stage', 1)
+    cache.save()
+    cache.put('b', 'stage', 2)
+    # a run interrupted before `save`
+    reopened = ResultCache(cache.directory)
+    assert reopened.get('b') == (False, None)
+    reopened.evict()
+    assert not os.path.exists(os.path.join(cache.directory, 'b.pkl'))
+    assert reopened.get('a') == (True, 1)
+
+
+def test_invalidate_removes_dependents(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results'))
+    cache.put('clean', 'clean', 0)
+    cache.put('genres', 'genres', 1, ['clean'])
+    cache.put('other', 'other', 2)
+    assert cache.invalidate('clean') == {'clean', 'genres'}
+    assert list(ResultCache(cache.directory).index) == ['other']
+
+
+def test_run_cached(csv, tmp_path, monkeypatch):
+    hashed, saved = [], []
+    real = result_cache.fingerprint
+    monkeypatch.setattr(result_cache, 'fingerprint',
+                        lambda path: hashed.append(path) or real(path))
+    save = ResultCache.save
+    monkeypatch.setattr(ResultCache, 'save', lambda self: saved.append(1) or save(self))
+
+    first = run_cached(csv, processes=1, cache=ResultCache(str(tmp_path / 'results')))
+    assert first.cached == [] and first.dataset is not None
+    assert len(hashed) == 1 and len(saved) == 1
+
+    second = run_cached(csv, processes=1, cache=ResultCache(str(tmp_path / 'results')))
+    assert second.cached == ['clean'] + list(result_cache.SECTIONS)
+    assert second.dataset is None
+    assert len(hashed) == 1
+    pd.testing.assert_series_equal(second.report['years']['counts'],
+                                   first.report['years']['counts'])
+
+    # the same size, a different modification time
+    os.utime(csv, (time.time() - 30, time.time() - 30))
+    run_cached(csv, ['years'], processes=1, cache=ResultCache(str(tmp_path / 'results')))
+    assert len(hashed) == 2
+
+
+def test_csv_changed_while_running(csv, tmp_path, monkeypatch):
+    # the fingerprint was taken before an edit, the load sees the edited file
+    monkeypatch.setattr(result_cache, 'fingerprint', lambda path: 'contents before the edit')
+    cache = ResultCache(str(tmp_path / 'results'))
+    run_cached(csv, ['years'], processes=1, cache=cache)
+    assert cache.files == {}
+    monkeypatch.undo()
+
+    again = run_cached(csv, ['years'], processes=1, cache=ResultCache(cache.directory))
+    assert again.cached == ['clean', 'years'] and again.dataset is None
+    assert ResultCache(cache.directory).files[os.path.abspath(csv)][2] == fingerprint(csv)
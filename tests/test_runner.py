@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from tmdb_tools import synthetic
+from tmdb_tools.cleaning import clean
+from tmdb_tools.compact import compact
+from tmdb_tools.loader import COLUMNS, DTYPES
+from tmdb_tools.runner import SharedFrame, attach, run_sections
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    frame = synthetic.movies(3000, seed=2, columns=COLUMNS)
+    frame = frame.astype({column: DTYPES[column] for column in COLUMNS if column in DTYPES})
+    return clean(frame)[0]
+
+
+def test_attach_rebuilds_the_frame(dataset):
+    for frame in (dataset, compact(dataset), dataset.reset_index(drop=True)):
+        with SharedFrame(frame) as shared:
+            attached, blocks = attach(shared.spec)
+            tm.assert_frame_equal(attached, frame)
+            del attached, blocks
+
+
+def test_attached_columns_are_read_only(dataset):
+    with SharedFrame(dataset) as shared:
+        attached, blocks = attach(shared.spec)
+        with pytest.raises(ValueError):
+            attached.popularity.to_numpy()[0] = 0
+        del attached, blocks
+
+
+def test_close_removes_the_blocks(dataset):
+    shared = SharedFrame(dataset[['popularity', 'director']])
+    spec = shared.spec
+    shared.close()
+    with pytest.raises(FileNotFoundError):
+        attach(spec)
+
+
+def test_workers_give_the_results_of_one_process(dataset):
+    one = run_sections(dataset, processes=1)
+    two = run_sections(dataset, processes=2)
+    assert list(one) == list(two)
+    for name in one:
+        assert repr(one[name]) == repr(two[name]), name
+
+
+def test_missing_strings_survive(dataset):
+    frame = pd.DataFrame({'genres': ['Drama', None, 'Comedy', None],
+                          'popularity': np.arange(4.0)})
+    with SharedFrame(frame) as shared:
+        attached, blocks = attach(shared.spec)
+        tm.assert_frame_equal(attached, frame)
+        del attached, blocks
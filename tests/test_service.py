@@ -0,0 +1,106 @@
+import io
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from tmdb_tools import synthetic
+from tmdb_tools.loader import fingerprint, load_movies
+from tmdb_tools.service import QueryService, serve_http, serve_stdio
+
+
+@pytest.fixture
+def service(tmp_path):
+    path = synthetic.write_csv(str(tmp_path / 'movies.csv'), 2000, seed=3)
+    return QueryService(path)
+
+
+def test_version_is_the_loader_fingerprint(service):
+    assert service.version == fingerprint(service.path)
+    _, content = load_movies(service.path, cache=False, with_fingerprint=True)
+    assert content == service.version
+    with open(service.path, 'a') as f:
+        f.write(open(service.path).read().splitlines()[1] + '\n')
+    service.load()
+    assert service.version == fingerprint(service.path) != content
+
+
+def _get(port, path):
+    for _ in range(100):
+        try:
+            with urllib.request.urlopen('http://127.0.0.1:{}{}'.format(port, path)) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as error:
+            return error.code, json.loads(error.read())
+        except urllib.error.URLError:
+            time.sleep(0.05)
+    raise AssertionError('the server did not start')
+
+
+def test_http_errors(service, monkeypatch):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    threading.Thread(target=serve_http, args=(service, '127.0.0.1', port), daemon=True).start()
+
+    status, body = _get(port, '/top_movies?n=2')
+    assert status == 200 and len(body['data']) == 2
+    status, body = _get(port, '/no_such_query')
+    assert status == 400 and 'unknown query' in body['error']
+
+    def broken(name, params):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(service, 'answer', broken)
+    status, body = _get(port, '/top_movies')
+    assert status == 500 and body == {'error': 'RuntimeError: boom'}
+
+
+def test_negative_counts_are_rejected(service):
+    with pytest.raises(ValueError, match='n must not be negative'):
+        service.query('top_movies', n=-1)
+    with pytest.raises(ValueError, match='top must not be negative'):
+        service.query('director_ranking', metric='popularity', top=-5)
+
+
+def test_stdio_answers_every_line(service, monkeypatch):
+    original = service.answer
+
+    def answer(name, params):
+        if name == 'year_counts':
+            raise RuntimeError('boom')
+        return original(name, params)
+
+    monkeypatch.setattr(service, 'answer', answer)
+    requests = [{'query': 'top_movies', 'params': {'n': -1}}, {'query': 'year_counts'},
+                {'query': 'top_movies', 'params': {'n': 1}}]
+    stdout = io.StringIO()
+    serve_stdio(service, io.StringIO('\n'.join(map(json.dumps, requests)) + '\n'), stdout)
+    lines = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert lines[0] == {'error': 'n must not be negative, got -1'}
+    assert lines[1] == {'error': 'RuntimeError: boom'}
+    assert len(lines[2]['result']['data']) == 1
+
+
+def test_queries_run_outside_the_lock(service, monkeypatch):
+    free = []
+    top_movies = service.top_movies
+
+    def probe(*args, **kwargs):
+        # another thread can take the lock while this query computes
+        thread = threading.Thread(
+            target=lambda: free.append(service._lock.acquire(timeout=1) and
+                                       service._lock.release() is None))
+        thread.start()
+        thread.join()
+        return top_movies(*args, **kwargs)
+
+    monkeypatch.setattr(service, 'top_movies', probe)
+    assert len(service.query('top_movies', n=3)) == 3
+    assert free == [True]
+    assert service.query('top_movies', n=3) is service.query('top_movies', n=3)
+    assert service.info()['hits'] == 2
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from tmdb_tools.sketches import CoMoments, KLLSketch, Moments, describe
+
+
+def sample(n=20000, seed=0):
+    values = pd.Series(np.random.default_rng(seed).lognormal(size=n))
+    values[::100] = np.nan
+    return values
+
+
+def test_quantiles_are_within_the_rank_error():
+    values = sample()
+    sketch = KLLSketch.of(values.to_numpy(), k=200, seed=1, chunksize=1000)
+    assert len(sketch) == values.count()
+    qs = [0.1, 0.25, 0.5, 0.75, 0.9]
+    estimates = sketch.quantile(qs)
+    # the share of the values below every estimate
+    for q, estimate in zip(qs, estimates):
+        rank = (values.dropna() <= estimate).mean()
+        assert abs(rank - q) <= sketch.error_bound
+        assert abs(rank - q) <= 2 * sketch.error
+
+
+def test_merged_chunks_match_the_whole():
+    values = sample(seed=2)
+    chunks = np.array_split(values.to_numpy(), 4)
+    moments, sketch = Moments(), KLLSketch(k=400, seed=3)
+    for chunk in chunks:
+        moments.merge(Moments().update(chunk))
+        sketch.merge(KLLSketch.from_bytes(KLLSketch(k=400, seed=4).update(chunk).to_bytes()))
+    summary = describe(moments, sketch)
+    expected = values.describe()
+    np.testing.assert_allclose(summary[['count', 'mean', 'std', 'min', 'max']],
+                               expected[['count', 'mean', 'std', 'min', 'max']], rtol=1e-9)
+    for name, q in (('25%', 0.25), ('50%', 0.5), ('75%', 0.75)):
+        assert abs((values.dropna() <= summary[name]).mean() - q) <= 2 * sketch.error
+    other = values.shift(1) + sample(seed=5)
+    comoments = CoMoments()
+    for x, y in zip(chunks, np.array_split(other.to_numpy(), 4)):
+        comoments.update(x, y)
+    assert np.isclose(comoments.pearson, values.corr(other))
@@ -0,0 +1,125 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from tmdb_tools import cli, synthetic
+from tmdb_tools.cleaning import clean
+from tmdb_tools.loader import COLUMNS, read_csv_typed
+from tmdb_tools.runner import to_jsonable
+from tmdb_tools.snapshots import Snapshots
+
+FIELDS = ['id'] + COLUMNS
+
+
+@pytest.fixture(scope='module')
+def paths(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('snapshots')
+    jan = synthetic.movies(800, seed=7, columns=FIELDS)
+    # movies re-rated and re-credited, withdrawn and added
+    feb = jan.iloc[40:].copy()
+    feb['popularity'] = feb.popularity * np.linspace(0.5, 3, len(feb))
+    feb.loc[feb.index[:60], 'director'] = feb.director.iloc[60:120].to_numpy()
+    added = synthetic.movies(100, seed=8, columns=FIELDS)
+    added['id'] = jan.id.max() + 1 + np.arange(len(added))
+    feb = pd.concat([feb, added])
+    mar = feb.copy()
+    mar['revenue_adj'] = mar.revenue_adj * np.linspace(2, 0.5, len(mar))
+    paths = []
+    for name, frame in (('jan', jan), ('feb', feb), ('mar', mar)):
+        paths.append(str(directory / (name + '.csv')))
+        frame.to_csv(paths[-1], index=False)
+    return paths
+
+
+@pytest.fixture(scope='module')
+def snapshots(paths):
+    return Snapshots.load(paths)
+
+
+def cleaned(path):
+    frame = read_csv_typed(path, FIELDS, categorical=False).drop_duplicates('id', keep='last')
+    return clean(frame)[0].sort_values('id', kind='stable')
+
+
+def ranks(frame, metric):
+    order = frame.sort_values(metric, ascending=False, kind='stable').id
+    return pd.Series(np.arange(1, len(order) + 1), index=order.to_numpy())
+
+
+def director_counts(frame):
+    return frame.director.str.split('|').explode().value_counts()
+
+
+def outliers(frame, metric):
+    values = frame.set_index('id')[metric]
+    values = values[values > 0] if metric == 'revenue_adj' else values.dropna()
+    q1, q3 = values.quantile(0.25), values.quantile(0.75)
+    low, high = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+    return set(values.index[(values < low) | (values > high)])
+
+
+def test_summary(paths, snapshots):
+    assert snapshots.labels == ['jan', 'feb', 'mar']
+    summary = snapshots.summary()
+    frames = [cleaned(path) for path in paths]
+    assert summary.movies.tolist() == [len(frame) for frame in frames]
+    assert summary.directors.tolist() == [len(director_counts(frame)) for frame in frames]
+    assert summary.popularity_outliers.tolist() == [len(outliers(frame, 'popularity'))
+                                                    for frame in frames]
+
+
+def test_rank_changes(paths, snapshots):
+    before, after = [ranks(cleaned(path), 'popularity') for path in paths[:2]]
+    changes = snapshots.rank_changes('popularity', 20, 'jan', 'feb')
+    ids = sorted(set(before.index[:20]) | set(after.index[:20]))
+    assert sorted(changes.index) == ids
+    expected = pd.DataFrame({'rank_before': before.reindex(ids).astype(float),
+                             'rank_after': after.reindex(ids).astype(float)},
+                            index=pd.Index(ids, name='id'))
+    tm.assert_frame_equal(changes[['rank_before', 'rank_after']].sort_index(), expected)
+    # withdrawn movies are listed without a later rank
+    assert changes.rank_after.isnull().any() and changes.change.notnull().any()
+    tm.assert_series_equal(changes.change, changes.rank_before - changes.rank_after,
+                           check_names=False)
+
+
+def test_director_changes(paths, snapshots):
+    before, after = [director_counts(cleaned(path)) for path in paths[:2]]
+    expected = after.sub(before, fill_value=0)
+    expected = expected[expected != 0]
+    changes = snapshots.director_changes(10, 'jan', 'feb')
+    assert len(changes) == 10
+    assert (changes.change.to_numpy() == expected[changes.index].to_numpy()).all()
+    assert (changes.before.to_numpy() == before.reindex(changes.index, fill_value=0)).all()
+    # the largest changes, whichever way
+    largest = np.sort(expected.abs().to_numpy())[::-1]
+    assert sorted(changes.change.abs(), reverse=True) == list(largest[:10])
+
+
+@pytest.mark.parametrize('metric', ['popularity', 'revenue_adj'])
+def test_outlier_changes(paths, snapshots, metric):
+    frames = [cleaned(path) for path in (paths[0], paths[2])]
+    before, after = [outliers(frame, metric) for frame in frames]
+    changes = snapshots.outlier_changes(metric, 'jan', 'mar')
+    assert len(changes['new']) and len(changes['removed'])
+    assert set(changes['new'].index) == after - before
+    assert set(changes['removed'].index) == before - after
+    for name, other in (('new', frames[0]), ('removed', frames[1])):
+        assert changes[name].present.tolist() == changes[name].index.isin(other.id).tolist()
+
+
+def test_snapshots_by_label_or_position(paths, snapshots, tmp_path):
+    by_label = snapshots.report(5, 'jan', 'mar')
+    by_position = snapshots.report(5, 0, -1)
+    assert by_label.keys() == by_position.keys()
+    assert to_jsonable(by_label) == to_jsonable(by_position)
+    assert to_jsonable(by_label) != to_jsonable(snapshots.report(5))
+
+    cli.main(['compare'] + paths + ['--before', 'jan', '--after', 'mar', '--top', '5',
+                                    '--out', str(tmp_path)])
+    with open(os.path.join(str(tmp_path), 'snapshots.json')) as f:
+        assert json.load(f) == json.loads(json.dumps(to_jsonable(by_label)))
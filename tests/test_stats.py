@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+from scipy import stats as scipy_stats
+
+from tmdb_tools import stats
+
+
+def sample(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.round(rng.lognormal(size=n), 1)
+    # rounded, so that both columns have ties
+    return x, np.round(x + rng.normal(size=n))
+
+
+def test_spearman_resamples_are_ranked_again():
+    x, y = sample()
+    stats._init_sample(x, y, 'spearman')
+    try:
+        got = stats._bootstrap_batch(20, np.random.SeedSequence(5))
+    finally:
+        stats._sample.clear()
+    rng = np.random.default_rng(np.random.SeedSequence(5))
+    expected = [scipy_stats.spearmanr(x[rows], y[rows]).statistic
+                for rows in (rng.integers(0, len(x), len(x)) for _ in range(20))]
+    np.testing.assert_allclose(got, expected, rtol=0, atol=1e-12)
+
+
+def test_intervals_do_not_depend_on_processes():
+    x, y = sample()
+    for method in stats.METHODS:
+        in_process = stats.bootstrap(x, y, method, 100, seed=1, processes=1)
+        assert stats.bootstrap(x, y, method, 100, seed=1, processes=2) == in_process
+
+
+def test_correlations_start_one_pool(monkeypatch):
+    started = []
+
+    class Pool(stats.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            started.append(args)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(stats, 'ProcessPoolExecutor', Pool)
+    # several batches per bootstrap
+    monkeypatch.setattr(stats, 'BATCH_CELLS', 3000)
+    x, y = sample()
+    frame = pd.DataFrame({'popularity': x, 'revenue_adj': y})
+    pooled = stats.correlations(frame, methods=('pearson', 'spearman'), n_resamples=50,
+                                seed=0, processes=2)
+    assert len(started) == 1
+    in_process = stats.correlations(frame, methods=('pearson', 'spearman'), n_resamples=50,
+                                    seed=0, processes=1)
+    assert len(started) == 1
+    pd.testing.assert_frame_equal(pooled, in_process)
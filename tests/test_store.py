@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from test_compact import assert_same
+from tmdb_tools import synthetic
+from tmdb_tools.cleaning import clean
+from tmdb_tools.loader import COLUMNS
+from tmdb_tools.runner import run_sections
+from tmdb_tools.store import MovieStore, write_store
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    dataset = clean(synthetic.movies(5000, seed=5, columns=COLUMNS))[0]
+    # a missing value in a string column
+    dataset.loc[dataset.index[0], 'cast'] = np.nan
+    return dataset
+
+
+@pytest.fixture
+def store(dataset, tmp_path):
+    return MovieStore(write_store(dataset, str(tmp_path / 'movies.store'), {'clean': {'a': 1}}))
+
+
+def test_round_trip(dataset, store):
+    assert len(store) == len(dataset) and store.columns == list(dataset.columns)
+    assert store.meta == {'clean': {'a': 1}}
+    tm.assert_frame_equal(store.frame(categorical=False), dataset, check_categorical=False)
+    frame = store.frame()
+    for name in dataset.columns:
+        if dataset[name].dtype == object or isinstance(dataset[name].dtype, pd.StringDtype):
+            assert isinstance(frame[name].dtype, pd.CategoricalDtype)
+            tm.assert_series_equal(frame[name].astype(dataset[name].dtype), dataset[name])
+
+
+def test_columns_are_views_of_the_mapped_files(store):
+    frame = store.frame()
+    assert np.shares_memory(frame.popularity.to_numpy(), store.array('popularity'))
+    for name in ('director', 'genres'):
+        assert np.shares_memory(frame[name].array.codes, store.array(name))
+    with pytest.raises(ValueError):
+        store.array('popularity')[0] = 0
+
+
+def test_write_replaces_the_store(dataset, store):
+    directory = store.directory
+    write_store(dataset.head(10), directory)
+    assert len(MovieStore(directory)) == 10
+    assert sorted(os.listdir(os.path.dirname(directory))) == ['movies.store']
+
+
+def test_sections_on_the_store(dataset, store):
+    expected = run_sections(dataset, processes=1)
+    for processes in (1, 2):
+        result = run_sections(store, processes=processes)
+        for name in expected:
+            assert_same(expected[name], result[name], name)
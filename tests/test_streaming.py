@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+
+from tmdb_tools import analysis, synthetic
+from tmdb_tools.cleaning import clean
+from tmdb_tools.loader import COLUMNS, read_csv_typed
+from tmdb_tools.streaming import StreamingAnalysis, run_streaming
+
+
+def movies(rows):
+    # a chunk as read by `read_csv_typed(..., categorical=False)`
+    frame = pd.DataFrame(rows, columns=['popularity', 'director', 'genres', 'release_year',
+                                        'revenue_adj'])
+    frame['original_title'] = ['movie {}'.format(i) for i in range(len(frame))]
+    frame['cast'] = 'Actor'
+    frame['runtime'] = np.float32(100)
+    frame['production_companies'] = 'Studio'
+    frame['release_date'] = '1/1/00'
+    frame['budget_adj'] = 0.0
+    return frame.astype({'release_year': 'int16'})[COLUMNS]
+
+
+FIRST = movies([(1.0, 'A', 'Drama', 2000, 10.0),
+                (2.0, 'B', 'Drama|Comedy', 2001, 0.0)])
+# a genre the first chunk lacks, in a year it lacks, and not in its years
+SECOND = movies([(3.0, 'A', 'Horror', 2002, 5.0),
+                 (0.5, 'C', None, 2000, 1.0),
+                 (4.0, 'C', 'Western|Drama', 2003, 0.0)])
+
+
+def assert_counts_match(result, dataset):
+    expected = analysis.genres(dataset)
+    tm.assert_series_equal(result['genre_distribution'], expected['distribution'],
+                           check_names=False)
+    assert result['pop_gen'] == expected['pop_gen']
+    tm.assert_series_equal(result['year_counts'].sort_index(),
+                           analysis.years(dataset)['counts'], check_names=False)
+    expected = analysis.directors(dataset)
+    tm.assert_series_equal(result['director_counts_summary'], expected['summary'],
+                           check_names=False)
+    # ties may come in another order
+    assert list(result['director_counts']) == list(expected['top10'])
+
+
+def test_update_with_disjoint_genres_and_years():
+    streamed = StreamingAnalysis().update(FIRST).update(SECOND).result()
+    dataset, _ = clean(pd.concat([FIRST, SECOND]))
+    assert_counts_match(streamed, dataset)
+    assert streamed['clean']['rows kept'] == 4
+
+
+def test_merge_with_disjoint_genres_and_years():
+    merged = StreamingAnalysis().update(FIRST).merge(StreamingAnalysis().update(SECOND))
+    dataset, _ = clean(pd.concat([FIRST, SECOND]))
+    assert_counts_match(merged.result(), dataset)
+
+
+def test_no_rows():
+    result = StreamingAnalysis().update(movies([(1.0, 'A', None, 2000, 1.0)])).result()
+    assert result['clean']['rows kept'] == 0
+    assert result['director_counts'].empty
+    assert result['genre_distribution'].empty
+    assert result['top_popular'].empty
+    assert StreamingAnalysis().result()['year_counts'].empty
+
+
+def test_matches_in_memory_analysis(tmp_path):
+    path = synthetic.write_csv(str(tmp_path / 'movies.csv'), 5000, seed=1)
+    streamed = run_streaming(path, chunksize=700)
+    dataset, report = clean(read_csv_typed(path))
+    tm.assert_series_equal(streamed['clean'], report)
+    assert_counts_match(streamed, dataset)
+    expected = analysis.popularity(dataset)
+    tm.assert_frame_equal(streamed['top_popular'].reset_index(drop=True),
+                          expected['top10'].reset_index(drop=True), check_dtype=False,
+                          check_categorical=False)
+    assert streamed['revenue_zero'] == analysis.revenue(dataset)['zero']
@@ -0,0 +1,22 @@
+import pandas as pd
+import pandas.testing as tm
+
+from tmdb_tools import synthetic
+from tmdb_tools.multivalue import MultiValueIndex
+
+
+def test_no_name_dominates():
+    frame = synthetic.movies(20000, seed=0, columns=['cast', 'director', 'production_companies'])
+    for column in frame.columns:
+        counts = MultiValueIndex.from_series(frame[column]).counts()
+        # skewed, but with no single name collecting the tail of the distribution
+        assert counts.iloc[0] < 0.01 * counts.sum(), column
+        assert counts.iloc[0] < 3 * counts.iloc[10], column
+
+
+def test_columns_do_not_depend_on_the_selection():
+    full = synthetic.movies(1000, seed=2)
+    assert list(full.columns) == synthetic.SCHEMA
+    subset = synthetic.movies(1000, seed=2, columns=['genres', 'popularity'])
+    tm.assert_frame_equal(subset, full[['genres', 'popularity']])
+    assert pd.Series(full.release_year).between(synthetic.FIRST_YEAR, synthetic.LAST_YEAR).all()
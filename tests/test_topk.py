@@ -0,0 +1,37 @@
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from tmdb_tools.topk import Leaderboard, TopK
+
+
+def frame():
+    return pd.DataFrame({'popularity': [3.0, 1.0, 5.0, 3.0, 2.0, 4.0],
+                         'revenue_adj': [10.0, 60.0, 20.0, 40.0, 50.0, 30.0],
+                         'director': pd.Categorical(['B', 'A', 'B', 'C', 'A', 'C'])})
+
+
+def test_heads_match_sort_values():
+    dataset = frame()
+    top = TopK(dataset, 'popularity', k=4)
+    expected = dataset.sort_values('popularity', ascending=False, kind='stable')
+    for n in range(5):
+        tm.assert_frame_equal(top.head(n), expected.head(n))
+    tm.assert_frame_equal(top.describe(3), expected.head(3).describe())
+    with pytest.raises(ValueError, match='only the top 4 rows'):
+        top.head(5)
+
+
+def test_value_counts_of_a_head():
+    dataset = frame()
+    board = Leaderboard(dataset, k=3)
+    expected = dataset.sort_values('revenue_adj', ascending=False).head(3)
+    tm.assert_frame_equal(board.top('revenue_adj', 3), expected)
+    counts = board.value_counts('revenue_adj', 'director', 3)
+    # unlike a categorical value_counts, directors missing from the head are left out
+    assert counts.to_dict() == expected.director.value_counts().loc[lambda c: c > 0].to_dict()
+    assert list(counts.index) == ['A', 'C']
+    # a longer head reselects
+    tm.assert_frame_equal(board.top('revenue_adj', 5),
+                          dataset.sort_values('revenue_adj', ascending=False).head(5))
+    assert list(board.metrics()) == ['revenue_adj']
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from tmdb_tools.trends import GenreTrends
+
+
+def frame():
+    # no movie in 2002
+    return pd.DataFrame({
+        'release_year': [2000, 2000, 2001, 2001, 2003, 2003, 2004],
+        'genres': ['Drama|Comedy', 'Drama', 'Comedy', None, 'Action|Drama', 'Comedy',
+                   'Drama'],
+        'popularity': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0],
+        'revenue_adj': [10.0, 0.0, 30.0, 40.0, 50.0, 0.0, 70.0],
+    })
+
+
+def rolling(dataset, size):
+    # per year and genre sums, rolled over every calendar year with pandas
+    pairs = dataset.assign(genre=dataset.genres.str.split('|')).explode('genre').dropna(
+        subset=['genre'])
+    years = pd.RangeIndex(dataset.release_year.min(), dataset.release_year.max() + 1)
+    earning = pairs.revenue_adj.where(pairs.revenue_adj > 0)
+
+    def table(values, func):
+        return (values.groupby([pairs.release_year, pairs.genre]).agg(func).unstack()
+                .reindex(years).fillna(0).rolling(size).sum().iloc[size - 1:])
+
+    count = table(pairs.popularity, 'count')
+    movies = (dataset[dataset.genres.notnull()].groupby('release_year').size()
+              .reindex(years, fill_value=0).rolling(size).sum().iloc[size - 1:])
+    return {'count': count, 'share': count.div(movies, axis=0),
+            'popularity': table(pairs.popularity, 'sum') / count,
+            'revenue_adj': table(earning, 'sum') / table(earning, 'count')}
+
+
+@pytest.mark.parametrize('size', [1, 2, 3])
+def test_windows_match_pandas_rolling(size):
+    dataset = frame()
+    trends = GenreTrends(dataset)
+    assert list(trends.genres) == ['Drama', 'Comedy', 'Action']
+    window = trends.window(size)
+    expected = rolling(dataset, size)
+    for name in ('count', 'share', 'popularity', 'revenue_adj'):
+        tm.assert_frame_equal(getattr(window, name), expected[name][trends.genres],
+                              check_dtype=False, check_names=False,
+                              check_index_type=False, check_column_type=False)
+
+
+def test_leaders_and_slopes():
+    trends = GenreTrends(frame())
+    assert trends.leaders(1).to_dict() == {2000: 'Drama', 2001: 'Comedy', 2002: 'Drama',
+                                          2003: 'Drama', 2004: 'Drama'}
+    share = trends.window(2).share
+    expected = {genre: np.polyfit(share.index, share[genre], 1)[0] for genre in share}
+    assert trends.slopes(2).to_dict() == pytest.approx(expected)
+    with pytest.raises(ValueError, match='size must be between 1 and 5'):
+        trends.window(6)
@@ -0,0 +1,7 @@
+"""Helpers behind the TMDB exploration in TMDb.py.
+
+The modules are kept import-light on purpose: import the one you need,
+e.g. ``from tmdb_tools.genres import genre_year_counts``.
+"""
+
+__version__ = '0.1.0'
@@ -0,0 +1,90 @@
+"""The notebook's exploratory analysis as independent sections.
+
+Every section takes the cleaned dataset and returns a dict of results
+(tables, series and numbers); none of them modifies the dataset, so they
+can run in any order or in parallel (see `tmdb_tools.runner`).
+`SECTIONS` lists them in the order of the notebook.
+"""
+
+from collections import OrderedDict
+
+from .fences import iqr_fences, outlier_masks
+from .filters import Between, select
+from .genres import genre_distribution, genre_year_counts, most_frequent_by_year
+from .topk import TopK, ranked_counts
+
+# `director` may name several directors; a movie counts for each of them,
+# as in `DirectorTable`
+DIRECTOR_SEP = '|'
+
+
+def popularity(dataset):
+    """Questions 1-3: popularity, the most popular movies and their directors."""
+    fences = iqr_fences(dataset.popularity)
+    regular, outlier = outlier_masks(dataset.popularity, fences)
+    top = TopK(dataset, 'popularity', 100)
+    return {
+        'summary': dataset.popularity.describe(),
+        'fences': fences._asdict(),
+        'regular': int(regular.sum()),
+        'outlier': int(outlier.sum()),
+        'regular_summary': dataset.popularity[regular].describe(),
+        'top10': top.head(10),
+        'top10_summary': top.describe(10),
+        'top_directors': top.value_counts('director', 100, DIRECTOR_SEP)[:10],
+    }
+
+
+def revenue(dataset):
+    """Questions 4-6: revenue, the top-grossing movies and their directors."""
+    dataset_rev = select(dataset, revenue_adj=Between(0))
+    fences = iqr_fences(dataset_rev.revenue_adj)
+    regular, outlier = outlier_masks(dataset_rev.revenue_adj, fences)
+    top = TopK(dataset, 'revenue_adj', 100)
+    return {
+        'zero': int((dataset.revenue_adj == 0).sum()),
+        'summary': dataset_rev.revenue_adj.describe(),
+        'fences': fences._asdict(),
+        'regular': int(regular.sum()),
+        'outlier': int(outlier.sum()),
+        'regular_summary': dataset_rev.revenue_adj[regular].describe(),
+        'outlier_summary': dataset_rev.revenue_adj[outlier].describe(),
+        'top10': top.head(10),
+        'top50_summary': top.describe(50),
+        'top_directors': top.value_counts('director', 100, DIRECTOR_SEP)[:10],
+    }
+
+
+def directors(dataset):
+    """Question 8: the most productive directors."""
+    counts = ranked_counts(dataset.director, DIRECTOR_SEP)
+    return {
+        'top10': counts[:10],
+        'summary': counts.describe(),
+    }
+
+
+def years(dataset):
+    """Question 9: the yearly movie production."""
+    return {
+        'counts': dataset.release_year.value_counts().sort_index(),
+    }
+
+
+def genres(dataset):
+    """Question 10: the most frequent genre of every year."""
+    counts = genre_year_counts(dataset)
+    return {
+        'pop_gen': {str(year): genre for year, genre in most_frequent_by_year(counts).items()},
+        'counts': counts,
+        'distribution': genre_distribution(counts),
+    }
+
+
+SECTIONS = OrderedDict([
+    ('popularity', popularity),
+    ('revenue', revenue),
+    ('directors', directors),
+    ('years', years),
+    ('genres', genres),
+])
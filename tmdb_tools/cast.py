@@ -0,0 +1,160 @@
+"""Actor aggregates and actor-director collaborations.
+
+``cast`` lists the actors of a movie joined by ``'|'``.  `CastTable` parses
+the column once into a `MultiValueIndex`: one int32 actor code per
+(actor, movie) credit, in movie order.  Every per-actor statistic is then
+a bincount or a segmented reduction over the credits, and the
+actor x director co-occurrence counts are the sparse product
+``cast.T @ directors`` of the two movie incidence matrices.  No Python
+loop runs over actors or movies.
+
+Memory stays proportional to the number of credits: the credits are a
+few arrays of 4 or 8 bytes each, and no frame with one row per credit is
+built.  Without scipy, the co-occurrences are counted with numpy instead.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .multivalue import MultiValueIndex
+from .profiling import stage
+
+
+def _has_scipy():
+    try:
+        import scipy.sparse  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _segment_medians(values, starts, counts):
+    # medians of the consecutive, sorted segments of `values`
+    low = values[starts + (counts - 1) // 2]
+    high = values[starts + counts // 2]
+    return (low + high) / 2
+
+
+class CastTable(object):
+    """Per-actor statistics of `dataset` and its actor-director collaborations.
+
+    `table` holds, per actor: the number of movies, mean and median
+    popularity, total ``revenue_adj``, first and last release year and the
+    career span in years.  Pass the `MultiValueIndex` of the cast column
+    as `index`, and of the director column as `directors`, to reuse
+    already parsed columns.
+    """
+
+    def __init__(self, dataset, sep='|', index=None, directors=None):
+        with stage('cast', len(dataset)) as record:
+            self._build(dataset, sep, index, directors)
+            record.rows_out = len(self.table)
+
+    def _build(self, dataset, sep, index, directors):
+        self.actors = index if index is not None else \
+            MultiValueIndex.from_series(dataset.cast, sep)
+        self.directors = directors if directors is not None else \
+            MultiValueIndex.from_series(dataset.director, sep)
+        actors, rows = self.actors.codes, self.actors.rows
+        n = self.actors.n_tokens
+
+        movies = np.bincount(actors, minlength=n)
+        popularity = dataset.popularity.to_numpy(dtype=float)[rows]
+        revenue = dataset.revenue_adj.to_numpy(dtype=float)[rows]
+        years = dataset.release_year.to_numpy(dtype=np.int64)[rows]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            popularity_mean = np.bincount(actors, popularity, n) / movies
+
+        # the credits of every actor together, by increasing popularity:
+        # medians and first/last years are read off the segments
+        order = np.lexsort((popularity, actors))
+        starts = np.zeros(n, dtype=np.int64)
+        np.cumsum(movies[:-1], out=starts[1:])
+        present = movies > 0
+        popularity_median = np.full(n, np.nan)
+        popularity_median[present] = _segment_medians(popularity[order], starts[present],
+                                                      movies[present])
+        first_year = np.zeros(n, dtype=np.int64)
+        last_year = np.zeros(n, dtype=np.int64)
+        sorted_years = years[order]
+        first_year[present] = np.minimum.reduceat(sorted_years, starts[present])
+        last_year[present] = np.maximum.reduceat(sorted_years, starts[present])
+
+        table = pd.DataFrame({
+            'movies': movies,
+            'popularity_mean': popularity_mean,
+            'popularity_median': popularity_median,
+            'revenue_sum': np.bincount(actors, np.nan_to_num(revenue), n),
+            'first_year': first_year,
+            'last_year': last_year,
+        }, index=pd.Index(self.actors.tokens, name='actor'))
+        table['career_span'] = table.last_year - table.first_year + 1
+        self.table = table[present]
+        self._orders = {}
+        self._cooccurrence = None
+
+    def __len__(self):
+        return len(self.table)
+
+    def __repr__(self):
+        return '<CastTable {} actors, {} credits>'.format(len(self), len(self.actors.codes))
+
+    def top(self, by='movies', n=10, min_movies=1):
+        """The `n` actors with the largest `by`, among those with `min_movies` movies."""
+        if by not in self._orders:
+            values = self.table[by].to_numpy(dtype=float)
+            self._orders[by] = np.argsort(-values, kind='stable')
+        order = self._orders[by]
+        if min_movies > 1:
+            order = order[self.table.movies.to_numpy()[order] >= min_movies]
+        return self.table.iloc[order[:n]]
+
+    # collaborations
+
+    def _count_pairs(self):
+        # (actor, director, movies) of every pair that shares a movie
+        if _has_scipy():
+            product = (self.actors.to_sparse().T.tocsr() @ self.directors.to_sparse()).tocoo()
+            return product.row, product.col, product.data
+        # one (actor, director) pair per credit and director of its movie
+        rows = self.actors.rows
+        lengths = self.directors.lengths[rows]
+        credits = np.repeat(np.arange(len(rows)), lengths)
+        within = np.arange(len(credits)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        directors = self.directors.codes[self.directors.offsets[rows[credits]] + within]
+        keys = self.actors.codes[credits].astype(np.int64) * self.directors.n_tokens + directors
+        keys, counts = np.unique(keys, return_counts=True)
+        return keys // self.directors.n_tokens, keys % self.directors.n_tokens, counts
+
+    def _pairs(self):
+        if self._cooccurrence is None:
+            actors, directors, counts = self._count_pairs()
+            order = np.lexsort((directors, actors, -counts))
+            self._cooccurrence = (actors[order], directors[order],
+                                  counts[order].astype(np.int64))
+        return self._cooccurrence
+
+    def cooccurrence(self):
+        """The actor x director matrix of shared movies (scipy CSR)."""
+        from scipy import sparse
+
+        actors, directors, counts = self._pairs()
+        return sparse.csr_matrix((counts, (actors, directors)),
+                                 shape=(self.actors.n_tokens, self.directors.n_tokens))
+
+    def collaborations(self, n=10, actor=None, director=None):
+        """The `n` actor-director pairs with the most movies together.
+
+        Restrict to one `actor` or one `director` to list their most
+        frequent partners.
+        """
+        actors, directors, counts = self._pairs()
+        keep = np.ones(len(counts), dtype=bool)
+        if actor is not None:
+            keep &= actors == self.actors.code(actor)
+        if director is not None:
+            keep &= directors == self.directors.code(director)
+        picked = np.flatnonzero(keep)[:n]
+        return pd.DataFrame({'actor': self.actors.tokens.take(actors[picked]),
+                             'director': self.directors.tokens.take(directors[picked]),
+                             'movies': counts[picked]})
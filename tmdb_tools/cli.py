@@ -0,0 +1,281 @@
+"""Command-line entry point: ``python -m tmdb_tools``.
+
+Commands:
+
+``report``
+    Load and clean the CSV, run the analysis sections and write
+    ``report.json`` plus one CSV file per table; ``--figures`` also
+    renders the figures, in parallel and skipping unchanged ones.
+    Results are kept on disk, and sections whose input and code did not
+    change are read back instead of recomputed (`tmdb_tools.result_cache`).
+    With ``--store DIR`` the cleaned table is mapped from a store written
+    by the ``store`` command instead, and the result cache is not used.
+``store``
+    Load and clean the CSV once and write it as a memory-mapped columnar
+    store (`tmdb_tools.store`) that any process opens without parsing.
+``stream``
+    Answer the same questions chunk by chunk, for CSV files that do not
+    fit in memory, and write ``stream.json``.
+``serve``
+    Load and clean the CSV once and answer parameterized queries over
+    HTTP (``--port``) or JSON lines on stdin/stdout (``--stdio``).
+``apply``
+    Fold delta CSV files of new and updated movies into the incremental
+    state kept in ``--state`` and write ``incremental.json``.
+``compare``
+    Load several snapshots of the CSV, oldest first, and write
+    ``snapshots.json`` with the rank, director and outlier changes
+    between two of them (the last two by default).
+
+``--profile`` (or the ``TMDB_PROFILE`` environment variable) also writes
+``profile.json`` with the wall time, CPU time, rows and memory of every
+stage, and ``--profile-stage NAME`` a cProfile dump of one stage; see
+`tmdb_tools.profiling`.
+
+Only the standard library is imported at start-up; pandas is loaded by the
+commands and matplotlib only when figures are requested, so scheduled runs
+start fast and need neither IPython nor a display.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+
+def _write_json(data, path):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
+
+
+def _start_profiling(args):
+    from . import profiling
+
+    if args.profile or args.profile_stage:
+        profiling.enable(args.profile_stage, directory=args.out)
+    return profiling.profiler
+
+
+def _write_profile(profiler, directory):
+    if profiler.enabled:
+        os.makedirs(directory, exist_ok=True)
+        print(profiler.write(os.path.join(directory, 'profile.json')))
+
+
+def report(args):
+    profiler = _start_profiling(args)
+    from .cleaning import clean
+    from .loader import load_movies
+    from .runner import run_sections
+
+    cached = []
+    if args.store:
+        import pandas as pd
+
+        from .store import MovieStore
+
+        start = time.perf_counter()
+        dataset = MovieStore(args.store)
+        clean_report = pd.Series(dataset.meta['clean'], name='dropped', dtype='int64')
+        loaded = time.perf_counter() - start
+        result = run_sections(dataset, args.sections, processes=args.processes)
+    elif args.no_result_cache:
+        start = time.perf_counter()
+        dataset, clean_report = clean(load_movies(args.csv, cache=not args.no_cache))
+        loaded = time.perf_counter() - start
+        result = run_sections(dataset, args.sections, processes=args.processes)
+    else:
+        from .result_cache import ResultCache, default_directory, run_cached
+
+        cache = ResultCache(args.result_cache or default_directory(args.csv))
+        result, clean_report, dataset, cached, loaded = run_cached(
+            args.csv, args.sections, args.processes, cache, load_cache=not args.no_cache)
+
+    tables = os.path.join(args.out, 'tables')
+    os.makedirs(tables, exist_ok=True)
+    clean_report.to_csv(os.path.join(tables, 'clean.csv'))
+    for section, name, table in result.tables():
+        table.to_csv(os.path.join(tables, '{}_{}.csv'.format(section, name)))
+
+    output = result.to_dict()
+    output['clean'] = {key: int(value) for key, value in clean_report.items()}
+    output['load_seconds'] = loaded
+    output['cached'] = cached
+    if args.figures:
+        from .plots import render_figures
+        if dataset is None:
+            dataset, _ = clean(load_movies(args.csv, cache=not args.no_cache))
+        elif args.store:
+            dataset = dataset.frame()
+        figures_start = time.perf_counter()
+        rendered = render_figures(dataset, os.path.join(args.out, 'figures'),
+                                  formats=args.format, processes=args.processes)
+        output['figures'] = {name: {'paths': paths, 'drawn': drawn}
+                             for name, (paths, drawn) in rendered.items()}
+        output['figure_seconds'] = time.perf_counter() - figures_start
+    _write_json(output, os.path.join(args.out, 'report.json'))
+    print(os.path.join(args.out, 'report.json'))
+    _write_profile(profiler, args.out)
+
+
+def store(args):
+    from .cleaning import clean
+    from .loader import load_movies
+    from .store import write_store
+
+    dataset, content = load_movies(args.csv, cache=not args.no_cache, with_fingerprint=True)
+    dataset, clean_report = clean(dataset)
+    meta = {'source': os.path.abspath(args.csv), 'fingerprint': content,
+            'clean': {key: int(value) for key, value in clean_report.items()}}
+    print(write_store(dataset, args.out, meta))
+
+
+def stream(args):
+    profiler = _start_profiling(args)
+    from .runner import to_jsonable
+    from .streaming import run_streaming
+
+    result = run_streaming(args.csv, chunksize=args.chunksize)
+    result = {key: (value._asdict() if hasattr(value, '_asdict') else value)
+              for key, value in result.items()}
+    os.makedirs(args.out, exist_ok=True)
+    _write_json(to_jsonable(result), os.path.join(args.out, 'stream.json'))
+    print(os.path.join(args.out, 'stream.json'))
+    _write_profile(profiler, args.out)
+
+
+def serve(args):
+    from .service import QueryService, serve_http, serve_stdio
+
+    service = QueryService(args.csv)
+    if args.stdio:
+        serve_stdio(service)
+    else:
+        print('serving {} movies on http://{}:{}/'.format(len(service.dataset), args.host,
+                                                          args.port), file=sys.stderr)
+        serve_http(service, args.host, args.port)
+
+
+def apply(args):
+    from .incremental import IncrementalState
+    from .runner import to_jsonable
+
+    state = IncrementalState.open(args.state)
+    for path in args.csv:
+        state.apply(path)
+    result = {key: (value._asdict() if hasattr(value, '_asdict') else value)
+              for key, value in state.result().items()}
+    os.makedirs(args.out, exist_ok=True)
+    _write_json(to_jsonable(result), os.path.join(args.out, 'incremental.json'))
+    print(os.path.join(args.out, 'incremental.json'))
+
+
+def compare(args):
+    from .runner import to_jsonable
+    from .snapshots import Snapshots
+
+    snapshots = Snapshots.load(args.csv)
+    result = snapshots.report(args.top, args.before, args.after)
+    os.makedirs(args.out, exist_ok=True)
+    _write_json(to_jsonable(result), os.path.join(args.out, 'snapshots.json'))
+    print(os.path.join(args.out, 'snapshots.json'))
+
+
+def _snapshot(value):
+    # a snapshot position, or its label
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def _add_profile_options(command):
+    command.add_argument('--profile', action='store_true',
+                         help='write profile.json with per-stage timings')
+    command.add_argument('--profile-stage', metavar='STAGE',
+                         help='also dump a cProfile trace of this stage')
+
+
+def parser():
+    main_parser = argparse.ArgumentParser(
+        prog='python -m tmdb_tools', description='Batch analysis of tmdb-movies.csv.')
+    commands = main_parser.add_subparsers(dest='command')
+    commands.required = True
+
+    command = commands.add_parser('report', help='run the full analysis')
+    command.add_argument('csv', nargs='?', default='tmdb-movies.csv')
+    command.add_argument('--out', default='report', help='output directory (default: report)')
+    command.add_argument('--sections', nargs='+', metavar='SECTION',
+                         help='sections to run (default: all)')
+    command.add_argument('--processes', type=int,
+                         help='worker processes (default: one per section and CPU)')
+    command.add_argument('--no-cache', action='store_true',
+                         help='parse the CSV even when a cached snapshot exists')
+    command.add_argument('--result-cache', metavar='DIR',
+                         help='where results are kept between runs '
+                              '(default: .tmdb_cache/results next to the CSV)')
+    command.add_argument('--no-result-cache', action='store_true',
+                         help='recompute every result and leave the result cache alone')
+    command.add_argument('--store', metavar='DIR',
+                         help='analyse the cleaned table of this store instead of the CSV')
+    command.add_argument('--figures', action='store_true', help='also save the figures')
+    command.add_argument('--format', nargs='+', default=['png'], choices=['png', 'svg', 'pdf'],
+                         help='figure formats (default: png)')
+    _add_profile_options(command)
+    command.set_defaults(run=report)
+
+    command = commands.add_parser('store', help='write the cleaned CSV as a memory-mapped store')
+    command.add_argument('csv', nargs='?', default='tmdb-movies.csv')
+    command.add_argument('--out', default='tmdb-movies.store',
+                         help='store directory (default: tmdb-movies.store)')
+    command.add_argument('--no-cache', action='store_true',
+                         help='parse the CSV even when a cached snapshot exists')
+    command.set_defaults(run=store)
+
+    command = commands.add_parser('stream', help='analyse a CSV chunk by chunk')
+    command.add_argument('csv', nargs='?', default='tmdb-movies.csv')
+    command.add_argument('--out', default='report', help='output directory (default: report)')
+    command.add_argument('--chunksize', type=int, default=100000)
+    _add_profile_options(command)
+    command.set_defaults(run=stream)
+
+    command = commands.add_parser('serve', help='answer queries over HTTP or stdio')
+    command.add_argument('csv', nargs='?', default='tmdb-movies.csv')
+    command.add_argument('--host', default='127.0.0.1')
+    command.add_argument('--port', type=int, default=8000)
+    command.add_argument('--stdio', action='store_true',
+                         help='read JSON-line queries from stdin instead of serving HTTP')
+    command.set_defaults(run=serve)
+
+    command = commands.add_parser('apply', help='apply delta CSV files to the incremental state')
+    command.add_argument('csv', nargs='+', help='delta CSV files, applied in order')
+    command.add_argument('--state', default='.tmdb_state',
+                         help='state directory (default: .tmdb_state)')
+    command.add_argument('--out', default='report', help='output directory (default: report)')
+    command.set_defaults(run=apply)
+
+    command = commands.add_parser('compare', help='compare snapshots of the CSV')
+    command.add_argument('csv', nargs='+', help='snapshot CSV files, oldest first')
+    command.add_argument('--before', type=_snapshot, default=-2,
+                         help='earlier snapshot, by position or file name (default: -2)')
+    command.add_argument('--after', type=_snapshot, default=-1,
+                         help='later snapshot, by position or file name (default: -1)')
+    command.add_argument('--top', type=int, default=10, help='length of the ranked lists')
+    command.add_argument('--out', default='report', help='output directory (default: report)')
+    command.set_defaults(run=compare)
+    return main_parser
+
+
+def main(argv=None):
+    main_parser = parser()
+    args = main_parser.parse_args(argv)
+    if args.command == 'compare' and len(args.csv) < 2:
+        main_parser.error('compare needs at least two snapshot CSV files, got {}'
+                          .format(len(args.csv)))
+    args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
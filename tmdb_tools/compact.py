@@ -0,0 +1,104 @@
+"""Compact in-memory representation of the cleaned movie table.
+
+After cleaning, the text columns dominate the memory footprint of
+`dataset`.  `compact` re-encodes them:
+
+* ``director`` and the pipe-delimited columns become categoricals
+  (dictionary encoded), unless almost every value is distinct, in which
+  case a dictionary saves nothing;
+* ``original_title`` and the other remaining text columns become
+  Arrow-backed strings when pyarrow is installed;
+* ``release_date`` is parsed to datetime64, with the century taken from
+  ``release_year`` (the CSV writes two-digit years);
+* integer columns are downcast to the smallest integer dtype.
+
+Float columns are left alone: popularity and the money columns must stay
+float64 for the quartiles, fences and rankings to be unchanged, and
+runtime is already float32 (see `tmdb_tools.loader`).  The analysis
+sections give the same results on the compact table: rankings of text
+values break ties by first appearance (`topk.ranked_counts`), not by
+category order, and only the parsed ``release_date`` is shown differently.
+`memory_report` compares the footprint before and after.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .loader import _has_pyarrow
+
+# text columns that are dictionary encoded when values repeat
+CATEGORICAL = ('director', 'cast', 'genres', 'production_companies', 'keywords')
+
+# a column with a larger share of distinct values stays a string column
+MAX_DISTINCT = 0.5
+
+
+def _arrow_strings():
+    # NaN as missing value, like object and pandas' default string columns
+    try:
+        return pd.StringDtype('pyarrow', na_value=np.nan)
+    except TypeError:
+        # pandas < 2.3
+        return pd.StringDtype('pyarrow_numpy')
+
+
+def _is_text(series):
+    return series.dtype == object or isinstance(series.dtype, pd.StringDtype)
+
+
+def parse_release_dates(dates, years):
+    """Parse m/d/yy release dates, taking the year from `years`.
+
+    A two-digit year is ambiguous (66 would be read as 2066); the full
+    release year is stored next to the date, so only the month and day
+    are taken from the string.
+    """
+    parsed = pd.to_datetime(dates, format='%m/%d/%y', errors='coerce')
+    parts = pd.DataFrame({'year': np.asarray(years), 'month': parsed.dt.month.to_numpy(),
+                          'day': parsed.dt.day.to_numpy()}, index=dates.index)
+    return pd.to_datetime(parts, errors='coerce')
+
+
+def compact(frame, max_distinct=MAX_DISTINCT, arrow=None):
+    """Return a copy of `frame` with compact column dtypes.
+
+    Set `arrow` to False to keep text columns as they are when they are
+    not dictionary encoded (default: use Arrow strings when pyarrow is
+    installed).
+    """
+    if arrow is None:
+        arrow = _has_pyarrow()
+    columns = {}
+    for name in frame.columns:
+        series = frame[name]
+        if name == 'release_date' and 'release_year' in frame.columns and _is_text(series):
+            columns[name] = parse_release_dates(series, frame.release_year)
+        elif name in CATEGORICAL and _is_text(series):
+            if series.nunique() <= max_distinct * max(series.notnull().sum(), 1):
+                columns[name] = series.astype('category')
+            elif arrow:
+                columns[name] = series.astype(_arrow_strings())
+        elif _is_text(series):
+            if arrow and getattr(series.dtype, 'storage', None) != 'pyarrow':
+                columns[name] = series.astype(_arrow_strings())
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            columns[name] = pd.to_numeric(series, downcast='integer')
+    return frame.assign(**columns) if columns else frame.copy()
+
+
+def memory_report(before, after):
+    """Per-column dtypes and bytes of two versions of a frame.
+
+    The last row holds the totals; `ratio` is after / before.
+    """
+    sizes_before = before.memory_usage(deep=True, index=False)
+    sizes_after = after.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'dtype before': before.dtypes.astype(str),
+        'dtype after': after.dtypes.astype(str),
+        'bytes before': sizes_before,
+        'bytes after': sizes_after,
+    })
+    report.loc['total'] = ['', '', sizes_before.sum(), sizes_after.sum()]
+    report['ratio'] = report['bytes after'] / report['bytes before']
+    return report
@@ -0,0 +1,128 @@
+"""Director aggregates computed once, with ranked queries served from indexes.
+
+``director`` may name several directors joined by ``'|'``; a movie counts
+for each of them.  `DirectorTable` splits the column with a
+`MultiValueIndex`, builds every per-director statistic in one groupby over
+the (director, movie) pairs, and keeps the pairs sorted by the rank of
+their movie for each metric.  "Directors of the top N movies by
+popularity" then only reads the pairs of those N movies instead of
+scanning the frame.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .multivalue import MultiValueIndex
+from .profiling import stage
+
+# metrics the movies can be ranked by
+METRICS = ('popularity', 'revenue_adj')
+
+
+class DirectorTable(object):
+    """Per-director statistics of `dataset`.
+
+    `table` holds, per director: the number of movies, sum/mean/max
+    popularity, sum/mean ``revenue_adj``, first and last release year,
+    years active and the most frequent genre.  `genres` is the director x
+    genre count matrix behind the genre mix.
+    """
+
+    def __init__(self, dataset, sep='|', metrics=METRICS):
+        with stage('directors', len(dataset)) as record:
+            self._build(dataset, sep, metrics)
+            record.rows_out = len(self.table)
+
+    def _build(self, dataset, sep, metrics):
+        self.directors = MultiValueIndex.from_series(dataset.director, sep)
+        rows = self.directors.rows
+        pairs = pd.DataFrame({
+            'director': self.directors.codes,
+            'popularity': dataset.popularity.to_numpy()[rows],
+            'revenue_adj': dataset.revenue_adj.to_numpy()[rows],
+            'release_year': dataset.release_year.to_numpy()[rows],
+        })
+        table = pairs.groupby('director').agg(
+            movies=('popularity', 'size'),
+            popularity_sum=('popularity', 'sum'),
+            popularity_mean=('popularity', 'mean'),
+            popularity_max=('popularity', 'max'),
+            revenue_sum=('revenue_adj', 'sum'),
+            revenue_mean=('revenue_adj', 'mean'),
+            first_year=('release_year', 'min'),
+            last_year=('release_year', 'max'),
+        )
+        table['years_active'] = table.last_year.astype(int) - table.first_year + 1
+
+        self.genres = self._genre_mix(MultiValueIndex.from_series(dataset.genres, sep))
+        # a director without genres has no genre mix; reindex keeps them
+        mixed = self.genres.to_numpy().any(axis=1)
+        table['top_genre'] = self.genres[mixed].idxmax(axis=1).reindex(table.index)
+        table.index = self.directors.tokens[table.index]
+        table.index.name = 'director'
+        self.genres.index = self.directors.tokens[self.genres.index]
+        self.genres.index.name = 'director'
+        self.table = table
+
+        # pairs sorted by the rank of their movie, per metric
+        self._ranked = {}
+        for metric in metrics:
+            values = dataset[metric].to_numpy(dtype=float)
+            rank = np.empty(len(values), dtype=np.int64)
+            # descending and stable, like nlargest; missing values rank last
+            rank[np.argsort(-values, kind='stable')] = np.arange(len(values))
+            pair_rank = rank[rows]
+            order = np.argsort(pair_rank, kind='stable')
+            self._ranked[metric] = (pair_rank[order], self.directors.codes[order])
+        self._orders = {}
+
+    def _genre_mix(self, genres):
+        # director x genre counts over the (director, movie, genre) triples
+        directors = pd.DataFrame({'row': self.directors.rows, 'director': self.directors.codes})
+        triples = directors.merge(pd.DataFrame({'row': genres.rows, 'genre': genres.codes}),
+                                  on='row')
+        cells = triples.director.to_numpy(np.int64) * genres.n_tokens + triples.genre.to_numpy()
+        counts = np.bincount(cells, minlength=self.directors.n_tokens * genres.n_tokens)
+        counts = pd.DataFrame(counts.reshape(self.directors.n_tokens, genres.n_tokens),
+                              columns=pd.Index(genres.tokens, name='genre'))
+        order = counts.sum().sort_values(ascending=False, kind='stable').index
+        return counts[order]
+
+    def __len__(self):
+        return len(self.table)
+
+    def __repr__(self):
+        return '<DirectorTable {} directors>'.format(len(self))
+
+    def top(self, by='movies', n=10):
+        """The `n` directors with the largest `by`, with all their statistics.
+
+        The order of every column is computed once and reused.
+        """
+        if by not in self._orders:
+            values = self.table[by].to_numpy(dtype=float)
+            self._orders[by] = np.argsort(-values, kind='stable')
+        return self.table.iloc[self._orders[by][:n]]
+
+    def within_top(self, metric, n=100, limit=10):
+        """Directors with the most movies among the top `n` movies by `metric`.
+
+        Ties are listed in the order of their best-ranked movie.  Only the
+        (director, movie) pairs of the top `n` movies are read.
+        """
+        if metric not in self._ranked:
+            raise KeyError('movies are not ranked by {!r}'.format(metric))
+        pair_rank, codes = self._ranked[metric]
+        codes = codes[:np.searchsorted(pair_rank, n)]
+        used, first, counts = np.unique(codes, return_index=True, return_counts=True)
+        # first occurrence of each director in rank order breaks ties
+        order = np.argsort(first, kind='stable')
+        order = order[np.argsort(-counts[order], kind='stable')][:limit]
+        return pd.Series(counts[order], index=pd.Index(self.directors.tokens[used[order]],
+                                                       name='director'), name='movies')
+
+    def genre_mix(self, director, normalize=False):
+        """Genre counts of `director`'s movies (shares if `normalize`)."""
+        mix = self.genres.loc[director]
+        mix = mix[mix > 0]
+        return mix / mix.sum() if normalize else mix
@@ -0,0 +1,146 @@
+"""Five-number summaries and boxplot (IQR) fences.
+
+All the quantiles of a column are computed in one pass and memoized
+against a digest of the column's values, so asking for the quartiles and
+then for the fences of the same column sorts it only once.  Hashing is
+linear and much cheaper than the sort, and a column edited in place gets
+a new digest, so it is never answered from the memo.  The masks that split a frame
+into regular values and outliers come from the same fences.
+
+For columns too large to sort, the fences can be estimated from a
+mergeable `KLLSketch` instead (``method='sketch'``), and
+`fence_error_report` shows how far such estimates are from the exact ones.
+"""
+
+import hashlib
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .filters import partition_masks
+from .profiling import profiled
+from .sketches import KLLSketch
+
+Fences = namedtuple('Fences', ['q1', 'q3', 'iqr', 'low', 'high'])
+Fences.__doc__ = """Quartiles, interquartile range and inner fences of a column."""
+
+# quantiles of the five-number summary
+FIVE = (0.0, 0.25, 0.5, 0.75, 1.0)
+
+# number of columns whose quantiles are remembered
+CACHE_SIZE = 64
+
+_cache = OrderedDict()
+
+
+def _key(values, qs):
+    digest = hashlib.blake2b(np.ascontiguousarray(values), digest_size=16).digest()
+    return digest, values.shape, tuple(qs)
+
+
+def quantiles(series, qs=FIVE):
+    """Return the quantiles `qs` of `series`, ignoring missing values.
+
+    Quantiles are linearly interpolated as in ``Series.describe``.  The
+    result is cached against the values of the column, so repeated calls
+    on a column with the same values only hash it.
+    """
+    values = np.asarray(series, dtype=float)
+    key = _key(values, qs)
+    entry = _cache.get(key)
+    if entry is not None:
+        _cache.move_to_end(key)
+        return entry.rename(getattr(series, 'name', None))
+
+    if np.isnan(values).all():
+        result = np.full(len(qs), np.nan)
+    else:
+        result = np.nanquantile(values, qs)
+    result = pd.Series(result, index=list(qs), name=getattr(series, 'name', None))
+
+    _cache[key] = result
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return result.copy()
+
+
+def clear_cache():
+    """Forget all memoized quantiles."""
+    _cache.clear()
+
+
+def five_number_summary(series):
+    """Return min, 25%, 50%, 75% and max, labelled as by ``describe``."""
+    summary = quantiles(series, FIVE)
+    summary.index = ['min', '25%', '50%', '75%', 'max']
+    return summary
+
+
+def _fences(q1, q3, k):
+    q1, q3 = float(q1), float(q3)
+    iqr = q3 - q1
+    return Fences(q1, q3, iqr, q1 - k * iqr, q3 + k * iqr)
+
+
+@profiled('fences')
+def iqr_fences(series, k=1.5, method='exact', error=0.01, seed=None):
+    """Return the quartiles and the inner fences ``q -/+ k * iqr``.
+
+    With ``method='sketch'`` the quartiles are estimated from a
+    `KLLSketch` whose typical rank error is `error`, without sorting the
+    column.
+    """
+    if method == 'sketch':
+        sketch = KLLSketch.for_error(error, seed=seed)
+        return sketch_fences(KLLSketch.of(series, sketch.k, seed=seed), k)
+    if method != 'exact':
+        raise ValueError("method must be 'exact' or 'sketch', got {!r}".format(method))
+    summary = quantiles(series, FIVE)
+    return _fences(summary[0.25], summary[0.75], k)
+
+
+def sketch_fences(sketch, k=1.5):
+    """Return the fences estimated from a (possibly merged) `KLLSketch`."""
+    q1, q3 = sketch.quantile([0.25, 0.75])
+    return _fences(q1, q3, k)
+
+
+def fence_error_report(series, k=1.5, error=0.01, seed=None):
+    """Compare the sketch estimates of the quartiles and fences with the exact ones.
+
+    The rank error is the difference between the fraction of values below
+    the estimate and below the exact value.
+    """
+    exact = iqr_fences(series, k)
+    estimate = iqr_fences(series, k, method='sketch', error=error, seed=seed)
+    values = np.sort(np.asarray(series, dtype=float))
+    values = values[~np.isnan(values)]
+    report = pd.DataFrame({'exact': list(exact), 'estimate': list(estimate)},
+                          index=list(Fences._fields))
+    report['abs_error'] = (report.estimate - report.exact).abs()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        report['rel_error'] = report.abs_error / report.exact.abs()
+    ranks = [np.searchsorted(values, report[column].to_numpy()) / max(len(values), 1)
+             for column in ('exact', 'estimate')]
+    report['rank_error'] = np.abs(ranks[1] - ranks[0])
+    report.loc['iqr', 'rank_error'] = np.nan
+    return report
+
+
+def outlier_masks(series, fences):
+    """Return the (regular, outlier) boolean masks of `series`.
+
+    Regular values lie strictly between the fences and outliers strictly
+    outside; values exactly on a fence belong to neither, as in the
+    notebook's queries.
+    """
+    return partition_masks(np.asarray(series, dtype=float), fences.low, fences.high)
+
+
+def split_outliers(frame, column, fences=None, k=1.5):
+    """Split `frame` into its regular rows and its outliers in `column`."""
+    if fences is None:
+        fences = iqr_fences(frame[column], k)
+    regular, outlier = outlier_masks(frame[column], fences)
+    return frame[regular], frame[outlier]
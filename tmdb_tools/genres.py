@@ -0,0 +1,48 @@
+"""Per-year genre frequencies computed in a single vectorized pass.
+
+The notebook used to query the dataset once per year and split the genre
+strings of that year in Python.  Here the genre column is parsed once into
+a `MultiValueIndex` and the (year, genre) pairs are counted with a single
+bincount, so the cost is linear in the number of rows.
+"""
+
+from .multivalue import MultiValueIndex
+from .profiling import profiled
+
+
+@profiled('genres')
+def genre_year_counts(dataset, year='release_year', column='genres', sep='|',
+                      index=None):
+    """Return a year x genre matrix of genre counts.
+
+    Rows are the release years present in the dataset (ascending) and
+    columns are the genres, ordered from the most to the least frequent
+    over all years.  Movies with a missing genre string are ignored.
+    Pass the `MultiValueIndex` of the genre column as `index` to reuse an
+    already parsed column.
+    """
+    if index is None:
+        index = MultiValueIndex.from_series(dataset[column], sep=sep)
+
+    # count every (year, genre) cell at once
+    matrix = index.group_counts(dataset[year].to_numpy())
+    matrix.index.name = year
+    matrix.columns.name = 'genre'
+    matrix = matrix.loc[:, matrix.sum().to_numpy() > 0]
+    matrix = matrix.loc[matrix.sum(axis=1).to_numpy() > 0]
+    order = matrix.sum().sort_values(ascending=False, kind='stable').index
+    return matrix[order]
+
+
+def most_frequent_by_year(counts):
+    """Return the most frequent genre of each year.
+
+    Ties are broken in favour of the genre that is more frequent overall,
+    which is the column order produced by `genre_year_counts`.
+    """
+    return counts.idxmax(axis=1)
+
+
+def genre_distribution(counts):
+    """Return the overall genre distribution, most frequent first."""
+    return counts.sum().sort_values(ascending=False, kind='stable')
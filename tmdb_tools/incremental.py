@@ -0,0 +1,486 @@
+"""Incremental analysis state, updated by daily delta CSV files.
+
+A delta holds new movies and new versions of known ones, identified by
+their TMDB `id`.  The state keeps the aggregates of the notebook (movies
+per director, per year and per (year, genre), the top-k movies by
+popularity and revenue, quantile sketches of both) and a compact record
+of every movie, so that the old version of an updated movie can be taken
+out of the aggregates.
+
+Records live in append-only segments of memory-mapped numpy arrays, one
+segment per delta, sorted by id; an updated movie gets a new record and
+its old one is marked dead.  Applying a delta therefore reads and writes
+an amount of data proportional to the delta.  Two operations touch the
+whole catalog, and both are amortized over many deltas: merging the
+segments once there are more than `max_segments` of them, and rebuilding
+a top-k buffer or a sketch when updates have made it unreliable.
+
+Segment files are never modified.  The live flags of a segment are
+written to a new file when they change, and ``state.pkl`` names the
+segments and flag files of the current version.  A version is written in
+full before ``state.pkl`` is replaced, and the files it no longer uses
+are deleted only afterwards, so a crash at any point leaves the previous
+version intact.
+
+The top-k buffers keep ``2 * k`` movies together with a threshold no
+unbuffered movie exceeds; they are exact as long as `k` buffered movies
+reach the threshold.  Sketches cannot forget a value, so they are rebuilt
+from the records once the share of outdated values passes
+`rebuild_fraction`.
+"""
+
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from .analysis import DIRECTOR_SEP
+from .cleaning import CLEAN_RULES, Cleaner
+from .fences import sketch_fences
+from .genres import genre_distribution, most_frequent_by_year
+from .loader import COLUMNS, read_csv_typed
+from .multivalue import MultiValueIndex
+from .sketches import KLLSketch
+
+# numeric record columns and their dtypes; `alive` is kept in its own,
+# versioned file
+RECORD_DTYPES = {
+    'id': np.int64,
+    'release_year': np.int16,
+    'director': np.int32,
+    'genres': np.int64,
+    'runtime': np.float32,
+    'popularity': np.float64,
+    'budget_adj': np.float64,
+    'revenue_adj': np.float64,
+    'alive': np.bool_,
+}
+
+METRICS = ('popularity', 'revenue_adj')
+
+# at most 63 genres fit in the genre bit mask of a record
+MAX_GENRES = 63
+
+
+def _save_array(path, array):
+    with open(path + '.partial', 'wb') as f:
+        np.save(f, array)
+    os.replace(path + '.partial', path)
+
+
+def _add_counts(total, counts):
+    # cells missing on either side count 0; `add` alone leaves a cell
+    # missing on both sides NaN
+    total, counts = total.align(counts, join='outer', fill_value=0)
+    return (total + counts).astype('int64')
+
+
+class IncrementalState(object):
+    """Persistent aggregates of the cleaned catalog.
+
+    Create or reopen the state of a directory with `open`, feed it with
+    `apply` and read the answers with `result`.
+    """
+
+    def __init__(self, directory, k=100, sketch_k=200, rebuild_fraction=0.05,
+                 max_segments=16, rules=CLEAN_RULES):
+        self.directory = directory
+        self.k = k
+        self.buffer_size = 2 * k
+        self.sketch_k = sketch_k
+        self.rebuild_fraction = rebuild_fraction
+        self.max_segments = max_segments
+        self.cleaner = Cleaner(rules)
+
+        # `directors` holds the director values the records are coded by;
+        # `director_counts` counts the movies of every single director they
+        # name, in the token order of `_split_directors`
+        self.directors = []
+        self.genres = []
+        self.director_counts = np.zeros(0, dtype=np.int64)
+        self._director_index = None
+        self.year_counts = pd.Series(dtype='int64')
+        self.genre_year = pd.DataFrame(dtype='int64')
+
+        self.top = {metric: None for metric in METRICS}
+        self.thresholds = {metric: -np.inf for metric in METRICS}
+        self.sketches = {metric: KLLSketch(sketch_k) for metric in METRICS}
+        self.stale = {metric: 0 for metric in METRICS}
+
+        self.n_alive = 0
+        self.segments = []
+        self.next_segment = 0
+        # the live flags file of every segment, and the version being written
+        self.alive_files = {}
+        self.version = 0
+        self._open = {}
+        self._dirty = set()
+
+    # persistence
+
+    @classmethod
+    def open(cls, directory, **options):
+        """Load the state saved in `directory`, or start an empty one."""
+        path = os.path.join(directory, 'state.pkl')
+        if not os.path.exists(path):
+            state = cls(directory, **options)
+            # segments of a first apply that did not complete
+            state._collect_garbage()
+            return state
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        state.directory = directory
+        # states saved before the live flags were versioned
+        state.__dict__.setdefault('alive_files', {name: 'alive.npy' for name in state.segments})
+        state.__dict__.setdefault('version', 0)
+        state.__dict__.setdefault('_dirty', set())
+        if '_director_index' not in state.__dict__:
+            # states that counted 'A|B' as one director
+            state._director_index = None
+            state._recount_directors()
+        # files left behind by an apply that did not complete
+        state._collect_garbage()
+        return state
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_open'] = {}
+        state['_dirty'] = set()
+        state['_director_index'] = None
+        return state
+
+    def save(self):
+        """Write the changed live flags, then the aggregates that point to them.
+
+        The files of the previous version are deleted once ``state.pkl``
+        has been replaced.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self.version += 1
+        for name in sorted(self._dirty):
+            filename = 'alive-{}.npy'.format(self.version)
+            _save_array(os.path.join(self._segment_path(name), filename),
+                        self._segment(name)['alive'])
+            self.alive_files[name] = filename
+        self._dirty = set()
+        path = os.path.join(self.directory, 'state.pkl')
+        with open(path + '.partial', 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.partial', path)
+        self._collect_garbage()
+
+    def _collect_garbage(self):
+        # remove the segments and live flags the saved state does not use
+        root = os.path.join(self.directory, 'segments')
+        if not os.path.isdir(root):
+            return
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if name not in self.alive_files:
+                shutil.rmtree(path)
+                continue
+            for filename in os.listdir(path):
+                if filename.startswith('alive') and filename != self.alive_files[name]:
+                    os.remove(os.path.join(path, filename))
+
+    # record segments
+
+    def _segment_path(self, name):
+        return os.path.join(self.directory, 'segments', name)
+
+    def _map_segment(self, name, alive=None):
+        # the record columns of segment `name`, memory-mapped read-only
+        path = self._segment_path(name)
+        segment = {column: np.load(os.path.join(path, column + '.npy'), mmap_mode='r')
+                   for column in RECORD_DTYPES if column != 'alive'}
+        segment['alive'] = alive if alive is not None else \
+            np.load(os.path.join(path, self.alive_files[name]), mmap_mode='r')
+        segment['title_data'] = np.load(os.path.join(path, 'title_data.npy'), mmap_mode='r')
+        segment['title_offsets'] = np.load(os.path.join(path, 'title_offsets.npy'),
+                                           mmap_mode='r')
+        return segment
+
+    def _segment(self, name):
+        if name not in self._open:
+            self._open[name] = self._map_segment(name)
+        return self._open[name]
+
+    def _kill(self, name, rows):
+        # mark records dead in a copy of the flags, written by `save`
+        segment = self._segment(name)
+        if name not in self._dirty:
+            segment['alive'] = np.array(segment['alive'])
+            self._dirty.add(name)
+        segment['alive'][rows] = False
+
+    def _write_segment(self, records, titles):
+        name = '{:06d}'.format(self.next_segment)
+        self.next_segment += 1
+        path = self._segment_path(name)
+        os.makedirs(path)
+        for column, dtype in RECORD_DTYPES.items():
+            if column != 'alive':
+                np.save(os.path.join(path, column + '.npy'),
+                        np.asarray(records[column], dtype=dtype))
+        encoded = [str(title).encode('utf-8') for title in titles]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(title) for title in encoded], out=offsets[1:])
+        np.save(os.path.join(path, 'title_data.npy'),
+                np.frombuffer(b''.join(encoded), dtype=np.uint8))
+        np.save(os.path.join(path, 'title_offsets.npy'), offsets)
+        self.segments.append(name)
+        # the live flags are written by `save`
+        self._open[name] = self._map_segment(name, np.array(records['alive'], dtype=np.bool_))
+        self._dirty.add(name)
+
+    def _titles(self, segment, rows):
+        data, offsets = segment['title_data'], segment['title_offsets']
+        return [bytes(data[offsets[row]:offsets[row + 1]]).decode('utf-8') for row in rows]
+
+    def _alive_records(self, columns):
+        # the given columns of every live record, plus (segment, row) positions
+        parts = {column: [] for column in columns}
+        positions = []
+        for number, name in enumerate(self.segments):
+            segment = self._segment(name)
+            rows = np.flatnonzero(segment['alive'])
+            for column in columns:
+                parts[column].append(np.asarray(segment[column][rows]))
+            positions.append(np.column_stack([np.full(len(rows), number), rows]))
+        records = {column: (np.concatenate(values) if values else
+                            np.empty(0, dtype=RECORD_DTYPES[column]))
+                   for column, values in parts.items()}
+        positions = np.concatenate(positions) if positions else np.empty((0, 2), dtype=int)
+        return records, positions
+
+    # aggregates
+
+    def _genre_bits(self, masks):
+        bits = np.arange(len(self.genres), dtype=np.int64)
+        return ((masks[:, None] >> bits) & 1).astype(np.int64)
+
+    def _split_directors(self):
+        # the directors named by every `director` value; tokens are numbered
+        # by first appearance and `directors` only grows, so codes are stable
+        index = self._director_index
+        if index is None or index.n_rows != len(self.directors):
+            index = MultiValueIndex.from_series(pd.Series(self.directors, dtype=object),
+                                                DIRECTOR_SEP)
+            self._director_index = index
+            if index.n_tokens > len(self.director_counts):
+                self.director_counts = np.concatenate([
+                    self.director_counts,
+                    np.zeros(index.n_tokens - len(self.director_counts), dtype=np.int64)])
+        return index
+
+    def _recount_directors(self):
+        self.director_counts = np.zeros(self._split_directors().n_tokens, dtype=np.int64)
+        for name in self.segments:
+            segment = self._segment(name)
+            self._count_directors(np.asarray(segment['director'])[segment['alive']], 1)
+
+    def _count_directors(self, directors, sign):
+        index = self._split_directors()
+        counts = np.bincount(index.take(directors).codes, minlength=index.n_tokens)
+        self.director_counts += sign * counts
+
+    def _count(self, years, directors, masks, sign):
+        years = np.asarray(years)
+        self.year_counts = _add_counts(self.year_counts, sign * pd.Series(years).value_counts())
+        self._count_directors(np.asarray(directors), sign)
+        by_year = pd.DataFrame(self._genre_bits(np.asarray(masks))).groupby(years).sum()
+        self.genre_year = _add_counts(self.genre_year, sign * by_year)
+
+    def _codes(self, values, dictionary, limit=None):
+        # integer codes of `values`, extending `dictionary` with new ones
+        known = {value: code for code, value in enumerate(dictionary)}
+        uniques, inverse = np.unique(np.asarray(values, dtype=object).astype(str),
+                                     return_inverse=True)
+        for value in uniques:
+            if value not in known:
+                known[value] = len(dictionary)
+                dictionary.append(value)
+        if limit is not None and len(dictionary) > limit:
+            raise ValueError('more than {} distinct values'.format(limit))
+        return np.array([known[value] for value in uniques], dtype=np.int64)[inverse]
+
+    def _genre_masks(self, genres):
+        index = MultiValueIndex.from_series(genres.reset_index(drop=True))
+        bits = self._codes(index.tokens, self.genres, MAX_GENRES)
+        masks = np.zeros(index.n_rows, dtype=np.int64)
+        np.bitwise_or.at(masks, index.rows, np.left_shift(1, bits[index.codes]))
+        return masks
+
+    def _decode_genres(self, masks):
+        bits = self._genre_bits(np.asarray(masks))
+        return ['|'.join(self.genres[bit] for bit in np.flatnonzero(row)) for row in bits]
+
+    # applying deltas
+
+    def _retract(self, ids):
+        # mark the live records of `ids` dead and take them out of the aggregates
+        retracted = []
+        for name in reversed(self.segments):
+            if not len(ids):
+                break
+            segment = self._segment(name)
+            if not len(segment['id']):
+                continue
+            positions = np.minimum(np.searchsorted(segment['id'], ids), len(segment['id']) - 1)
+            found = segment['id'][positions] == ids
+            rows = positions[found]
+            rows = rows[segment['alive'][rows]]
+            if len(rows):
+                self._count(segment['release_year'][rows], segment['director'][rows],
+                            segment['genres'][rows], -1)
+                self._kill(name, rows)
+                self.stale['popularity'] += len(rows)
+                revenue = segment['revenue_adj'][rows]
+                self.stale['revenue_adj'] += int(np.count_nonzero(revenue > 0))
+                self.n_alive -= len(rows)
+                retracted.append(np.asarray(segment['id'][rows]))
+            ids = ids[~found]
+        retracted = np.concatenate(retracted) if retracted else np.empty(0, dtype=np.int64)
+        for metric in METRICS:
+            if self.top[metric] is not None:
+                self.top[metric] = self.top[metric].drop(retracted, errors='ignore')
+
+    def _insert(self, rows):
+        rows = rows.sort_values('id', kind='stable')
+        directors = self._codes(rows.director, self.directors)
+        masks = self._genre_masks(rows.genres)
+        self._count(rows.release_year.to_numpy(), directors, masks, 1)
+
+        records = {column: rows[column].to_numpy() for column in RECORD_DTYPES
+                   if column in rows.columns}
+        records.update(director=directors, genres=masks, alive=np.ones(len(rows), dtype=bool))
+        self._write_segment(records, rows.original_title)
+        self.n_alive += len(rows)
+
+        self.sketches['popularity'].update(rows.popularity.to_numpy())
+        revenue = rows.revenue_adj.to_numpy()
+        self.sketches['revenue_adj'].update(revenue[revenue > 0])
+
+        shown = rows.set_index('id')[['original_title', 'director', 'release_year', 'genres',
+                                      'runtime', 'popularity', 'budget_adj', 'revenue_adj']]
+        for metric in METRICS:
+            candidates = shown[shown[metric] > self.thresholds[metric]]
+            self.top[metric] = candidates if self.top[metric] is None else \
+                pd.concat([self.top[metric], candidates])
+
+    def _refresh_top(self, metric):
+        top = self.top[metric]
+        if top is None:
+            return
+        top = top.sort_values(metric, ascending=False, kind='stable')
+        if len(top) > self.buffer_size:
+            dropped = top.iloc[self.buffer_size:]
+            self.thresholds[metric] = max(self.thresholds[metric], dropped[metric].max())
+            top = top.iloc[:self.buffer_size]
+        self.top[metric] = top
+        if (top[metric] >= self.thresholds[metric]).sum() < min(self.k, self.n_alive):
+            self._rebuild_top(metric)
+
+    def _rebuild_top(self, metric):
+        records, positions = self._alive_records([metric])
+        values = records[metric]
+        size = min(self.buffer_size, len(values))
+        chosen = np.argpartition(-values, size - 1)[:size] if size else np.empty(0, dtype=int)
+        parts = []
+        for number in np.unique(positions[chosen, 0]):
+            segment = self._segment(self.segments[number])
+            rows = np.sort(positions[chosen][positions[chosen, 0] == number, 1])
+            parts.append(pd.DataFrame({
+                'original_title': self._titles(segment, rows),
+                'director': [self.directors[code] for code in segment['director'][rows]],
+                'release_year': segment['release_year'][rows],
+                'genres': self._decode_genres(segment['genres'][rows]),
+                'runtime': segment['runtime'][rows],
+                'popularity': segment['popularity'][rows],
+                'budget_adj': segment['budget_adj'][rows],
+                'revenue_adj': segment['revenue_adj'][rows],
+            }, index=pd.Index(segment['id'][rows], name='id')))
+        top = pd.concat(parts) if parts else None
+        self.top[metric] = None if top is None else \
+            top.sort_values(metric, ascending=False, kind='stable')
+        self.thresholds[metric] = values[chosen].min() if len(values) > size else -np.inf
+
+    def _refresh_sketch(self, metric):
+        sketch = self.sketches[metric]
+        if self.stale[metric] <= self.rebuild_fraction * max(sketch.n, 1):
+            return
+        values = self._alive_records([metric])[0][metric]
+        if metric == 'revenue_adj':
+            values = values[values > 0]
+        self.sketches[metric] = KLLSketch.of(values, self.sketch_k)
+        self.stale[metric] = 0
+
+    def _compact(self):
+        if len(self.segments) <= self.max_segments:
+            return
+        records, positions = self._alive_records(list(RECORD_DTYPES))
+        titles = []
+        for number, name in enumerate(self.segments):
+            rows = positions[positions[:, 0] == number, 1]
+            titles.extend(self._titles(self._segment(name), rows))
+        order = np.argsort(records['id'], kind='stable')
+        # the old segments are deleted by `save`, once the state uses the new one
+        self.segments, self.alive_files, self._open, self._dirty = [], {}, {}, set()
+        self._write_segment({column: values[order] for column, values in records.items()},
+                            [titles[i] for i in order])
+
+    def apply(self, delta):
+        """Fold a delta (a CSV path or a frame with an `id` column) into the state.
+
+        Rows with an `id` seen before replace the earlier version; rows
+        that fail the Clean rules only remove the earlier version.
+        """
+        if isinstance(delta, str):
+            delta = read_csv_typed(delta, ['id'] + COLUMNS, categorical=False)
+        delta = delta.drop_duplicates('id', keep='last')
+        self._retract(np.sort(delta['id'].to_numpy(dtype=np.int64)))
+        rows = self.cleaner(delta)
+        if len(rows):
+            self._insert(rows)
+        for metric in METRICS:
+            self._refresh_top(metric)
+            self._refresh_sketch(metric)
+        self._compact()
+        self.save()
+        return self
+
+    # answers
+
+    def result(self):
+        """The notebook's answers from the current aggregates.
+
+        Counts and the top-k lists are exact; fences come from the sketches.
+        """
+        directors = pd.Series(self.director_counts,
+                              index=pd.Index(self._split_directors().tokens, dtype=object))
+        directors = directors[directors > 0].sort_values(ascending=False, kind='stable')
+        years = self.year_counts[self.year_counts > 0].sort_index()
+        genre_year = self.genre_year.rename(columns=dict(enumerate(self.genres)))
+        genre_year = genre_year.loc[genre_year.sum(axis=1) > 0, genre_year.sum() > 0]
+        genre_year = genre_year[genre_distribution(genre_year).index]
+        result = {
+            'movies': self.n_alive,
+            'clean': self.cleaner.report,
+            'director_counts': directors[:10],
+            'year_counts': years,
+            'pop_gen': {str(year): genre for year, genre in
+                        most_frequent_by_year(genre_year).items()},
+            'genre_distribution': genre_distribution(genre_year),
+        }
+        for metric in METRICS:
+            top = self.top[metric]
+            result['top_' + metric] = None if top is None else top.head(self.k)
+            result['fences_' + metric] = sketch_fences(self.sketches[metric])
+        return result
+
+
+def apply_delta(directory, path, **options):
+    """Open the state in `directory`, apply the delta CSV at `path` and return it."""
+    return IncrementalState.open(directory, **options).apply(path)
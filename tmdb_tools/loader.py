@@ -0,0 +1,135 @@
+"""Typed, column-pruned loading of tmdb-movies.csv with a columnar cache.
+
+`load_movies` reads only the columns the analysis uses, with explicit
+dtypes, and stores the parsed frame next to the CSV in a cache keyed on the
+content hash of the file.  Later runs load the snapshot instead of parsing
+the CSV again.  The snapshot is written as Feather when pyarrow is
+installed and as a pickle otherwise.
+"""
+
+import hashlib
+import os
+
+import pandas as pd
+
+from .profiling import profiled
+
+# columns kept by the notebook after dropping id, imdb_id, budget, revenue,
+# homepage, tagline, overview, vote_count, vote_average and keywords
+COLUMNS = ['popularity', 'original_title', 'cast', 'director', 'runtime',
+           'genres', 'production_companies', 'release_date', 'release_year',
+           'budget_adj', 'revenue_adj']
+
+# popularity and the adjusted money columns stay float64: float32 would
+# change quartiles, fences and rankings.  runtime is a whole number of
+# minutes and fits float32 exactly (float keeps missing values possible).
+# Text columns keep the pandas default string dtype.
+DTYPES = {
+    'id': 'int64',
+    'popularity': 'float64',
+    'budget': 'int64',
+    'revenue': 'int64',
+    'director': 'category',
+    'runtime': 'float32',
+    'vote_count': 'int32',
+    'vote_average': 'float32',
+    'release_year': 'int16',
+    'budget_adj': 'float64',
+    'revenue_adj': 'float64',
+}
+
+CACHE_DIR = '.tmdb_cache'
+
+# bump when the parsing rules change so that old snapshots are ignored
+CACHE_VERSION = 1
+
+
+def fingerprint(path, blocksize=1 << 20):
+    """Return the hex BLAKE2 digest of the file contents."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@profiled('read_csv')
+def read_csv_typed(path, columns=COLUMNS, chunksize=None, categorical=True):
+    """Read `columns` of the CSV with the dtypes of `DTYPES`.
+
+    With `chunksize` an iterator of frames is returned.  Set `categorical`
+    to False to read categorical columns as strings, e.g. when chunks are
+    concatenated later and must not end up with different categories.
+    """
+    dtypes = {column: DTYPES[column] for column in columns if column in DTYPES}
+    if not categorical:
+        dtypes = {column: (str if dtype == 'category' else dtype)
+                  for column, dtype in dtypes.items()}
+    reader = pd.read_csv(path, usecols=list(columns), dtype=dtypes,
+                         chunksize=chunksize)
+    if chunksize is not None:
+        return reader
+    # usecols keeps the file order; return the requested order instead
+    return reader[list(columns)]
+
+
+def _cache_key(content, columns):
+    spec = repr((CACHE_VERSION, list(columns),
+                 [DTYPES.get(column) for column in columns]))
+    digest = hashlib.blake2b(spec.encode(), digest_size=8).hexdigest()
+    return '{}-{}'.format(content, digest)
+
+
+def _cache_path(path, content, columns, cache_dir):
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    suffix = '.feather' if _has_pyarrow() else '.pkl'
+    return os.path.join(cache_dir, '{}-{}{}'.format(stem, _cache_key(content, columns), suffix))
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@profiled('load')
+def load_movies(path='tmdb-movies.csv', columns=COLUMNS, cache=True, cache_dir=None,
+                with_fingerprint=False):
+    """Load the movie table, from the columnar cache when possible.
+
+    The cache file name contains the content hash of `path` together with
+    the requested columns and dtypes, so an edited CSV or a different
+    column selection never hits a stale snapshot.  Pass ``cache=False`` to
+    always parse the CSV.  With ``with_fingerprint=True`` the result is
+    ``(dataset, fingerprint(path))``, the file hashed once for both uses.
+    """
+    columns = list(columns)
+    content = fingerprint(path) if cache or with_fingerprint else None
+    dataset = _load(path, content, columns, cache, cache_dir)
+    return (dataset, content) if with_fingerprint else dataset
+
+
+def _load(path, content, columns, cache, cache_dir):
+    if not cache:
+        return read_csv_typed(path, columns)
+
+    snapshot = _cache_path(path, content, columns, cache_dir)
+    if os.path.exists(snapshot):
+        if snapshot.endswith('.feather'):
+            return pd.read_feather(snapshot)
+        return pd.read_pickle(snapshot)
+
+    dataset = read_csv_typed(path, columns)
+    os.makedirs(os.path.dirname(snapshot), exist_ok=True)
+    # write to a temporary name first so a crashed run leaves no torn file
+    partial = snapshot + '.partial'
+    if snapshot.endswith('.feather'):
+        dataset.to_feather(partial)
+    else:
+        dataset.to_pickle(partial)
+    os.replace(partial, snapshot)
+    return dataset
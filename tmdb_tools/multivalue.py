@@ -0,0 +1,226 @@
+"""Integer-coded index over pipe-delimited columns.
+
+Columns such as ``genres``, ``cast``, ``production_companies`` and
+``keywords`` hold several values per movie joined by ``'|'``.  A
+`MultiValueIndex` parses such a column once into CSR form: a flat array of
+integer token codes plus row offsets, so that row ``i`` owns
+``codes[offsets[i]:offsets[i + 1]]``.  Later lookups ("movies with genre X",
+"top cast by revenue", "companies per year") are then array operations
+instead of repeated ``str.split('|')`` passes over the DataFrame.
+"""
+
+import numpy as np
+import pandas as pd
+
+# pipe-delimited columns of tmdb-movies.csv
+MULTIVALUED = ('genres', 'cast', 'production_companies', 'keywords')
+
+
+class MultiValueIndex(object):
+    """CSR-encoded tokens of a multi-valued column.
+
+    Attributes
+    ----------
+    codes : int32 array with the token code of every (row, token) pair
+    offsets : int64 array of length ``n_rows + 1`` delimiting each row
+    tokens : pd.Index mapping a code to its token string
+    index : row labels of the indexed frame, in positional order
+    """
+
+    def __init__(self, codes, offsets, tokens, index):
+        self.codes = codes
+        self.offsets = offsets
+        self.tokens = tokens
+        self.index = index
+        self._rows = None
+
+    @classmethod
+    def from_series(cls, series, sep='|'):
+        """Parse a pipe-delimited series; missing values own no tokens."""
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return cls._from_categorical(series, sep)
+        present = series.notnull().to_numpy()
+        split = series[present].astype(str).str.split(sep, regex=False)
+
+        lengths = np.zeros(len(series), dtype=np.int64)
+        lengths[present] = split.str.len().to_numpy()
+        offsets = np.zeros(len(series) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        if offsets[-1]:
+            codes, tokens = pd.factorize(split.explode().to_numpy())
+        else:
+            codes, tokens = np.array([], dtype=np.intp), []
+        return cls(codes.astype(np.int32), offsets, pd.Index(tokens, dtype=object),
+                   series.index)
+
+    @classmethod
+    def _from_categorical(cls, series, sep):
+        # split every category once, then gather the tokens of each row
+        categories = cls.from_series(pd.Series(series.cat.categories, dtype=object), sep)
+        row_codes = series.cat.codes.to_numpy()
+        present = row_codes >= 0
+        lengths = np.zeros(len(series), dtype=np.int64)
+        lengths[present] = categories.lengths[row_codes[present]]
+        offsets = np.zeros(len(series) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        starts = categories.offsets[row_codes[present]]
+        within = np.arange(offsets[-1]) - np.repeat(offsets[:-1][present], lengths[present])
+        codes = categories.codes[np.repeat(starts, lengths[present]) + within]
+        # renumber the tokens by first occurrence, as `from_series` does for strings
+        used, first = np.unique(codes, return_index=True)
+        order = used[np.argsort(first, kind='stable')]
+        renumber = np.zeros(categories.n_tokens, dtype=np.int32)
+        renumber[order] = np.arange(len(order), dtype=np.int32)
+        return cls(renumber[codes], offsets, categories.tokens[order], series.index)
+
+    @property
+    def n_rows(self):
+        return len(self.offsets) - 1
+
+    @property
+    def n_tokens(self):
+        return len(self.tokens)
+
+    @property
+    def lengths(self):
+        """Number of tokens of every row."""
+        return np.diff(self.offsets)
+
+    @property
+    def rows(self):
+        """Row position of every (row, token) pair, aligned with `codes`."""
+        if self._rows is None:
+            self._rows = np.repeat(np.arange(self.n_rows), self.lengths)
+        return self._rows
+
+    def code(self, token):
+        """Return the integer code of `token` (KeyError if unknown)."""
+        return self.tokens.get_loc(token)
+
+    def mask(self, token):
+        """Boolean array, True for the rows that contain `token`."""
+        result = np.zeros(self.n_rows, dtype=bool)
+        result[self.rows[self.codes == self.code(token)]] = True
+        return result
+
+    def rows_with(self, token):
+        """Row labels of the rows that contain `token`."""
+        return self.index[self.mask(token)]
+
+    def counts(self):
+        """Number of occurrences of every token, most frequent first."""
+        counts = np.bincount(self.codes, minlength=self.n_tokens)
+        return (pd.Series(counts, index=self.tokens)
+                .sort_values(ascending=False, kind='stable'))
+
+    def group_counts(self, keys):
+        """Return a key x token count matrix.
+
+        `keys` holds one value per indexed row (e.g. the release year), so
+        ``index.group_counts(dataset.release_year)`` gives companies per
+        year when built on ``production_companies``.  Rows are the sorted
+        distinct keys; columns are in code order.
+        """
+        keys = np.asarray(keys)
+        if len(keys) != self.n_rows:
+            raise ValueError('expected {} keys, got {}'.format(self.n_rows, len(keys)))
+        key_codes, key_values = pd.factorize(keys, sort=True)
+        cells = key_codes[self.rows].astype(np.int64) * self.n_tokens + self.codes
+        counts = np.bincount(cells, minlength=len(key_values) * self.n_tokens)
+        return pd.DataFrame(counts.reshape(len(key_values), self.n_tokens),
+                            index=key_values, columns=self.tokens)
+
+    def group_sums(self, keys, values):
+        """Sum `values` (one per row) per (key, token) cell.
+
+        The companion of `group_counts`, with the same rows and columns;
+        missing values count as zero.
+        """
+        keys = np.asarray(keys)
+        values = np.asarray(values, dtype=float)
+        if len(keys) != self.n_rows or len(values) != self.n_rows:
+            raise ValueError('expected {} keys and values, got {} and {}'
+                             .format(self.n_rows, len(keys), len(values)))
+        key_codes, key_values = pd.factorize(keys, sort=True)
+        cells = key_codes[self.rows].astype(np.int64) * self.n_tokens + self.codes
+        sums = np.bincount(cells, weights=np.nan_to_num(values)[self.rows],
+                           minlength=len(key_values) * self.n_tokens)
+        return pd.DataFrame(sums.reshape(len(key_values), self.n_tokens),
+                            index=key_values, columns=self.tokens)
+
+    def aggregate(self, values, func='sum'):
+        """Aggregate one value per row over the rows of every token.
+
+        ``cast_index.aggregate(dataset.revenue_adj).nlargest(10)`` gives
+        the top cast by revenue.  'sum', 'mean' and 'count' are computed
+        with bincount; any other pandas groupby reduction is accepted too.
+        """
+        values = np.asarray(values, dtype=float)
+        if len(values) != self.n_rows:
+            raise ValueError('expected {} values, got {}'.format(self.n_rows, len(values)))
+        pair_values = values[self.rows]
+        if func in ('sum', 'mean', 'count'):
+            valid = ~np.isnan(pair_values)
+            count = np.bincount(self.codes[valid], minlength=self.n_tokens)
+            if func == 'count':
+                result = count
+            else:
+                result = np.bincount(self.codes[valid], weights=pair_values[valid],
+                                     minlength=self.n_tokens)
+                if func == 'mean':
+                    with np.errstate(invalid='ignore', divide='ignore'):
+                        result = result / count
+                    result[count == 0] = np.nan
+            return pd.Series(result, index=self.tokens)
+        grouped = pd.Series(pair_values).groupby(self.codes).agg(func)
+        return grouped.reindex(np.arange(self.n_tokens)).set_axis(self.tokens)
+
+    def explode(self):
+        """Return the (row label, token) pairs as a two-column frame."""
+        return pd.DataFrame({'row': self.index[self.rows],
+                             'token': self.tokens.take(self.codes)})
+
+    def to_sparse(self):
+        """Return the movie x token incidence matrix as scipy CSR."""
+        from scipy import sparse
+
+        data = np.ones(len(self.codes), dtype=np.int32)
+        matrix = sparse.csr_matrix((data, self.codes, self.offsets),
+                                   shape=(self.n_rows, self.n_tokens))
+        # a token repeated within a row counts once per occurrence
+        matrix.sum_duplicates()
+        return matrix
+
+    def take(self, positions):
+        """Return the index restricted to the rows at `positions`."""
+        positions = np.asarray(positions)
+        if positions.dtype == bool:
+            positions = np.flatnonzero(positions)
+        starts, stops = self.offsets[positions], self.offsets[positions + 1]
+        lengths = stops - starts
+        offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # gather the code ranges of the selected rows
+        pair_rows = np.repeat(np.arange(len(positions)), lengths)
+        pairs = starts[pair_rows] + (np.arange(offsets[-1]) - offsets[pair_rows])
+        return MultiValueIndex(self.codes[pairs], offsets, self.tokens,
+                               self.index[positions])
+
+    def __len__(self):
+        return self.n_rows
+
+    def __repr__(self):
+        return '<MultiValueIndex {} rows, {} tokens, {} pairs>'.format(
+            self.n_rows, self.n_tokens, len(self.codes))
+
+
+def build_indexes(dataset, columns=MULTIVALUED, sep='|'):
+    """Index every multi-valued column present in `dataset`.
+
+    Build this once after the Clean stage and pass the result to the
+    later analyses; columns already dropped from the frame are skipped.
+    """
+    return {column: MultiValueIndex.from_series(dataset[column], sep=sep)
+            for column in columns if column in dataset.columns}
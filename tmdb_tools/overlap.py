@@ -0,0 +1,114 @@
+"""Overlaps between groups of movies, counted on rows rather than titles.
+
+A group is a boolean mask over the rows of the dataset or a collection of
+row labels (e.g. the index of ``dataset_pop_out``).  Intersecting sets of
+titles hashes every title string and merges different movies that share a
+title; here each group becomes a mask, the groups a row belongs to are
+packed into the bits of one integer, and a single bincount over those
+patterns gives every overlap at once.
+"""
+
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+# the patterns of more groups would not fit in a reasonably sized bincount
+MAX_GROUPS = 20
+
+
+def as_mask(group, index):
+    """Boolean array over `index`, True for the rows in `group`.
+
+    `group` is either a boolean mask aligned with `index` or row labels
+    (a frame or series stands for its index).
+    """
+    values = np.asarray(group)
+    if values.dtype == bool and (index is None or len(values) == len(index)):
+        return values
+    if index is None:
+        raise ValueError('an index is needed to look up row labels')
+    labels = group.index if isinstance(group, (pd.Series, pd.DataFrame)) else group
+    mask = np.zeros(len(index), dtype=bool)
+    positions = index.get_indexer(pd.Index(labels))
+    if (positions < 0).any():
+        raise KeyError('{} labels are not in the index'.format(int((positions < 0).sum())))
+    mask[positions] = True
+    return mask
+
+
+def patterns(groups, index=None):
+    """Membership pattern of every row: bit ``i`` is set if it is in group ``i``.
+
+    `groups` is a dict of name to group; labels need the `index` they
+    refer to.
+    """
+    if len(groups) > MAX_GROUPS:
+        raise ValueError('at most {} groups, got {}'.format(MAX_GROUPS, len(groups)))
+    masks = [as_mask(group, index) for group in groups.values()]
+    result = np.zeros(len(masks[0]) if masks else 0, dtype=np.int64)
+    for bit, mask in enumerate(masks):
+        if len(mask) != len(result):
+            raise ValueError('groups cover {} and {} rows'.format(len(result), len(mask)))
+        result |= mask.astype(np.int64) << bit
+    return result
+
+
+def overlap_table(groups, index=None):
+    """Number of rows for every combination of in/out of the groups.
+
+    Returns a Series indexed by one boolean level per group, with all
+    ``2 ** len(groups)`` combinations (including empty ones).
+    """
+    names = list(groups)
+    counts = np.bincount(patterns(groups, index), minlength=2 ** len(names))
+    combinations = list(product([False, True], repeat=len(names)))
+    # bit i of a combination is its i-th level; product varies the last level fastest
+    codes = [sum(member << bit for bit, member in enumerate(combination))
+             for combination in combinations]
+    return pd.Series(counts[codes], name='movies',
+                     index=pd.MultiIndex.from_tuples(combinations, names=names))
+
+
+def intersection_sizes(groups, index=None):
+    """Size of the intersection of every non-empty subset of the groups.
+
+    Returns a Series indexed by tuples of group names, smallest subsets
+    first.  Computed from the pattern counts with a superset-sum pass, so
+    all ``2 ** len(groups)`` intersections cost one bincount.
+    """
+    names = list(groups)
+    sizes = np.bincount(patterns(groups, index), minlength=2 ** len(names))
+    subsets = np.arange(len(sizes))
+    for bit in range(len(names)):
+        # add the count of every pattern to the subsets it contains
+        without = (subsets >> bit) & 1 == 0
+        sizes[subsets[without]] += sizes[subsets[without] | (1 << bit)]
+    keys = sorted(range(1, len(sizes)), key=lambda subset: (bin(subset).count('1'), subset))
+    labels = [tuple(name for bit, name in enumerate(names) if subset >> bit & 1)
+              for subset in keys]
+    return pd.Series(sizes[keys], index=pd.Index(labels, tupleize_cols=False), name='movies')
+
+
+def contingency(a, b, index=None, names=('a', 'b')):
+    """2 x 2 table of the rows in / not in groups `a` and `b`, with totals."""
+    table = overlap_table({names[0]: a, names[1]: b}, index).unstack()
+    table.loc['total'] = table.sum()
+    table['total'] = table.sum(axis=1)
+    return table
+
+
+def conditional(table):
+    """Conditional probabilities from a `contingency` table.
+
+    ``P(b | a)`` is the chance that a row of group `a` is also in `b`.
+    """
+    a, b = table.index.name, table.columns.name
+    both = table.loc[True, True]
+    return pd.Series({
+        'P({} | {})'.format(b, a): both / table.loc[True, 'total'],
+        'P({} | not {})'.format(b, a): table.loc[False, True] / table.loc[False, 'total'],
+        'P({} | {})'.format(a, b): both / table.loc['total', True],
+        'P({} | not {})'.format(a, b): table.loc[True, False] / table.loc['total', False],
+        'P({} and {})'.format(a, b): both / table.loc['total', 'total'],
+    }, name='probability')
@@ -0,0 +1,317 @@
+"""The notebook's figures, rendered headless to files.
+
+Nothing here imports matplotlib at module level: the plotting stack is only
+loaded when a figure is actually drawn, with the non-interactive Agg
+backend unless a backend was already chosen.
+
+Every entry of `FIGURES` has a `prepare` function that reduces the cleaned
+dataset to the small data the figure shows (histogram counts, box plot
+statistics, a density grid for large scatter plots) and a `draw` function
+that plots that data on a matplotlib axes.  `render_figures` hashes the
+prepared data, skips the figures whose rendering is already in the
+content-addressed cache, and draws the others in parallel processes.
+"""
+
+import hashlib
+import os
+import shutil
+import sys
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from .fences import iqr_fences, quantiles, split_outliers
+from .filters import Between, select
+from .genres import genre_distribution, genre_year_counts
+
+Figure = namedtuple('Figure', ['prepare', 'draw', 'figsize'])
+
+# bump when the drawing code changes so that cached renderings are redrawn
+FIGURES_VERSION = 1
+
+# scatter plots with more points than this are drawn as a density grid
+SCATTER_LIMIT = 50000
+
+# bins of the density grid, per axis
+DENSITY_BINS = 200
+
+CACHE_DIR = '.cache'
+
+
+def pyplot():
+    """Import and return matplotlib.pyplot, headless unless already set up."""
+    if 'matplotlib.pyplot' not in sys.modules:
+        import matplotlib
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def notebook_pyplot():
+    """pyplot for the notebook: inline figures under IPython, headless otherwise.
+
+    The seaborn style the notebook was drawn with is applied when seaborn
+    is installed.
+    """
+    shell = sys.modules['IPython'].get_ipython() if 'IPython' in sys.modules else None
+    if shell is not None:
+        shell.run_line_magic('matplotlib', 'inline')
+    plt = pyplot()
+    try:
+        import seaborn
+    except ImportError:
+        pass
+    else:
+        seaborn.set()
+    return plt
+
+
+def _revenue(dataset):
+    return select(dataset, revenue_adj=Between(0))
+
+
+def _histogram(values, bins):
+    values = np.asarray(values, dtype=float)
+    counts, edges = np.histogram(values[~np.isnan(values)], bins=bins)
+    return {'counts': counts, 'edges': edges}
+
+
+def _box_stats(series):
+    # the statistics matplotlib's boxplot draws, with whiskers at 1.5 IQR
+    values = series.to_numpy(dtype=float)
+    values = values[~np.isnan(values)]
+    fences = iqr_fences(series)
+    inner = values[(values >= fences.low) & (values <= fences.high)]
+    # as in matplotlib, whiskers fall back to the quartiles when no value
+    # lies between a quartile and its fence
+    low = min(inner.min(), fences.q1) if len(inner) else fences.q1
+    high = max(inner.max(), fences.q3) if len(inner) else fences.q3
+    return {'label': series.name, 'q1': fences.q1, 'q3': fences.q3,
+            'med': float(quantiles(series)[0.5]),
+            'whislo': float(low), 'whishi': float(high),
+            'fliers': values[(values < low) | (values > high)]}
+
+
+def _scatter(frame, x, y):
+    if len(frame) <= SCATTER_LIMIT:
+        return {'x': frame[x].to_numpy(), 'y': frame[y].to_numpy()}
+    counts, x_edges, y_edges = np.histogram2d(frame[x].to_numpy(), frame[y].to_numpy(),
+                                              bins=DENSITY_BINS)
+    return {'counts': counts, 'x_edges': x_edges, 'y_edges': y_edges}
+
+
+def _draw_hist(title, xlabel, ylabel='Counts'):
+    def draw(data, ax):
+        ax.hist(data['edges'][:-1], bins=data['edges'], weights=data['counts'])
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.set_title(title)
+    return draw
+
+
+def _draw_box(title, xlabel):
+    def draw(stats, ax):
+        flierprops = {'marker': 'o', 'markeredgecolor': 'r'}
+        try:
+            ax.bxp([stats], orientation='horizontal', flierprops=flierprops)
+        except TypeError:
+            # matplotlib < 3.10
+            ax.bxp([stats], vert=False, flierprops=flierprops)
+        ax.set_xlabel(xlabel)
+        ax.set_title(title)
+    return draw
+
+
+def _draw_scatter(data, ax):
+    if 'counts' in data:
+        from matplotlib.colors import LogNorm
+
+        counts = np.ma.masked_equal(data['counts'].T, 0)
+        mesh = ax.pcolormesh(data['x_edges'], data['y_edges'], counts, norm=LogNorm())
+        ax.figure.colorbar(mesh, ax=ax, label='Movies')
+    else:
+        ax.scatter(data['x'], data['y'])
+    ax.set_xlabel('Popularity')
+    ax.set_ylabel('Revenue (in 2010 USD)')
+    ax.set_title('Relation between popularity and revenue')
+
+
+def _draw_years(counts, ax):
+    # barh draws the first entry at the bottom: put the maximum on top
+    counts.sort_values(kind='stable').plot.barh(ax=ax)
+    ax.set_xlabel('Movies made')
+    ax.set_title('Yearly movie distribution')
+
+
+def _draw_genres(distribution, ax):
+    distribution.plot(kind='pie', ax=ax, label='Distribution of movie genres')
+
+
+FIGURES = OrderedDict([
+    ('popularity_hist', Figure(
+        lambda dataset: _histogram(dataset.popularity, 10),
+        _draw_hist('Distribution of popularity', 'Popularity'), None)),
+    ('popularity_box', Figure(
+        lambda dataset: _box_stats(dataset.popularity),
+        _draw_box('Boxplot of popularity', 'Popularity'), None)),
+    ('popularity_regular_hist', Figure(
+        lambda dataset: _histogram(split_outliers(dataset, 'popularity')[0].popularity, 20),
+        _draw_hist('Distribution of "regular" values of popularity', 'Popularity',
+                   ylabel='Frequency'), None)),
+    ('revenue_hist', Figure(
+        lambda dataset: _histogram(_revenue(dataset).revenue_adj, 10),
+        _draw_hist('Distribution of revenue', 'Revenue (in 2010 USD)'), None)),
+    ('revenue_box', Figure(
+        lambda dataset: _box_stats(dataset.revenue_adj),
+        _draw_box('Boxplot of revenue', 'Revenue (in 2010 USD)'), None)),
+    ('revenue_regular_hist', Figure(
+        lambda dataset: _histogram(
+            split_outliers(_revenue(dataset), 'revenue_adj')[0].revenue_adj, 20),
+        _draw_hist('Distribution of available revenue', 'Revenue (in 2010 USD)',
+                   ylabel='Frequency'), None)),
+    ('revenue_outlier_hist', Figure(
+        lambda dataset: _histogram(
+            split_outliers(_revenue(dataset), 'revenue_adj')[1].revenue_adj, 20),
+        _draw_hist('Revenue distribution of top-grossing movies', 'Revenue (in 2010 USD)',
+                   ylabel='Frequency'), None)),
+    ('popularity_revenue', Figure(
+        lambda dataset: _scatter(_revenue(dataset), 'popularity', 'revenue_adj'),
+        _draw_scatter, None)),
+    ('year_counts', Figure(
+        lambda dataset: dataset.release_year.value_counts(),
+        _draw_years, (8, 16))),
+    ('genre_distribution', Figure(
+        lambda dataset: genre_distribution(genre_year_counts(dataset)),
+        _draw_genres, (10, 10))),
+])
+
+
+def _update_digest(digest, data):
+    if isinstance(data, (pd.Series, pd.DataFrame)):
+        digest.update(repr((type(data).__name__, getattr(data, 'name', None),
+                            list(getattr(data, 'columns', [])))).encode())
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    elif isinstance(data, np.ndarray):
+        digest.update(repr((data.dtype.str, data.shape)).encode())
+        digest.update(np.ascontiguousarray(data).tobytes())
+    elif isinstance(data, dict):
+        for key in sorted(data):
+            digest.update(repr(key).encode())
+            _update_digest(digest, data[key])
+    else:
+        digest.update(repr(data).encode())
+
+
+def figure_digest(name, data):
+    """Content hash of a figure: its name, prepared data and drawing version."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((name, FIGURES_VERSION, FIGURES[name].figsize)).encode())
+    _update_digest(digest, data)
+    return digest.hexdigest()
+
+
+def draw_figure(name, data, paths):
+    """Draw figure `name` from its prepared `data` and save it to `paths`."""
+    if isinstance(paths, str):
+        paths = [paths]
+    plt = pyplot()
+    figure = FIGURES[name]
+    fig, ax = plt.subplots(figsize=figure.figsize)
+    try:
+        figure.draw(data, ax)
+        for path in paths:
+            fig.savefig(path, bbox_inches='tight')
+    finally:
+        plt.close(fig)
+    return paths
+
+
+def render_figures(dataset, directory, names=None, formats=('png',), processes=None,
+                   cache=True):
+    """Render the figures `names` (default: all) to files under `directory`.
+
+    Each figure is saved as ``<directory>/<name>.<format>`` for every
+    format (`formats` may be a single format).  Renderings are also kept
+    under ``<directory>/.cache`` by content hash; a figure whose prepared
+    data has not changed is copied from there instead of being drawn
+    again.  Only the latest rendering of every figure is kept.  The figures left to draw are
+    rendered in `processes` worker processes (default: one per CPU; 1
+    draws them in this process).
+
+    Returns a dict of figure name to (paths, drawn) where `drawn` is False
+    for cache hits.
+    """
+    if isinstance(formats, str):
+        formats = (formats,)
+    with profiling.stage('figures', len(dataset)):
+        return _render_figures(dataset, directory, list(names or FIGURES), formats, processes,
+                               cache)
+
+
+def _render_figures(dataset, directory, names, formats, processes, cache):
+    cache_dir = os.path.join(directory, CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    jobs, results = OrderedDict(), OrderedDict()
+    with profiling.stage('prepare'):
+        for name in names:
+            with profiling.stage(name, len(dataset)):
+                data = FIGURES[name].prepare(dataset)
+            digest = figure_digest(name, data)
+            cached = [os.path.join(cache_dir, '{}-{}.{}'.format(name, digest, format))
+                      for format in formats]
+            targets = [os.path.join(directory, '{}.{}'.format(name, format))
+                       for format in formats]
+            hit = cache and all(os.path.exists(path) for path in cached)
+            if not hit:
+                jobs[name] = (data, cached)
+            results[name] = (targets, cached, not hit)
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(jobs))
+    with profiling.stage('draw'):
+        if processes > 1:
+            with ProcessPoolExecutor(processes) as pool:
+                futures = [pool.submit(draw_figure, name, data, cached)
+                           for name, (data, cached) in jobs.items()]
+                for future in futures:
+                    future.result()
+        else:
+            for name, (data, cached) in jobs.items():
+                draw_figure(name, data, cached)
+
+    rendered, current = OrderedDict(), set()
+    for name, (targets, cached, drawn) in results.items():
+        for source, target in zip(cached, targets):
+            shutil.copyfile(source, target)
+        rendered[name] = (targets, drawn)
+        current.update(os.path.basename(path).partition('.')[0] for path in cached)
+    _evict(cache_dir, names, current)
+    return rendered
+
+
+def _evict(cache_dir, names, current):
+    # drop the earlier renderings of the figures just rendered, in any
+    # format, and the files of figures that no longer exist
+    for filename in os.listdir(cache_dir):
+        stem = filename.partition('.')[0]
+        figure = stem.partition('-')[0]
+        if (figure in names or figure not in FIGURES) and stem not in current:
+            os.remove(os.path.join(cache_dir, filename))
+
+
+def save_figures(dataset, directory, names=None, format='png'):
+    """Draw and save the figures in this process, without caching.
+
+    Returns the paths written, by figure name.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = OrderedDict()
+    for name in names or FIGURES:
+        path = os.path.join(directory, '{}.{}'.format(name, format))
+        paths[name] = draw_figure(name, FIGURES[name].prepare(dataset), path)[0]
+    return paths
@@ -0,0 +1,222 @@
+"""Opt-in timing of the analysis stages.
+
+The loader, the Clean stage, the fences, the top-N selections, the genre
+counts and trends, the director and cast tables, the report sections and
+the figures are instrumented with `profiled` or `stage`.  Instrumentation
+is off unless the ``TMDB_PROFILE`` environment variable is set (to
+anything but ``0``) or `enable` is called; while it is off an
+instrumented call costs one attribute lookup.
+
+When on, every stage records its wall time, CPU time, rows in and out and
+the change of the resident memory of the process.  Nested stages are
+named by their path, e.g. ``figures/prepare``.  Set ``TMDB_PROFILE_STAGE`` (or
+pass `profile_stage` to `enable`) to the name or path of one stage to also
+dump a cProfile trace of every run of it to ``<path>.prof`` in
+``TMDB_PROFILE_DIR`` (``.`` by default); the file
+is a standard pstats dump, readable by ``python -m pstats``, snakeviz,
+gprof2dot or flameprof.  `report` returns everything as JSON-ready data.
+"""
+
+import cProfile
+import functools
+import json
+import os
+import resource
+import sys
+import time
+from collections import OrderedDict
+
+ENV = 'TMDB_PROFILE'
+ENV_STAGE = 'TMDB_PROFILE_STAGE'
+ENV_DIR = 'TMDB_PROFILE_DIR'
+
+
+def _rss():
+    # current resident size in bytes; peak size where /proc is not available
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def _rows(value):
+    # number of rows of a frame, a series, or the first item of a tuple
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    shape = getattr(value, 'shape', None)
+    return shape[0] if shape else None
+
+
+class Record(object):
+    """Measurements of one run of a stage; set `rows_out` inside the stage."""
+
+    __slots__ = ('stage', 'wall', 'cpu', 'rows_in', 'rows_out', 'memory_delta', 'profile')
+
+    def __init__(self, stage, rows_in=None):
+        self.stage = stage
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.wall = self.cpu = self.memory_delta = None
+        self.profile = None
+
+    def to_dict(self):
+        return OrderedDict((name, getattr(self, name)) for name in self.__slots__)
+
+
+class _Disabled(object):
+    # the context manager returned while profiling is off
+
+    def __enter__(self):
+        return Record(None)
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_DISABLED = _Disabled()
+
+
+class _Stage(object):
+    # the context manager measuring one stage
+
+    def __init__(self, profiler, name, rows_in):
+        self.profiler = profiler
+        self.name = name
+        self.rows_in = rows_in
+
+    def __enter__(self):
+        profiler = self.profiler
+        profiler._stack.append(self.name)
+        self.record = Record('/'.join(profiler._stack), self.rows_in)
+        self.cprofile = None
+        if (not profiler._profiling and profiler.profile_stage is not None and
+                profiler.profile_stage in (self.name, self.record.stage)):
+            profiler._profiling = True
+            self.cprofile = cProfile.Profile()
+        self.rss = _rss()
+        self.cpu = time.process_time()
+        self.wall = time.perf_counter()
+        if self.cprofile is not None:
+            self.cprofile.enable()
+        return self.record
+
+    def __exit__(self, *exc_info):
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        profiler, record = self.profiler, self.record
+        record.wall = time.perf_counter() - self.wall
+        record.cpu = time.process_time() - self.cpu
+        record.memory_delta = _rss() - self.rss
+        if self.cprofile is not None:
+            os.makedirs(profiler.directory, exist_ok=True)
+            record.profile = os.path.join(profiler.directory,
+                                          record.stage.replace('/', '.') + '.prof')
+            self.cprofile.dump_stats(record.profile)
+            profiler._profiling = False
+        profiler._stack.pop()
+        profiler.records.append(record)
+        return False
+
+
+class Profiler(object):
+    """Collects `Record`s of the stages run while it is enabled."""
+
+    def __init__(self, enabled=False, profile_stage=None, directory='.', stack=()):
+        self.enabled = enabled
+        self.profile_stage = profile_stage
+        self.directory = directory
+        self.records = []
+        # names of the open stages, outermost first
+        self._stack = list(stack)
+        self._profiling = False
+
+    def stage(self, name, rows_in=None):
+        """Context manager measuring the enclosed block as stage `name`."""
+        if not self.enabled:
+            return _DISABLED
+        return _Stage(self, name, rows_in)
+
+    def report(self):
+        """The records and per-stage totals as JSON-serializable data."""
+        totals = OrderedDict()
+        for record in self.records:
+            total = totals.setdefault(record.stage, OrderedDict(
+                [('calls', 0), ('wall', 0.0), ('cpu', 0.0)]))
+            total['calls'] += 1
+            total['wall'] += record.wall
+            total['cpu'] += record.cpu
+        return OrderedDict([('pid', os.getpid()),
+                            ('stages', [record.to_dict() for record in self.records]),
+                            ('totals', totals)])
+
+    def write(self, path):
+        """Write `report` to `path` as JSON."""
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+            f.write('\n')
+        return path
+
+    def merge(self, records):
+        """Add records measured elsewhere, e.g. in a worker process."""
+        self.records.extend(records)
+
+    def settings(self):
+        """Arguments for a profiler that continues this one in a worker
+        process: same options, same open stages, no records."""
+        return self.enabled, self.profile_stage, self.directory, tuple(self._stack)
+
+    def reset(self):
+        self.records = []
+
+
+def _from_environment():
+    return Profiler(enabled=os.environ.get(ENV, '0') not in ('', '0'),
+                    profile_stage=os.environ.get(ENV_STAGE) or None,
+                    directory=os.environ.get(ENV_DIR, '.'))
+
+
+# the profiler used by the instrumented functions
+profiler = _from_environment()
+
+
+def enable(profile_stage=None, directory=None):
+    """Turn instrumentation on, optionally with a cProfile dump of one stage."""
+    profiler.enabled = True
+    if profile_stage is not None:
+        profiler.profile_stage = profile_stage
+    if directory is not None:
+        profiler.directory = directory
+
+
+def disable():
+    profiler.enabled = False
+
+
+def stage(name, rows_in=None):
+    """Measure a block: ``with stage('genres', len(dataset)) as record: ...``."""
+    return profiler.stage(name, rows_in)
+
+
+def report():
+    return profiler.report()
+
+
+def profiled(name):
+    """Decorator measuring every call of a function as stage `name`.
+
+    Rows in are those of the first argument, rows out those of the result
+    (or of its first item), when they are frames or series.
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            with profiler.stage(name, _rows(args[0]) if args else None) as record:
+                result = function(*args, **kwargs)
+                record.rows_out = _rows(result)
+            return result
+        return wrapper
+    return decorate
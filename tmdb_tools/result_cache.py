@@ -0,0 +1,335 @@
+"""Analysis results kept on disk between runs.
+
+Every stage of the report (the Clean stage and each analysis section) is
+stored under a key made of
+
+* the stage name and its parameters;
+* the code version of the stage: a hash of the source of its function,
+  of the helpers it calls from the same module, and of every other
+  `tmdb_tools` module it uses, directly or through other modules;
+* the keys of the stages it depends on, and for the first stage the
+  content fingerprint of the input CSV.  The fingerprint is kept in
+  ``files.json`` with the size and modification time of the file, and
+  the CSV is only hashed again when one of them changed.
+
+Editing `fences` therefore changes the keys of the popularity and revenue
+sections, which use it, but not the key of the genre section.  A stage
+whose key is unchanged is read back instead of recomputed, and when every
+section hits, the CSV is not even loaded.
+
+Entries are pickles in a directory with an ``index.json`` that records
+their size, last use and dependencies.  `run_cached` evicts the least
+recently used entries once the total size passes `max_bytes` and writes
+the index once, at the end of the run; `invalidate` removes the entries
+of a stage together with everything computed from them.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+import time
+import types
+from collections import OrderedDict, namedtuple
+
+from .analysis import SECTIONS
+from .cleaning import CLEAN_RULES, clean
+from .loader import CACHE_DIR, COLUMNS, fingerprint, load_movies
+from .runner import Report, run_sections
+
+# directory of the result cache inside the loader's cache directory
+RESULTS_DIR = 'results'
+
+# total size of the entries above which the least recently used are evicted
+MAX_BYTES = 256 * 2 ** 20
+
+# a file modified less than this many seconds before it was hashed may
+# change again without changing its size or modification time, so its
+# fingerprint is not kept
+RACY_SECONDS = 2
+
+_PACKAGE = __name__.rpartition('.')[0]
+
+CachedRun = namedtuple('CachedRun', ['report', 'clean_report', 'dataset', 'cached',
+                                     'load_seconds'])
+CachedRun.__doc__ = """The outcome of `run_cached`."""
+
+
+def _names(code):
+    # global names used by `code` and the comprehensions and lambdas inside it
+    names = set(code.co_names)
+    for constant in code.co_consts:
+        if isinstance(constant, types.CodeType):
+            names |= _names(constant)
+    return names
+
+
+def _dependencies(function):
+    # the functions, classes and constants of the module of `function` it
+    # uses, itself included, and the other tmdb_tools modules they use,
+    # transitively
+    functions, constants, modules = OrderedDict(), {}, {}
+    pending = [inspect.unwrap(function)]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, (types.FunctionType, type)) and \
+                value.__module__ == function.__module__:
+            value = inspect.unwrap(value)
+            if value.__qualname__ in functions:
+                continue
+            functions[value.__qualname__] = value
+            for code in ([value] if isinstance(value, types.FunctionType) else
+                         [member for member in vars(value).values()
+                          if isinstance(member, types.FunctionType)]):
+                for name in sorted(_names(code.__code__)):
+                    if name not in code.__globals__:
+                        continue
+                    used = code.__globals__[name]
+                    if not callable(used) and not isinstance(used, types.ModuleType):
+                        constants[name] = repr(used)
+                    pending.append(used)
+            continue
+        module = value if isinstance(value, types.ModuleType) else \
+            sys.modules.get(getattr(value, '__module__', None) or '')
+        if module is None or module.__name__ in modules or \
+                module.__name__ == function.__module__ or \
+                not module.__name__.startswith(_PACKAGE + '.'):
+            continue
+        modules[module.__name__] = module
+        pending.extend(vars(module).values())
+    return (list(functions.values()), sorted(constants.items()),
+            [modules[name] for name in sorted(modules)])
+
+
+def code_version(function):
+    """Hash of the source of `function` and of the code it depends on.
+
+    That is the functions, classes and constants it uses from its own
+    module and the whole source of every other `tmdb_tools` module it
+    uses, so editing an unrelated function of the same module leaves the
+    version unchanged.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    functions, constants, modules = _dependencies(function)
+    for dependency in functions:
+        digest.update(inspect.getsource(dependency).encode())
+    digest.update(repr(constants).encode())
+    for module in modules:
+        digest.update(module.__name__.encode())
+        digest.update(inspect.getsource(module).encode())
+    return digest.hexdigest()
+
+
+class ResultCache(object):
+    """A size-bounded store of pickled stage results with dependency tracking."""
+
+    def __init__(self, directory, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, 'index.json')
+        self._files_path = os.path.join(directory, 'files.json')
+        self.index = self._read(self._index_path)
+        self.files = self._read(self._files_path)
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path) as f:
+                return json.load(f, object_pairs_hook=OrderedDict)
+        except (OSError, ValueError):
+            return OrderedDict()
+
+    @staticmethod
+    def _write(path, data):
+        partial = path + '.partial'
+        with open(partial, 'w') as f:
+            json.dump(data, f, indent=1)
+        os.replace(partial, path)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __repr__(self):
+        return '<ResultCache {} entries, {:.1f} MB in {}>'.format(
+            len(self), self.size() / 2 ** 20, self.directory)
+
+    @staticmethod
+    def key(stage, params=None, code=None, depends=()):
+        """The key of `stage` with `params` and `code` version after `depends`."""
+        spec = repr((stage, sorted((params or {}).items()), code, list(depends)))
+        return hashlib.blake2b(spec.encode(), digest_size=16).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def save(self):
+        """Write the index and the known fingerprints after `get`, `put` or `evict`."""
+        self._write(self._index_path, self.index)
+        self._write(self._files_path, self.files)
+
+    def fingerprint(self, path):
+        """`loader.fingerprint` of `path`, reused while its size and mtime are unchanged."""
+        stat = os.stat(path)
+        name = os.path.abspath(path)
+        known = self.files.get(name)
+        if known is not None and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return known[2]
+        content = fingerprint(path)
+        if time.time() - stat.st_mtime_ns / 1e9 > RACY_SECONDS:
+            self.files[name] = [stat.st_size, stat.st_mtime_ns, content]
+        else:
+            self.files.pop(name, None)
+        return content
+
+    def get(self, key):
+        """Return (True, value) for a stored key and (False, None) otherwise."""
+        entry = self.index.get(key)
+        if entry is None:
+            return False, None
+        try:
+            with open(self._path(key), 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self._remove([key])
+            return False, None
+        entry['used'] = time.time()
+        self.index.move_to_end(key)
+        return True, value
+
+    def put(self, key, stage, value, depends=()):
+        """Store `value` as the result of `stage` under `key`.
+
+        The entry is only recorded in memory: call `evict` and `save` once
+        after storing a run's results.
+        """
+        partial = self._path(key) + '.partial'
+        with open(partial, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(partial, self._path(key))
+        self.index[key] = OrderedDict([('stage', stage),
+                                       ('bytes', os.path.getsize(self._path(key))),
+                                       ('used', time.time()), ('depends', list(depends))])
+        self.index.move_to_end(key)
+
+    def size(self):
+        return sum(entry['bytes'] for entry in self.index.values())
+
+    def _remove(self, keys):
+        for key in keys:
+            self.index.pop(key, None)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def dependents(self, keys):
+        """`keys` and every key computed from them, directly or not."""
+        found, pending = set(), list(keys)
+        while pending:
+            key = pending.pop()
+            if key in found:
+                continue
+            found.add(key)
+            pending.extend(other for other, entry in self.index.items()
+                           if key in entry['depends'])
+        return found
+
+    def evict(self):
+        """Drop the least recently used entries until the cache fits `max_bytes`.
+
+        Entry files missing from the index, left by a run interrupted
+        before `save`, are removed too.  Call `save` afterwards.
+        """
+        evicted, total = [], self.size()
+        for key, entry in list(self.index.items()):
+            if total <= self.max_bytes:
+                break
+            evicted.append(key)
+            total -= entry['bytes']
+        self._remove(evicted)
+        self._remove(filename[:-len('.pkl')] for filename in os.listdir(self.directory)
+                     if filename.endswith('.pkl') and filename[:-len('.pkl')] not in self.index)
+        return evicted
+
+    def invalidate(self, stage=None):
+        """Remove the entries of `stage` (all if None) and those that depend on them."""
+        keys = [key for key, entry in self.index.items()
+                if stage is None or entry['stage'] == stage]
+        removed = self.dependents(keys)
+        self._remove(removed)
+        self.save()
+        return removed
+
+    def clear(self):
+        return self.invalidate()
+
+
+def default_directory(path):
+    """The result cache next to the loader's cache of `path`."""
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR, RESULTS_DIR)
+
+
+def _keys(cache, content, names, rules, columns):
+    # the key of the Clean stage on CSV `content`, and of the sections after it
+    clean_key = cache.key('clean', {'rules': tuple(rules), 'columns': tuple(columns)},
+                          code_version(clean) + code_version(load_movies), [content])
+    return clean_key, OrderedDict(
+        (name, cache.key(name, None, code_version(SECTIONS[name]), [clean_key]))
+        for name in names)
+
+
+def run_cached(path, sections=None, processes=None, cache=None, rules=CLEAN_RULES,
+               columns=COLUMNS, load_cache=True):
+    """`run_sections` on the cleaned CSV at `path`, reusing stored results.
+
+    Returns a `CachedRun`; `dataset` is None when every result came from
+    the cache, and `cached` names the stages that did.  `sections` names
+    stages of `SECTIONS`; `load_cache` is passed to `load_movies`.
+    """
+    if cache is None:
+        cache = ResultCache(default_directory(path))
+    start = time.perf_counter()
+    names = list(SECTIONS if sections is None else sections)
+    content = cache.fingerprint(path)
+    clean_key, keys = _keys(cache, content, names, rules, columns)
+
+    cached, results, timings = [], OrderedDict(), OrderedDict()
+    hit, clean_report = cache.get(clean_key)
+    if hit:
+        cached.append('clean')
+    for name, key in keys.items():
+        lookup = time.perf_counter()
+        hit, value = cache.get(key)
+        if hit:
+            results[name], timings[name] = value, time.perf_counter() - lookup
+            cached.append(name)
+    missing = [name for name in names if name not in results]
+
+    dataset, loaded = None, 0.0
+    if missing or 'clean' not in cached:
+        load = time.perf_counter()
+        dataset, loaded_content = load_movies(path, columns, cache=load_cache,
+                                              with_fingerprint=True)
+        dataset, clean_report = clean(dataset, rules)
+        loaded = time.perf_counter() - load
+        if loaded_content != content:
+            # the file changed since it was fingerprinted: the results read
+            # back belong to the old contents, so compute them all again
+            cache.files.pop(os.path.abspath(path), None)
+            clean_key, keys = _keys(cache, loaded_content, names, rules, columns)
+            cached, missing = [], names
+        cache.put(clean_key, 'clean', clean_report)
+    if missing:
+        computed = run_sections(dataset, missing, processes)
+        for name in missing:
+            results[name], timings[name] = computed[name], computed.timings[name]
+            cache.put(keys[name], name, computed[name], [clean_key])
+    cache.evict()
+    cache.save()
+    report = Report(OrderedDict((name, results[name]) for name in names),
+                    OrderedDict((name, timings[name]) for name in names),
+                    time.perf_counter() - start)
+    return CachedRun(report, clean_report, dataset, cached, loaded)
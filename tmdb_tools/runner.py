@@ -0,0 +1,266 @@
+"""Run the analysis sections in parallel worker processes.
+
+The cleaned frame is copied once into shared memory: numeric columns as
+they are, string and categorical columns as integer codes plus a UTF-8
+dictionary.  Every worker attaches to the same blocks when it starts, so
+the frame is never pickled per task; numeric columns are used in place and
+only the dictionaries are decoded per worker.  A frame already written to a
+`MovieStore` is not copied at all: the workers map the store files.  The
+results of all the sections are collected into a `Report`.
+"""
+
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from .analysis import SECTIONS
+from .store import MovieStore
+
+
+class SharedFrame(object):
+    """A copy of a DataFrame in shared memory, described by `spec`.
+
+    Use it as a context manager, or call `close` to release the blocks.
+    `attach(spec)` rebuilds the frame in any process.
+    """
+
+    def __init__(self, frame):
+        self._blocks = []
+        self.spec = {'index': self._share_index(frame.index), 'columns': []}
+        try:
+            for column in frame.columns:
+                self.spec['columns'].append(self._share_column(column, frame[column]))
+        except Exception:
+            self.close()
+            raise
+
+    def _share(self, array):
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self._blocks.append(block)
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+        return (block.name, array.dtype.str, array.shape)
+
+    def _share_strings(self, values):
+        encoded = [str(value).encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return self._share(data), self._share(offsets)
+
+    def _share_index(self, index):
+        if isinstance(index, pd.RangeIndex):
+            return ('range', index.start, index.stop, index.step)
+        return ('array', self._share(index.to_numpy()))
+
+    def _share_column(self, name, series):
+        dtype = series.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            return {'name': name, 'kind': 'categorical',
+                    'codes': self._share(series.cat.codes.to_numpy()),
+                    'dictionary': self._share_strings(dtype.categories)}
+        if isinstance(dtype, np.dtype) and dtype.kind in 'biufmM':
+            return {'name': name, 'kind': 'numeric', 'values': self._share(series.to_numpy())}
+        codes, uniques = pd.factorize(series)
+        return {'name': name, 'kind': 'string', 'dtype': str(dtype),
+                'codes': self._share(codes.astype(np.int32)),
+                'dictionary': self._share_strings(uniques)}
+
+    def close(self):
+        """Release and remove the shared blocks."""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def attach(spec):
+    """Rebuild the frame described by `spec`; returns (frame, blocks).
+
+    Keep `blocks` referenced for as long as the frame is used.
+    """
+    blocks = []
+
+    def view(meta):
+        name, dtype, shape = meta
+        # worker processes share the resource tracker of their parent, so the
+        # blocks stay owned (and are removed) by the process that created them
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+        array = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        return array
+
+    def strings(meta):
+        data, offsets = view(meta[0]).tobytes(), view(meta[1])
+        return [data[offsets[i]:offsets[i + 1]].decode('utf-8')
+                for i in range(len(offsets) - 1)]
+
+    if spec['index'][0] == 'range':
+        index = pd.RangeIndex(*spec['index'][1:])
+    else:
+        index = pd.Index(view(spec['index'][1]))
+
+    columns = OrderedDict()
+    for meta in spec['columns']:
+        if meta['kind'] == 'numeric':
+            columns[meta['name']] = view(meta['values'])
+        elif meta['kind'] == 'categorical':
+            columns[meta['name']] = pd.Categorical.from_codes(view(meta['codes']),
+                                                              strings(meta['dictionary']))
+        else:
+            uniques = np.array(strings(meta['dictionary']) + [np.nan], dtype=object)
+            # code -1 (missing) picks the trailing NaN
+            columns[meta['name']] = pd.Series(uniques[view(meta['codes'])], index=index,
+                                              dtype=meta['dtype'])
+    return pd.DataFrame(columns, index=index, copy=False), blocks
+
+
+class Report(object):
+    """Results of the analysis sections, by section name.
+
+    `timings` holds the seconds spent in every section and `wall` the
+    elapsed time of the whole run.
+    """
+
+    def __init__(self, results, timings, wall):
+        self.results = results
+        self.timings = timings
+        self.wall = wall
+
+    def __getitem__(self, name):
+        return self.results[name]
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+    def __repr__(self):
+        return '<Report {} in {:.3f}s>'.format(', '.join(self.results), self.wall)
+
+    def tables(self):
+        """Yield (section, name, table) for every Series or DataFrame result."""
+        for section, results in self.results.items():
+            for name, value in results.items():
+                if isinstance(value, (pd.Series, pd.DataFrame)):
+                    yield section, name, value
+
+    def to_dict(self):
+        """The results and timings as JSON-serializable data.
+
+        Series and frames are stored in pandas' 'split' layout, with
+        missing values as null.
+        """
+        return {'sections': to_jsonable(self.results),
+                'timings': to_jsonable(self.timings),
+                'wall': self.wall}
+
+
+def to_jsonable(value):
+    """Convert results to lists, dicts, strings and numbers."""
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        return json.loads(value.to_json(orient='split', date_format='iso', double_precision=15))
+    if isinstance(value, dict):
+        return OrderedDict((str(key), to_jsonable(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+# state of a worker process
+_worker = {}
+
+
+def _init_worker(spec, settings):
+    _worker['frame'], _worker['blocks'] = attach(spec)
+    profiling.profiler = profiling.Profiler(*settings)
+
+
+def _init_store(directory, settings):
+    # string columns stay categoricals over the mapped codes: decoding them
+    # would build one string per row in every worker
+    _worker['frame'] = MovieStore(directory).frame()
+    profiling.profiler = profiling.Profiler(*settings)
+
+
+def _collect(pool, sections, results, timings):
+    futures = OrderedDict((name, pool.submit(_run_section, name, function))
+                          for name, function in sections.items())
+    for name, future in futures.items():
+        results[name], timings[name], records = future.result()
+        profiling.profiler.merge(records)
+
+
+def _run_section(name, function):
+    start = time.perf_counter()
+    with profiling.stage(name, len(_worker['frame'])):
+        result = function(_worker['frame'])
+    records, profiling.profiler.records = profiling.profiler.records, []
+    return result, time.perf_counter() - start, records
+
+
+def _select(sections):
+    if sections is None:
+        return OrderedDict(SECTIONS)
+    if isinstance(sections, dict):
+        return OrderedDict(sections)
+    return OrderedDict((name, SECTIONS[name]) for name in sections)
+
+
+def run_sections(dataset, sections=None, processes=None):
+    """Run the analysis sections on `dataset` and return a `Report`.
+
+    `sections` is a list of names from `SECTIONS`, or a mapping of names
+    to top-level functions (default: all of `SECTIONS`).  `processes`
+    defaults to one per section up to the number of CPUs; with
+    ``processes=1`` the sections run one after another in this process.
+
+    `dataset` may also be a `MovieStore`: every worker then maps the store
+    itself instead of attaching to a shared-memory copy of the frame.
+    """
+    sections = _select(sections)
+    if processes is None:
+        processes = min(len(sections), os.cpu_count() or 1)
+
+    start = time.perf_counter()
+    results, timings = OrderedDict(), OrderedDict()
+    with profiling.stage('sections', len(dataset)):
+        if processes <= 1:
+            if isinstance(dataset, MovieStore):
+                dataset = dataset.frame()
+            for name, function in sections.items():
+                section_start = time.perf_counter()
+                with profiling.stage(name, len(dataset)):
+                    results[name] = function(dataset)
+                timings[name] = time.perf_counter() - section_start
+        elif isinstance(dataset, MovieStore):
+            settings = profiling.profiler.settings()
+            with ProcessPoolExecutor(processes, initializer=_init_store,
+                                     initargs=(dataset.directory, settings)) as pool:
+                _collect(pool, sections, results, timings)
+        else:
+            settings = profiling.profiler.settings()
+            with SharedFrame(dataset) as shared, \
+                    ProcessPoolExecutor(processes, initializer=_init_worker,
+                                        initargs=(shared.spec, settings)) as pool:
+                _collect(pool, sections, results, timings)
+    return Report(results, timings, time.perf_counter() - start)
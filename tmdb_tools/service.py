@@ -0,0 +1,290 @@
+"""A long-lived query layer over the cleaned dataset.
+
+`QueryService` loads and cleans the CSV once and answers the notebook's
+questions with parameters: the number of rows `n`, a release year range
+`years` and a `genre`.  Movies are ranked once per metric and the genres
+parsed once, so a filtered top-N list is a boolean gather over a
+precomputed order rather than a sort.  Answers are kept in an LRU cache
+keyed by the dataset version, the query and its parameters (defaults
+filled in), so a repeated dashboard query is a dictionary lookup.
+
+The same queries are served over HTTP (``GET /top_movies?n=5&genre=Drama``)
+and over stdin/stdout as JSON lines (``{"query": "top_movies", "params":
+{"n": 5}}``); see ``python -m tmdb_tools serve``.
+"""
+
+import inspect
+import json
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import numpy as np
+import pandas as pd
+
+from .cleaning import clean
+from .directors import DirectorTable
+from .genres import most_frequent_by_year
+from .loader import load_movies
+from .multivalue import MultiValueIndex
+from .runner import to_jsonable
+
+CACHE_SIZE = 1024
+
+# columns of the movie lists
+SHOWN = ['original_title', 'director', 'release_year', 'genres', 'popularity', 'revenue_adj']
+
+METRICS = ('popularity', 'revenue_adj')
+
+
+class QueryService(object):
+    """Parameterized answers to the notebook's questions, with an LRU cache.
+
+    Build it from a CSV `path` (loaded with `load_movies` and cleaned) or
+    from an already cleaned `dataset`.
+    """
+
+    QUERIES = ('top_movies', 'top_grossing', 'director_ranking', 'year_counts',
+               'popular_genre_by_year', 'info')
+
+    def __init__(self, path='tmdb-movies.csv', dataset=None, cache_size=CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self.hits = self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+        self._signatures = {name: inspect.signature(getattr(self, name))
+                            for name in self.QUERIES}
+        self.load(dataset)
+
+    def load(self, dataset=None):
+        """(Re)load the dataset; cached answers of older versions are dropped."""
+        with self._lock:
+            if dataset is None:
+                # the version is the content hash the loader keyed its cache on
+                dataset, version = load_movies(self.path, with_fingerprint=True)
+                dataset, _ = clean(dataset)
+            else:
+                version = '{:016x}'.format(
+                    int(pd.util.hash_pandas_object(dataset, index=True).sum()) & (2 ** 64 - 1))
+            self.dataset = dataset.reset_index(drop=True)
+            self._years = self.dataset.release_year.to_numpy()
+            self._genres = MultiValueIndex.from_series(self.dataset.genres)
+            self._order = {metric: np.argsort(-self.dataset[metric].to_numpy(dtype=float),
+                                              kind='stable') for metric in METRICS}
+            self._directors = MultiValueIndex.from_series(self.dataset.director)
+            self._director_table = None
+            self._genre_years = self._genres.group_counts(self._years)
+            self._cache.clear()
+            # last: `query` compares it to tell that a reload happened
+            self.version = version
+
+    # filters
+
+    def _mask(self, years, genre):
+        # None when every movie is selected
+        mask = None
+        if years is not None:
+            low, high = years
+            mask = np.ones(len(self._years), dtype=bool)
+            if low is not None:
+                mask &= self._years >= low
+            if high is not None:
+                mask &= self._years <= high
+        if genre is not None:
+            try:
+                genre_mask = self._genres.mask(genre)
+            except KeyError:
+                genre_mask = np.zeros(len(self._years), dtype=bool)
+            mask = genre_mask if mask is None else mask & genre_mask
+        return mask
+
+    # queries
+
+    def top_movies(self, n=10, metric='popularity', years=None, genre=None):
+        """The `n` movies with the largest `metric`, largest first."""
+        if metric not in self._order:
+            raise ValueError('metric must be one of {}, got {!r}'.format(METRICS, metric))
+        order = self._order[metric]
+        mask = self._mask(years, genre)
+        if mask is not None:
+            order = order[mask[order]]
+        return self.dataset.iloc[order[:n]][SHOWN]
+
+    def top_grossing(self, n=10, years=None, genre=None):
+        """The `n` movies with the largest adjusted revenue."""
+        return self.top_movies(n, 'revenue_adj', years, genre)
+
+    def director_ranking(self, n=10, metric=None, top=100, years=None, genre=None):
+        """Directors with the most movies, optionally among the top movies.
+
+        With a `metric`, only the `top` movies by that metric count (the
+        notebook's questions 3 and 6); without, all movies do (question 8).
+        """
+        mask = self._mask(years, genre)
+        if mask is None and metric is None:
+            if self._director_table is None:
+                self._director_table = DirectorTable(self.dataset)
+            return self._director_table.top('movies', n).movies
+        if mask is None:
+            mask = np.ones(len(self._years), dtype=bool)
+        if metric is not None:
+            order = self._order[metric]
+            selected = np.zeros(len(mask), dtype=bool)
+            selected[order[mask[order]][:top]] = True
+            mask = selected
+        pairs = mask[self._directors.rows]
+        counts = np.bincount(self._directors.codes[pairs], minlength=self._directors.n_tokens)
+        ranked = np.argsort(-counts, kind='stable')[:n]
+        ranked = ranked[counts[ranked] > 0]
+        return pd.Series(counts[ranked], name='movies',
+                         index=pd.Index(self._directors.tokens[ranked], name='director'))
+
+    def year_counts(self, years=None, genre=None):
+        """Number of movies per release year."""
+        mask = self._mask(years, genre)
+        values = self._years if mask is None else self._years[mask]
+        return pd.Series(values).value_counts().sort_index().rename_axis('release_year')
+
+    def popular_genre_by_year(self, years=None):
+        """The most frequent genre of every year in `years`."""
+        counts = self._genre_years
+        if years is not None:
+            low, high = years
+            keep = np.ones(len(counts), dtype=bool)
+            if low is not None:
+                keep &= counts.index >= low
+            if high is not None:
+                keep &= counts.index <= high
+            counts = counts[keep]
+        counts = counts.loc[counts.sum(axis=1) > 0, counts.sum() > 0]
+        counts = counts[counts.sum().sort_values(ascending=False, kind='stable').index]
+        return most_frequent_by_year(counts).rename_axis('release_year').rename('genre')
+
+    def info(self):
+        """Dataset version, size and cache statistics."""
+        return {'version': self.version, 'movies': len(self.dataset),
+                'cached': len(self._cache), 'hits': self.hits, 'misses': self.misses}
+
+    # dispatch and caching
+
+    def _key(self, name, params):
+        if name not in self.QUERIES:
+            raise ValueError('unknown query {!r}; expected one of {}'
+                             .format(name, ', '.join(self.QUERIES)))
+        bound = self._signatures[name].bind(**params)
+        bound.apply_defaults()
+        for count in ('n', 'top'):
+            value = bound.arguments.get(count)
+            if value is not None and value < 0:
+                raise ValueError('{} must not be negative, got {}'.format(count, value))
+        arguments = tuple((key, tuple(value) if isinstance(value, list) else value)
+                          for key, value in sorted(bound.arguments.items()))
+        return self.version, name, arguments
+
+    def query(self, name, **params):
+        """Answer query `name`, from the cache when it was asked before.
+
+        Cached answers are shared: do not modify them.  Answers are computed
+        outside the lock, so the queries of several threads run
+        concurrently; two threads missing on the same key both compute it.
+        """
+        if name == 'info':
+            return self.info()
+        with self._lock:
+            key = self._key(name, params)
+            if key in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            self.misses += 1
+        result = getattr(self, name)(**dict(key[2]))
+        with self._lock:
+            if key[0] != self.version:
+                # the dataset was reloaded meanwhile: answer from the new one
+                key = self._key(name, params)
+                result = getattr(self, name)(**dict(key[2]))
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def answer(self, name, params):
+        """`query` with its result as JSON-serializable data."""
+        result = self.query(name, **params)
+        if isinstance(result, pd.DataFrame):
+            result = result.reset_index(drop=True)
+        return to_jsonable(result)
+
+
+def parse_params(params):
+    """Convert query string values: numbers, and year ranges like ``1990-2000``."""
+    parsed = {}
+    for key, value in params.items():
+        if key == 'years':
+            low, _, high = value.partition('-')
+            value = (int(low) if low else None, int(high) if high else None)
+        elif key in ('n', 'top'):
+            value = int(value)
+        parsed[key] = value
+    return parsed
+
+
+def serve_http(service, host='127.0.0.1', port=8000):
+    """Serve ``GET /<query>?<params>`` with JSON answers until interrupted."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            try:
+                body = service.answer(url.path.strip('/') or 'info',
+                                      parse_params(dict(parse_qsl(url.query))))
+                status = 200
+            except (TypeError, ValueError, KeyError) as error:
+                body, status = {'error': str(error)}, 400
+            except Exception as error:
+                # a bug, not a bad request: answer instead of dropping the connection
+                body, status = {'error': '{}: {}'.format(type(error).__name__, error)}, 500
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def serve_stdio(service, stdin=None, stdout=None):
+    """Answer JSON-line requests from `stdin` on `stdout` until end of input.
+
+    A request is ``{"query": name, "params": {...}}``; years are given as a
+    ``[low, high]`` list.  Every answer is one line, ``{"result": ...}`` or
+    ``{"error": ...}``.
+    """
+    stdin = sys.stdin if stdin is None else stdin
+    stdout = sys.stdout if stdout is None else stdout
+    for line in stdin:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            response = {'result': service.answer(request['query'], request.get('params', {}))}
+        except (TypeError, ValueError, KeyError) as error:
+            response = {'error': str(error)}
+        except Exception as error:
+            # a bug, not a bad request: answer it and keep serving
+            response = {'error': '{}: {}'.format(type(error).__name__, error)}
+        stdout.write(json.dumps(response) + '\n')
+        stdout.flush()
@@ -0,0 +1,260 @@
+"""Mergeable summaries for data that is seen in chunks.
+
+`KLLSketch` estimates quantiles of a stream in bounded memory (Karnin,
+Lang and Liberty, "Optimal Quantile Approximation in Streams", 2016).
+`Moments` keeps the exact count, mean, variance, minimum and maximum of a
+column, and `CoMoments` the covariance of two columns.  All of them can be
+updated with numpy arrays and merged, so chunks can be summarized
+independently and combined afterwards.
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+
+# observed worst rank error of a KLLSketch over its quantiles is about
+# ERROR_SCALE / k (lognormal and Pareto streams, 1-2M items, 5 seeds)
+ERROR_SCALE = 3.0
+
+
+class KLLSketch(object):
+    """Quantile sketch with `k` items in its top compactor.
+
+    The sketch keeps a hierarchy of compactors; an item at level ``h``
+    stands for ``2 ** h`` items of the stream.  When a compactor is full,
+    it is sorted and every other item, starting at a random offset, is
+    promoted to the next level.  The rank error of a quantile is typically
+    below ``ERROR_SCALE / k`` of the stream length; use `for_error` to size
+    a sketch from a target error.  Missing values are ignored.
+
+    Sketches merge across chunks, and across processes through pickling or
+    `to_bytes`.
+    """
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        # total weight of the items discarded by compactions
+        self.compacted = 0.0
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def for_error(cls, error, seed=None):
+        """A sketch whose typical rank error is below `error` (e.g. 0.01)."""
+        if not 0 < error < 1:
+            raise ValueError('error must be between 0 and 1, got {}'.format(error))
+        return cls(int(np.ceil(ERROR_SCALE / error)), seed=seed)
+
+    @property
+    def error(self):
+        """Typical rank error, as a fraction of the stream length."""
+        return ERROR_SCALE / self.k
+
+    @property
+    def error_bound(self):
+        """Worst-case rank error, as a fraction of the stream length.
+
+        Every compaction shifts any rank by at most the weight of one
+        item of the compacted level; this is the sum of those weights, a
+        guaranteed but pessimistic bound.
+        """
+        return self.compacted / self.n if self.n else 0.0
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) >= self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # an odd item out stays at its level
+                keep = items[len(items) - len(items) % 2:]
+                offset = self._rng.integers(2)
+                promoted = items[offset:len(items) - len(items) % 2:2]
+                self.levels[level] = keep
+                self.compacted += 2.0 ** level
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values):
+        """Add an array (or a single value) to the sketch."""
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.n += len(values)
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+        return self
+
+    def merge(self, other):
+        """Fold `other` into this sketch and return it."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.compacted += other.compacted
+        self._compress()
+        return self
+
+    def to_bytes(self):
+        """Serialize the sketch, e.g. to send it to another process."""
+        buffer = io.BytesIO()
+        np.savez(buffer, header=np.array([self.k, self.n, self.compacted]),
+                 **{'level{}'.format(h): level for h, level in enumerate(self.levels)})
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data, seed=None):
+        """Rebuild a sketch serialized with `to_bytes`."""
+        with np.load(io.BytesIO(data)) as arrays:
+            k, n, compacted = arrays['header']
+            sketch = cls(int(k), seed=seed)
+            sketch.n, sketch.compacted = int(n), float(compacted)
+            sketch.levels = [arrays['level{}'.format(h)]
+                             for h in range(len(arrays.files) - 1)]
+        return sketch
+
+    @classmethod
+    def of(cls, values, k=200, seed=None, chunksize=1000000):
+        """Sketch an array chunk by chunk."""
+        sketch = cls(k, seed=seed)
+        values = np.asarray(values, dtype=float)
+        for start in range(0, len(values), chunksize):
+            sketch.update(values[start:start + chunksize])
+        return sketch
+
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h)
+                                  for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], weights[order]
+
+    def rank(self, value, strict=False):
+        """Estimated number of items <= `value` (< `value` if `strict`)."""
+        total = 0.0
+        for h, level in enumerate(self.levels):
+            total += np.count_nonzero(level < value if strict else level <= value) * 2.0 ** h
+        return total
+
+    def quantile(self, qs):
+        """Estimated quantiles; `qs` may be a number or a sequence."""
+        scalar = np.ndim(qs) == 0
+        qs = np.atleast_1d(np.asarray(qs, dtype=float))
+        if self.n == 0:
+            result = np.full(len(qs), np.nan)
+        else:
+            items, weights = self._weighted()
+            cumulative = np.cumsum(weights)
+            targets = qs * cumulative[-1]
+            positions = np.searchsorted(cumulative, targets, side='left')
+            result = items[np.minimum(positions, len(items) - 1)]
+        return result[0] if scalar else result
+
+    def __len__(self):
+        return self.n
+
+    def __repr__(self):
+        return '<KLLSketch k={} n={} stored={}>'.format(
+            self.k, self.n, sum(len(level) for level in self.levels))
+
+
+class Moments(object):
+    """Exact count, mean, variance, minimum and maximum of a stream."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values):
+            other = Moments()
+            other.n = len(values)
+            other.mean = values.mean()
+            other.m2 = ((values - other.mean) ** 2).sum()
+            other.min, other.max = values.min(), values.max()
+            self.merge(other)
+        return self
+
+    def merge(self, other):
+        # Chan et al. pairwise combination
+        n = self.n + other.n
+        if n == 0:
+            return self
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta ** 2 * self.n * other.n / n
+        self.mean += delta * other.n / n
+        self.n = n
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        return self
+
+    @property
+    def std(self):
+        """Sample standard deviation, as in ``Series.std``."""
+        return np.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.nan
+
+
+class CoMoments(object):
+    """Exact covariance and Pearson correlation of two streams."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean_x = self.mean_y = 0.0
+        self.m2_x = self.m2_y = self.c_xy = 0.0
+
+    def update(self, x, y):
+        x, y = np.asarray(x, dtype=float).ravel(), np.asarray(y, dtype=float).ravel()
+        valid = ~(np.isnan(x) | np.isnan(y))
+        x, y = x[valid], y[valid]
+        if len(x):
+            other = CoMoments()
+            other.n = len(x)
+            other.mean_x, other.mean_y = x.mean(), y.mean()
+            dx, dy = x - other.mean_x, y - other.mean_y
+            other.m2_x, other.m2_y, other.c_xy = (dx * dx).sum(), (dy * dy).sum(), (dx * dy).sum()
+            self.merge(other)
+        return self
+
+    def merge(self, other):
+        n = self.n + other.n
+        if n == 0:
+            return self
+        dx, dy = other.mean_x - self.mean_x, other.mean_y - self.mean_y
+        weight = self.n * other.n / n
+        self.m2_x += other.m2_x + dx * dx * weight
+        self.m2_y += other.m2_y + dy * dy * weight
+        self.c_xy += other.c_xy + dx * dy * weight
+        self.mean_x += dx * other.n / n
+        self.mean_y += dy * other.n / n
+        self.n = n
+        return self
+
+    @property
+    def pearson(self):
+        denominator = np.sqrt(self.m2_x * self.m2_y)
+        return self.c_xy / denominator if denominator else np.nan
+
+
+def describe(moments, sketch):
+    """A ``Series.describe``-like summary from `Moments` and a sketch.
+
+    Count, mean, std, min and max are exact; the quartiles are estimates.
+    """
+    quartiles = sketch.quantile([0.25, 0.5, 0.75]) if sketch.n else [np.nan] * 3
+    return pd.Series([moments.n, moments.mean if moments.n else np.nan, moments.std,
+                      moments.min if moments.n else np.nan, quartiles[0], quartiles[1],
+                      quartiles[2], moments.max if moments.n else np.nan],
+                     index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'])
@@ -0,0 +1,373 @@
+"""Several dumps of tmdb-movies.csv compared in one pass.
+
+`Snapshots` holds monthly (or any) snapshots of the catalog side by side.
+Each snapshot is cleaned like the notebook and reduced to the columns the
+comparisons need.  Titles, directors and genres are stored as integer codes
+into dictionaries shared by all the snapshots, so a title present in every
+dump is stored once.  Memory therefore grows with the distinct strings plus
+a few numbers per movie and snapshot, not with N copies of the frame.
+
+The rows of all the snapshots are kept together, ordered by snapshot and
+id.  The notebook's metrics are computed for every snapshot at once, each
+with one pass over those rows:
+
+* popularity and revenue ranks;
+* director counts;
+* the most frequent genre of every year;
+* the IQR fences and outliers.
+
+`rank_changes`, `director_changes` and `outlier_changes` compare two
+snapshots by TMDB id.
+"""
+
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .cleaning import CLEAN_RULES, Cleaner
+from .fences import Fences
+from .genres import most_frequent_by_year
+from .loader import COLUMNS, read_csv_typed
+from .multivalue import MultiValueIndex
+from .profiling import stage
+
+# string columns encoded with the shared dictionaries
+STRINGS = ('original_title', 'director', 'genres')
+
+# numeric columns kept per movie and snapshot
+NUMBERS = {'id': np.int64, 'release_year': np.int16,
+           'popularity': np.float64, 'revenue_adj': np.float64}
+
+METRICS = ('popularity', 'revenue_adj')
+
+
+class Snapshots(object):
+    """Cleaned snapshots of the catalog with shared string dictionaries.
+
+    Add snapshots in chronological order with `add`, or build the whole
+    collection with `load`.  Snapshots are addressed by label or by
+    position; negative positions count from the latest.
+    """
+
+    def __init__(self, rules=CLEAN_RULES):
+        self.rules = tuple(rules)
+        self.labels = []
+        self.reports = []
+        self.dictionaries = {name: pd.Index([], dtype=object) for name in STRINGS}
+        self._parts = []
+        self._clear()
+
+    @classmethod
+    def load(cls, paths, labels=None, rules=CLEAN_RULES):
+        """Snapshots of the CSV files `paths`, labelled by file name by default."""
+        snapshots = cls(rules)
+        for number, path in enumerate(paths):
+            snapshots.add(path, None if labels is None else labels[number])
+        return snapshots
+
+    def _clear(self):
+        # everything derived from the rows of all the snapshots
+        self._data = None
+        self._ranks = {}
+        self._indexes = {}
+        self._fences = {}
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __repr__(self):
+        return '<Snapshots {}>'.format(', '.join(map(str, self.labels)))
+
+    def add(self, source, label=None):
+        """Add a snapshot: a CSV path or a frame with an `id` column.
+
+        Movies appearing twice in a snapshot keep their last row.
+        """
+        if label is None:
+            label = (os.path.splitext(os.path.basename(source))[0]
+                     if isinstance(source, str) else 'snapshot {}'.format(len(self)))
+        if label in self.labels:
+            raise ValueError('duplicate snapshot label {!r}'.format(label))
+        with stage('snapshot', None) as record:
+            if isinstance(source, str):
+                source = read_csv_typed(source, ['id'] + COLUMNS, categorical=False)
+            cleaner = Cleaner(self.rules)
+            movies = cleaner(source.drop_duplicates('id', keep='last'))
+            movies = movies.sort_values('id', kind='stable')
+            part = {name: movies[name].to_numpy(dtype=dtype) for name, dtype in NUMBERS.items()}
+            for name in STRINGS:
+                part[name] = self._encode(name, movies[name])
+            record.rows_in, record.rows_out = len(source), len(movies)
+        self.labels.append(label)
+        self.reports.append(cleaner.report)
+        self._parts.append(part)
+        self._clear()
+        return self
+
+    def _encode(self, name, values):
+        # codes into the shared dictionary of `name`, growing it with new strings
+        values = values.astype(object).to_numpy()
+        dictionary = self.dictionaries[name]
+        codes = dictionary.get_indexer(values)
+        unseen = (codes < 0) & pd.notnull(values)
+        if unseen.any():
+            dictionary = dictionary.append(pd.Index(pd.unique(values[unseen]), dtype=object))
+            self.dictionaries[name] = dictionary
+            codes[unseen] = dictionary.get_indexer(values[unseen])
+        return codes.astype(np.int32)
+
+    # the rows of all the snapshots
+
+    @property
+    def data(self):
+        """The columns of all the snapshots, concatenated in snapshot order."""
+        if self._data is None:
+            if not self._parts:
+                raise ValueError('no snapshots')
+            data = {name: np.concatenate([part[name] for part in self._parts])
+                    for name in self._parts[0]}
+            sizes = [len(part['id']) for part in self._parts]
+            data['snapshot'] = np.repeat(np.arange(len(sizes), dtype=np.int32), sizes)
+            self._starts = np.zeros(len(sizes) + 1, dtype=np.int64)
+            np.cumsum(sizes, out=self._starts[1:])
+            self._data = data
+        return self._data
+
+    def _rows(self, position):
+        self.data
+        return slice(self._starts[position], self._starts[position + 1])
+
+    def _position(self, snapshot):
+        if isinstance(snapshot, (int, np.integer)):
+            return range(len(self))[snapshot]
+        return self.labels.index(snapshot)
+
+    def _decode(self, name, codes):
+        return self.dictionaries[name].take(codes, allow_fill=True, fill_value=np.nan)
+
+    def frame(self, snapshot=None):
+        """The movies of one snapshot (all of them if None) as a DataFrame.
+
+        The string columns are categoricals over the shared dictionaries.
+        """
+        data = self.data
+        rows = slice(None) if snapshot is None else self._rows(self._position(snapshot))
+        columns = OrderedDict()
+        columns['snapshot'] = pd.Categorical.from_codes(data['snapshot'][rows],
+                                                        categories=self.labels)
+        columns['id'] = data['id'][rows]
+        for name in STRINGS:
+            columns[name] = pd.Categorical.from_codes(
+                data[name][rows], dtype=pd.CategoricalDtype(self.dictionaries[name]))
+        for name in ('release_year', 'popularity', 'revenue_adj'):
+            columns[name] = data[name][rows]
+        return pd.DataFrame(columns)
+
+    def _index(self, name):
+        # the tokens of `name`, every distinct string split once
+        if name not in self._indexes:
+            categories = pd.Categorical.from_codes(
+                self.data[name], dtype=pd.CategoricalDtype(self.dictionaries[name]))
+            self._indexes[name] = MultiValueIndex.from_series(pd.Series(categories))
+        return self._indexes[name]
+
+    # metrics of every snapshot
+
+    def ranks(self, metric):
+        """Rank of every movie within its snapshot by `metric` (1 is the largest).
+
+        Ties keep id order, like ``nlargest``; the array is aligned with `data`.
+        """
+        if metric not in self._ranks:
+            data = self.data
+            # one sort by (snapshot, descending metric) ranks every snapshot
+            order = np.lexsort((-data[metric], data['snapshot']))
+            ranks = np.empty(len(order), dtype=np.int64)
+            ranks[order] = np.arange(len(order)) - self._starts[data['snapshot'][order]] + 1
+            self._ranks[metric] = ranks
+        return self._ranks[metric]
+
+    def top(self, metric, n=10):
+        """Titles of the `n` movies with the largest `metric`, one column per snapshot."""
+        ranks = self.ranks(metric)
+        picked = np.flatnonzero(ranks <= n)
+        table = np.full((n, len(self)), None, dtype=object)
+        table[ranks[picked] - 1, self.data['snapshot'][picked]] = \
+            self._decode('original_title', self.data['original_title'][picked])
+        return pd.DataFrame(table, index=pd.RangeIndex(1, n + 1, name='rank'),
+                            columns=pd.Index(self.labels, name='snapshot'))
+
+    def director_counts(self):
+        """Director x snapshot movie counts, most movies in the latest snapshot first."""
+        index = self._index('director')
+        cells = self.data['snapshot'][index.rows].astype(np.int64) * index.n_tokens + index.codes
+        counts = np.bincount(cells, minlength=len(self) * index.n_tokens)
+        counts = pd.DataFrame(counts.reshape(len(self), index.n_tokens).T,
+                              index=pd.Index(index.tokens, name='director'),
+                              columns=pd.Index(self.labels, name='snapshot'))
+        return counts.sort_values(list(reversed(self.labels)), ascending=False, kind='stable')
+
+    def genre_year_counts(self):
+        """Year x genre counts of every snapshot, as {label: matrix}.
+
+        Each matrix is ordered like `genres.genre_year_counts` of that snapshot.
+        """
+        index = self._index('genres')
+        years = self.data['release_year'].astype(np.int64)
+        first = years.min()
+        # a single key per (snapshot, year) cell
+        span = years.max() - first + 1
+        counts = index.group_counts(self.data['snapshot'] * span + (years - first))
+        matrices = OrderedDict()
+        for position, label in enumerate(self.labels):
+            keys = counts.index.to_numpy()
+            block = counts[(keys >= position * span) & (keys < (position + 1) * span)]
+            block.index = pd.Index(block.index - position * span + first, name='release_year')
+            block.columns.name = 'genre'
+            block = block.loc[block.sum(axis=1).to_numpy() > 0, block.sum().to_numpy() > 0]
+            matrices[label] = block[block.sum().sort_values(ascending=False, kind='stable').index]
+        return matrices
+
+    def popular_genres(self):
+        """The most frequent genre of every year, one column per snapshot."""
+        return pd.DataFrame(OrderedDict(
+            (label, most_frequent_by_year(counts))
+            for label, counts in self.genre_year_counts().items())).rename_axis(
+                columns='snapshot')
+
+    def _valid(self, metric):
+        # the movies the fences of `metric` are computed from: the notebook
+        # only looks at the revenue of movies with a revenue
+        values = self.data[metric]
+        return values > 0 if metric == 'revenue_adj' else ~np.isnan(values)
+
+    def fences(self, metric, k=1.5):
+        """The IQR fences of `metric` in every snapshot, one row per snapshot."""
+        if (metric, k) not in self._fences:
+            valid = self._valid(metric)
+            quartiles = (pd.Series(self.data[metric][valid])
+                         .groupby(self.data['snapshot'][valid]).quantile([0.25, 0.75])
+                         .unstack().reindex(range(len(self))))
+            q1, q3 = quartiles[0.25].to_numpy(), quartiles[0.75].to_numpy()
+            iqr = q3 - q1
+            self._fences[metric, k] = pd.DataFrame(
+                OrderedDict(zip(Fences._fields, (q1, q3, iqr, q1 - k * iqr, q3 + k * iqr))),
+                index=pd.Index(self.labels, name='snapshot'))
+        return self._fences[metric, k]
+
+    def outliers(self, metric, k=1.5):
+        """Boolean array, True for the outliers of `metric` in their snapshot."""
+        fences = self.fences(metric, k)
+        snapshot = self.data['snapshot']
+        values = self.data[metric]
+        low, high = fences.low.to_numpy()[snapshot], fences.high.to_numpy()[snapshot]
+        return self._valid(metric) & ((values < low) | (values > high))
+
+    def summary(self, k=1.5):
+        """Movies, directors and fences of every snapshot."""
+        data = self.data
+        index = self._index('director')
+        directors = np.unique(data['snapshot'][index.rows].astype(np.int64) * index.n_tokens +
+                              index.codes) // index.n_tokens
+        summary = pd.DataFrame({
+            'movies': np.diff(self._starts),
+            'dropped': [int(report['rows read'] - report['rows kept'])
+                        for report in self.reports],
+            'directors': np.bincount(directors, minlength=len(self)),
+        }, index=pd.Index(self.labels, name='snapshot'))
+        for metric in METRICS:
+            fences = self.fences(metric, k)
+            summary[metric + '_high'] = fences.high
+            summary[metric + '_outliers'] = np.bincount(
+                data['snapshot'][self.outliers(metric, k)], minlength=len(self))
+        return summary
+
+    # comparisons of two snapshots
+
+    def _lookup(self, position, ids):
+        # rows of `ids` in snapshot `position`, -1 where the movie is absent
+        rows = self._rows(position)
+        known = self.data['id'][rows]
+        found = np.minimum(np.searchsorted(known, ids), max(len(known) - 1, 0))
+        present = (known[found] == ids) if len(known) else np.zeros(len(ids), dtype=bool)
+        return np.where(present, found + rows.start, -1)
+
+    def _movies(self, rows, columns):
+        # the movies at `rows` (-1 for none) with the given data columns
+        valid = rows >= 0
+        table = OrderedDict()
+        for name in columns:
+            values = self.data[name][np.where(valid, rows, 0)]
+            if name in STRINGS:
+                values = self._decode(name, np.where(valid, values, -1))
+            else:
+                values = np.where(valid, values, np.nan)
+            table[name] = values
+        return table
+
+    def rank_changes(self, metric, n=10, before=-2, after=-1):
+        """Rank of the top `n` movies of either snapshot in both, by id.
+
+        `change` is positive for movies that moved up; the rank of a movie
+        missing from a snapshot is NaN.
+        """
+        old, new = self._position(before), self._position(after)
+        ranks = self.ranks(metric)
+        ids = np.union1d(*[self.data['id'][self._rows(position)][ranks[self._rows(position)] <= n]
+                           for position in (old, new)])
+        rows_old, rows_new = self._lookup(old, ids), self._lookup(new, ids)
+        title = np.where(rows_new >= 0, rows_new, rows_old)
+        changes = pd.DataFrame(self._movies(title, ['original_title']),
+                               index=pd.Index(ids, name='id'))
+        for name, rows in (('rank_before', rows_old), ('rank_after', rows_new)):
+            changes[name] = np.where(rows >= 0, ranks[np.maximum(rows, 0)], np.nan)
+        changes['change'] = changes.rank_before - changes.rank_after
+        return changes.sort_values(['rank_after', 'rank_before'], kind='stable')
+
+    def director_changes(self, n=10, before=-2, after=-1):
+        """The `n` directors whose number of movies changed most between two snapshots."""
+        counts = self.director_counts()
+        old, new = self.labels[self._position(before)], self.labels[self._position(after)]
+        changes = pd.DataFrame({'before': counts[old], 'after': counts[new]})
+        changes['change'] = changes.after - changes.before
+        changes = changes[changes.change != 0]
+        order = np.argsort(-changes.change.abs().to_numpy(), kind='stable')
+        return changes.iloc[order[:n]]
+
+    def outlier_changes(self, metric, before=-2, after=-1, k=1.5):
+        """Outliers of `metric` that appeared in or left the later snapshot, by id.
+
+        Returns {'new': ..., 'removed': ...}; `present` tells whether the
+        movie is in the other snapshot at all (False for a movie that was
+        added or withdrawn rather than re-ranked).
+        """
+        old, new = self._position(before), self._position(after)
+        outliers = self.outliers(metric, k)
+        result = OrderedDict()
+        for name, here, there in (('new', new, old), ('removed', old, new)):
+            rows = self._rows(here)
+            picked = np.flatnonzero(outliers[rows]) + rows.start
+            other = self._lookup(there, self.data['id'][picked])
+            moved = (other < 0) | ~outliers[np.maximum(other, 0)]
+            picked, other = picked[moved], other[moved]
+            table = pd.DataFrame(self._movies(picked, ['original_title', 'director', metric]),
+                                 index=pd.Index(self.data['id'][picked], name='id'))
+            table['present'] = other >= 0
+            table[metric + '_other'] = np.where(
+                other >= 0, self.data[metric][np.maximum(other, 0)], np.nan)
+            result[name] = table.sort_values(metric, ascending=False, kind='stable')
+        return result
+
+    def report(self, n=10, before=-2, after=-1, k=1.5):
+        """Everything above for two snapshots, as a dict of tables."""
+        result = OrderedDict([('snapshots', self.summary(k))])
+        for metric in METRICS:
+            result['top_' + metric] = self.top(metric, n)
+            result['rank_changes_' + metric] = self.rank_changes(metric, n, before, after)
+            result['outlier_changes_' + metric] = self.outlier_changes(metric, before, after, k)
+        result['director_counts'] = self.director_counts().head(n)
+        result['director_changes'] = self.director_changes(n, before, after)
+        result['popular_genres'] = self.popular_genres()
+        return result
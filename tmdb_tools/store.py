@@ -0,0 +1,202 @@
+"""The cleaned movie table as a memory-mapped columnar store.
+
+`write_store` saves a frame to a directory, one file per array:
+
+* numeric, boolean and datetime columns as ``<column>.npy``;
+* categorical and string columns dictionary encoded, as in
+  `runner.SharedFrame`: ``<column>.codes.npy`` (-1 for missing) plus the
+  distinct values as one UTF-8 blob ``<column>.dictionary.npy`` and their
+  boundaries ``<column>.offsets.npy``;
+* the row labels as ``index.npy`` unless they are a range;
+* ``meta.json`` with the row count, the column kinds and dtypes, and any
+  extra metadata such as the cleaning report.
+
+`MovieStore` opens such a directory by reading ``meta.json`` only, so
+opening takes the same time whatever the size of the table.  Arrays are
+memory-mapped read-only when first used: every process that opens the
+store reads the same pages of the OS page cache, and nothing is parsed or
+copied.  Dictionaries are decoded when first used, once per process and
+column, so the cost grows with the distinct values, not with the rows.
+"""
+
+import json
+import os
+import shutil
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# bump when the layout changes
+STORE_VERSION = 1
+
+
+def _codes_dtype(n_values):
+    # the smallest code dtype, the one pandas picks for a Categorical, so
+    # that the mapped codes are used without conversion
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_values < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _save(directory, name, array):
+    np.save(os.path.join(directory, name + '.npy'), np.ascontiguousarray(array))
+
+
+def _save_strings(directory, name, values):
+    encoded = [str(value).encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    _save(directory, name + '.dictionary', np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    _save(directory, name + '.offsets', offsets)
+
+
+def _column_meta(directory, name, series):
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories = dtype.categories
+        _save(directory, name + '.codes',
+              series.cat.codes.to_numpy().astype(_codes_dtype(len(categories))))
+        _save_strings(directory, name, categories)
+        return {'name': name, 'kind': 'categorical', 'dtype': str(categories.dtype)}
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biufmM':
+        _save(directory, name, series.to_numpy())
+        return {'name': name, 'kind': 'numeric', 'dtype': dtype.str}
+    if not (dtype == object or isinstance(dtype, pd.StringDtype)):
+        raise ValueError('cannot store column {!r} of dtype {}'.format(name, dtype))
+    codes, uniques = pd.factorize(series)
+    _save(directory, name + '.codes', codes.astype(_codes_dtype(len(uniques))))
+    _save_strings(directory, name, uniques)
+    return {'name': name, 'kind': 'string', 'dtype': str(dtype)}
+
+
+def write_store(frame, directory, meta=None):
+    """Write `frame` to the store `directory`, replacing any earlier store.
+
+    `meta` (JSON-serializable) is kept in ``meta.json`` and returned by
+    `MovieStore.meta`.  The store is written next to `directory` and
+    moved in place at the end, so readers never see a partial store, and
+    an earlier store is only deleted once the new one is in place.
+    """
+    partial = directory.rstrip(os.sep) + '.partial'
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+    index = frame.index
+    if isinstance(index, pd.RangeIndex):
+        index_meta = {'kind': 'range', 'start': index.start, 'stop': index.stop,
+                      'step': index.step, 'name': index.name}
+    else:
+        _save(partial, 'index', index.to_numpy())
+        index_meta = {'kind': 'array', 'name': index.name}
+    description = OrderedDict([
+        ('version', STORE_VERSION),
+        ('rows', len(frame)),
+        ('index', index_meta),
+        ('columns', [_column_meta(partial, name, frame[name]) for name in frame.columns]),
+        ('meta', meta or {}),
+    ])
+    with open(os.path.join(partial, 'meta.json'), 'w') as f:
+        json.dump(description, f, indent=1)
+    # a directory cannot replace a non-empty one: move the old store aside
+    # first, so that `directory` holds one of the two stores at any time
+    # but for the instant between the two renames
+    old = directory.rstrip(os.sep) + '.old'
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(directory):
+        os.replace(directory, old)
+    os.replace(partial, directory)
+    shutil.rmtree(old, ignore_errors=True)
+    return directory
+
+
+class MovieStore(object):
+    """A store written by `write_store`, opened without reading its arrays.
+
+    ``store.frame()`` is a DataFrame over the mapped arrays;
+    ``store.array(name)`` and ``store.column(name)`` give single columns.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json')) as f:
+            description = json.load(f, object_pairs_hook=OrderedDict)
+        if description['version'] != STORE_VERSION:
+            raise ValueError('{} has store version {}, expected {}'.format(
+                directory, description['version'], STORE_VERSION))
+        self.rows = description['rows']
+        self.meta = description['meta']
+        self._index = description['index']
+        self._columns = OrderedDict((column['name'], column)
+                                    for column in description['columns'])
+        self._arrays = {}
+        self._dictionaries = {}
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def __len__(self):
+        return self.rows
+
+    def __repr__(self):
+        return '<MovieStore {} rows, {} columns in {}>'.format(
+            self.rows, len(self._columns), self.directory)
+
+    def _map(self, name):
+        if name not in self._arrays:
+            array = np.load(os.path.join(self.directory, name + '.npy'), mmap_mode='r')
+            # a plain ndarray over the same pages, so pandas does not keep the subclass
+            array = array.view(np.ndarray)
+            per_row = not name.endswith(('.dictionary', '.offsets'))
+            if per_row and len(array) != self.rows:
+                raise ValueError('{}.npy has {} rows, expected {}'.format(name, len(array),
+                                                                          self.rows))
+            self._arrays[name] = array
+        return self._arrays[name]
+
+    def array(self, name):
+        """The values of a numeric column, or the codes of a dictionary-encoded one."""
+        column = self._columns[name]
+        return self._map(name if column['kind'] == 'numeric' else name + '.codes')
+
+    def dictionary(self, name):
+        """The distinct values of a dictionary-encoded column, decoded once."""
+        if name not in self._dictionaries:
+            data = self._map(name + '.dictionary').tobytes()
+            offsets = self._map(name + '.offsets')
+            values = [data[offsets[i]:offsets[i + 1]].decode('utf-8')
+                      for i in range(len(offsets) - 1)]
+            self._dictionaries[name] = pd.Index(values, dtype=self._columns[name]['dtype'])
+        return self._dictionaries[name]
+
+    @property
+    def index(self):
+        meta = self._index
+        if meta['kind'] == 'range':
+            return pd.RangeIndex(meta['start'], meta['stop'], meta['step'], name=meta['name'])
+        return pd.Index(self._map('index'), name=meta['name'], copy=False)
+
+    def column(self, name, categorical=True):
+        """One column as an array or Categorical over the mapped data.
+
+        String columns come back as categoricals over their dictionary;
+        with ``categorical=False`` they are decoded to their original
+        dtype, which materializes one string per row.
+        """
+        column = self._columns[name]
+        if column['kind'] == 'numeric':
+            return self._map(name)
+        codes = self._map(name + '.codes')
+        dictionary = self.dictionary(name)
+        if column['kind'] == 'string' and not categorical:
+            values = np.append(dictionary.to_numpy(dtype=object), np.nan)
+            # code -1 (missing) picks the trailing NaN
+            return pd.array(values[codes], dtype=column['dtype'])
+        return pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(dictionary))
+
+    def frame(self, columns=None, categorical=True):
+        """A DataFrame over the mapped arrays (read-only); see `column`."""
+        names = self.columns if columns is None else list(columns)
+        data = OrderedDict((name, self.column(name, categorical)) for name in names)
+        return pd.DataFrame(data, index=self.index, copy=False)
@@ -0,0 +1,174 @@
+"""Out-of-core execution of the notebook's analysis.
+
+The CSV is read in chunks.  Each chunk is cleaned with the Clean rules and
+folded into mergeable aggregates: counts per release year, per director
+and per (year, genre), quantile sketches and exact moments of popularity
+and of the reported revenue, and bounded top-k selections.  Memory is
+bounded by the number of distinct years, directors and genres, not by the
+number of movies, and the answers to questions 1-10 come out of `result`.
+
+Two `StreamingAnalysis` objects fed with different chunks can be merged,
+so a catalog can also be summarized in parallel.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .analysis import DIRECTOR_SEP
+from .cleaning import CLEAN_RULES, Cleaner
+from .fences import sketch_fences
+from .genres import genre_distribution, genre_year_counts, most_frequent_by_year
+from .loader import COLUMNS, DTYPES, read_csv_typed
+from .sketches import CoMoments, KLLSketch, Moments, describe
+from .topk import ranked_counts
+
+
+def _add_counts(total, counts):
+    if total is None:
+        return counts
+    if isinstance(counts, pd.DataFrame):
+        # a (year, genre) cell missing on both sides is not filled by `add`
+        total, counts = total.align(counts, join='outer', fill_value=0)
+    return total.add(counts, fill_value=0).astype('int64')
+
+
+def _nothing(name):
+    # the aggregate `name` of an analysis that saw no rows
+    if name == 'top':
+        return pd.DataFrame({column: pd.Series(dtype=DTYPES.get(column, object))
+                             for column in COLUMNS})
+    if name == 'genre_counts':
+        return pd.DataFrame(dtype='int64')
+    return pd.Series(dtype='int64')
+
+
+class StreamingAnalysis(object):
+    """Mergeable aggregates of the cleaned movie table.
+
+    `k` bounds the top-k selections (the notebook uses up to 100) and
+    `sketch_k` the size, hence the accuracy, of the quantile sketches.
+    """
+
+    def __init__(self, rules=CLEAN_RULES, k=100, sketch_k=200, seed=None):
+        self.cleaner = Cleaner(rules)
+        self.k = k
+        self.year_counts = None
+        self.director_counts = None
+        self.genre_counts = None
+        self.top = {'popularity': None, 'revenue_adj': None}
+        self.popularity = Moments()
+        self.revenue = Moments()
+        self.popularity_sketch = KLLSketch(sketch_k, seed=seed)
+        self.revenue_sketch = KLLSketch(sketch_k, seed=seed)
+        self.revenue_zero = 0
+        self.correlation = CoMoments()
+
+    def _top(self, current, chunk, column):
+        if current is not None:
+            chunk = pd.concat([current, chunk])
+        return chunk.nlargest(self.k, column)
+
+    def update(self, chunk):
+        """Clean `chunk` and fold it into the aggregates."""
+        chunk = self.cleaner(chunk)
+        if not len(chunk):
+            return self
+
+        self.year_counts = _add_counts(self.year_counts, chunk.release_year.value_counts())
+        self.director_counts = _add_counts(self.director_counts,
+                                           ranked_counts(chunk.director, DIRECTOR_SEP))
+        self.genre_counts = _add_counts(self.genre_counts, genre_year_counts(chunk))
+        for column in self.top:
+            self.top[column] = self._top(self.top[column], chunk.nlargest(self.k, column),
+                                         column)
+
+        popularity = chunk.popularity.to_numpy(dtype=float)
+        revenue = chunk.revenue_adj.to_numpy(dtype=float)
+        reported = revenue > 0
+        self.popularity.update(popularity)
+        self.popularity_sketch.update(popularity)
+        self.revenue.update(revenue[reported])
+        self.revenue_sketch.update(revenue[reported])
+        self.revenue_zero += int(np.count_nonzero(revenue == 0))
+        self.correlation.update(popularity[reported], revenue[reported])
+        return self
+
+    def merge(self, other):
+        """Fold the aggregates of `other` into this analysis."""
+        self.cleaner.rows_in += other.cleaner.rows_in
+        self.cleaner.rows_out += other.cleaner.rows_out
+        self.cleaner.dropped += other.cleaner.dropped
+        for name in ('year_counts', 'director_counts', 'genre_counts'):
+            theirs = getattr(other, name)
+            if theirs is not None:
+                setattr(self, name, _add_counts(getattr(self, name), theirs))
+        for column, rows in other.top.items():
+            if rows is not None:
+                self.top[column] = self._top(self.top[column], rows, column)
+        self.popularity.merge(other.popularity)
+        self.revenue.merge(other.revenue)
+        self.popularity_sketch.merge(other.popularity_sketch)
+        self.revenue_sketch.merge(other.revenue_sketch)
+        self.revenue_zero += other.revenue_zero
+        self.correlation.merge(other.correlation)
+        return self
+
+    def _outlier_counts(self, sketch, fences):
+        # estimated from the ranks of the fences in the sketch
+        below = sketch.rank(fences.low, strict=True)
+        above = sketch.n - sketch.rank(fences.high)
+        return {'regular': int(round(sketch.n - below - above)),
+                'outlier': int(round(below + above))}
+
+    def result(self):
+        """Answers to the notebook's questions as a dict.
+
+        Counts, top-k lists and moments are exact; quartiles, fences and
+        the regular/outlier counts derived from them are sketch estimates.
+        """
+        top_pop, top_rev = (rows if rows is not None else _nothing('top')
+                            for rows in (self.top['popularity'], self.top['revenue_adj']))
+        year_counts, director_counts, genre_counts = (
+            getattr(self, name) if getattr(self, name) is not None else _nothing(name)
+            for name in ('year_counts', 'director_counts', 'genre_counts'))
+        pop_fences = sketch_fences(self.popularity_sketch)
+        rev_fences = sketch_fences(self.revenue_sketch)
+        directors = director_counts.sort_values(ascending=False, kind='stable')
+        genre_counts = genre_counts[genre_distribution(genre_counts).index]
+        return {
+            'clean': self.cleaner.report,
+            # 1-3. popularity, the most popular movies and their directors
+            'popularity': describe(self.popularity, self.popularity_sketch),
+            'popularity_fences': pop_fences,
+            'popularity_split': self._outlier_counts(self.popularity_sketch, pop_fences),
+            'top_popular': top_pop.head(10),
+            'top_popular_summary': top_pop.head(10).describe(include='number'),
+            'popular_directors': ranked_counts(top_pop.head(100).director, DIRECTOR_SEP)[:10],
+            # 4-6. revenue, the top-grossing movies and their directors
+            'revenue_zero': self.revenue_zero,
+            'revenue': describe(self.revenue, self.revenue_sketch),
+            'revenue_fences': rev_fences,
+            'revenue_split': self._outlier_counts(self.revenue_sketch, rev_fences),
+            'top_grossing': top_rev.head(10),
+            'top_grossing_summary': top_rev.head(50).describe(include='number'),
+            'grossing_directors': ranked_counts(top_rev.head(100).director, DIRECTOR_SEP)[:10],
+            # 7. popularity versus revenue
+            'popularity_revenue_pearson': self.correlation.pearson,
+            # 8. productive directors
+            'director_counts': directors[:10],
+            'director_counts_summary': directors.describe(),
+            # 9. yearly production
+            'year_counts': year_counts.sort_values(ascending=False, kind='stable'),
+            # 10. genres over the years
+            'pop_gen': {str(year): genre for year, genre in
+                        most_frequent_by_year(genre_counts).items()},
+            'genre_distribution': genre_distribution(genre_counts),
+        }
+
+
+def run_streaming(path, chunksize=100000, columns=COLUMNS, **options):
+    """Analyse the CSV at `path` chunk by chunk and return `result()`."""
+    analysis = StreamingAnalysis(**options)
+    for chunk in read_csv_typed(path, columns, chunksize=chunksize, categorical=False):
+        analysis.update(chunk)
+    return analysis.result()
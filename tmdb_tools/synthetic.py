@@ -0,0 +1,225 @@
+"""Synthetic movie tables shaped like tmdb-movies.csv.
+
+`movies` returns a frame with the 21 columns of the real file, in the same
+order and formats, and `write_csv` streams any number of rows to disk in
+chunks (50M rows take a few GB of CSV but never more than one chunk in
+memory).  The distributions follow the real data where the analysis is
+sensitive to them:
+
+* popularity is heavy tailed (Lomax), with a few very popular movies;
+* about half of the ``revenue_adj`` and ``budget_adj`` values are zero,
+  the rest are lognormal;
+* release years run from 1960 to 2015, more movies in later years, and
+  ``release_date`` is written as m/d/yy;
+* genres (1-5 of the 20 TMDB genres), cast, keywords and production
+  companies are pipe-delimited, drawn from skewed pools; a few movies have
+  two directors;
+* cast, director, genres and the other sparse columns are missing at the
+  rates of the real file.
+
+Every column is drawn from its own random stream derived from the seed and
+the chunk number, so asking for a subset of the columns gives the same
+values as the full table.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# column order of tmdb-movies.csv
+SCHEMA = ['id', 'imdb_id', 'popularity', 'budget', 'revenue', 'original_title', 'cast',
+          'homepage', 'director', 'tagline', 'keywords', 'overview', 'runtime', 'genres',
+          'production_companies', 'release_date', 'vote_count', 'vote_average',
+          'release_year', 'budget_adj', 'revenue_adj']
+
+# TMDB genres and their relative frequencies in the real file
+GENRES = OrderedDict([
+    ('Drama', 4761), ('Comedy', 3793), ('Thriller', 2908), ('Action', 2385),
+    ('Romance', 1712), ('Horror', 1637), ('Adventure', 1471), ('Crime', 1355),
+    ('Family', 1231), ('Science Fiction', 1230), ('Fantasy', 916), ('Mystery', 810),
+    ('Animation', 699), ('Documentary', 520), ('Music', 408), ('History', 334),
+    ('War', 270), ('Foreign', 188), ('TV Movie', 167), ('Western', 165),
+])
+
+# share of missing values per column in the real file
+MISSING = {'cast': 0.007, 'homepage': 0.73, 'director': 0.004, 'tagline': 0.26,
+           'keywords': 0.14, 'overview': 0.0004, 'genres': 0.002,
+           'production_companies': 0.095}
+
+FIRST_YEAR, LAST_YEAR = 1960, 2015
+
+CHUNKSIZE = 500000
+
+
+def _join(tokens, lengths, sep='|'):
+    # '|'-join the first lengths[i] tokens of every row
+    joined = pd.Series(tokens[:, 0], dtype=object)
+    for j in range(1, tokens.shape[1]):
+        more = lengths > j
+        joined[more] = joined[more] + sep + tokens[more, j]
+    return joined.to_numpy()
+
+
+def _names(prefix, picks):
+    return np.char.add(prefix, picks.astype(str)).astype(object)
+
+
+def _skewed(rng, size, pool):
+    # indexes into a pool of `pool` names, low indexes much more frequent;
+    # the few draws past the pool wrap around rather than all landing on
+    # its last name
+    return (rng.pareto(1.1, size) * pool / 20).astype(np.int64) % pool
+
+
+class _Chunk(object):
+    """The columns of one chunk, drawn on demand."""
+
+    def __init__(self, start, n, total, seed, number):
+        self.start, self.n, self.total = start, n, total
+        streams = np.random.SeedSequence([seed, number]).spawn(len(SCHEMA))
+        self.rngs = {name: np.random.default_rng(stream)
+                     for name, stream in zip(SCHEMA, streams)}
+        self.columns = {}
+
+    def __getitem__(self, name):
+        if name not in self.columns:
+            values = getattr(self, '_' + name)(self.rngs[name])
+            if name in MISSING:
+                values = np.array(values, dtype=object)
+                values[self.rngs[name].random(self.n) < MISSING[name]] = np.nan
+            self.columns[name] = values
+        return self.columns[name]
+
+    def _ids(self):
+        return np.arange(self.start, self.start + self.n, dtype=np.int64)
+
+    def _pool(self, ratio, minimum=100):
+        return max(minimum, int(self.total * ratio))
+
+    def _id(self, rng):
+        return self._ids()
+
+    def _imdb_id(self, rng):
+        return np.char.add('tt', np.char.zfill(self._ids().astype(str), 7)).astype(object)
+
+    def _popularity(self, rng):
+        return rng.pareto(3.0, self.n) * 1.3 + 0.001
+
+    def _money_adj(self, rng, zero, mean, sigma):
+        values = rng.lognormal(mean, sigma, self.n)
+        values[rng.random(self.n) < zero] = 0.0
+        return values
+
+    def _budget_adj(self, rng):
+        return self._money_adj(rng, 0.52, 17.0, 1.2)
+
+    def _revenue_adj(self, rng):
+        return self._money_adj(rng, 0.5, 17.5, 1.8)
+
+    def _inflation(self):
+        # price level relative to 2010, roughly 4% a year
+        return 1.04 ** (self['release_year'].astype(float) - 2010)
+
+    def _budget(self, rng):
+        return np.round(self['budget_adj'] * self._inflation()).astype(np.int64)
+
+    def _revenue(self, rng):
+        return np.round(self['revenue_adj'] * self._inflation()).astype(np.int64)
+
+    def _original_title(self, rng):
+        # about 5% of the titles are reused by another movie
+        ids = self._ids()
+        reused = rng.random(self.n) < 0.05
+        ids[reused] = rng.integers(0, max(self.start + self.n, 1), reused.sum())
+        return np.char.add('Movie ', ids.astype(str)).astype(object)
+
+    def _cast(self, rng):
+        pool = self._pool(1.5)
+        return _join(_names('Actor ', _skewed(rng, (self.n, 5), pool)),
+                     rng.integers(1, 6, self.n))
+
+    def _homepage(self, rng):
+        return np.char.add(np.char.add('http://www.movie', self._ids().astype(str)),
+                           '.com').astype(object)
+
+    def _director(self, rng):
+        pool = self._pool(0.5)
+        # about 2% of the movies have two directors
+        return _join(_names('Director ', _skewed(rng, (self.n, 2), pool)),
+                     np.where(rng.random(self.n) < 0.02, 2, 1))
+
+    def _tagline(self, rng):
+        return np.char.add('Tagline of movie ', self._ids().astype(str)).astype(object)
+
+    def _keywords(self, rng):
+        pool = self._pool(0.75)
+        return _join(_names('keyword ', _skewed(rng, (self.n, 5), pool)),
+                     rng.integers(1, 6, self.n))
+
+    def _overview(self, rng):
+        return np.char.add('Overview of movie ', self._ids().astype(str)).astype(object)
+
+    def _runtime(self, rng):
+        runtime = np.clip(rng.normal(102, 20, self.n), 3, 900).round()
+        runtime[rng.random(self.n) < 0.003] = 0
+        return runtime.astype(np.int64)
+
+    def _genres(self, rng):
+        names = np.array(list(GENRES), dtype=object)
+        weights = np.array(list(GENRES.values()), dtype=float)
+        # weighted sampling without replacement: the smallest exponential
+        # keys scaled by the weights (Efraimidis-Spirakis)
+        keys = rng.exponential(size=(self.n, len(names))).astype(np.float32) / weights
+        picks = np.argsort(keys, axis=1)[:, :5]
+        lengths = rng.choice(np.arange(1, 6), self.n, p=[0.21, 0.36, 0.29, 0.11, 0.03])
+        return _join(names[picks], lengths)
+
+    def _production_companies(self, rng):
+        pool = self._pool(0.4)
+        return _join(_names('Company ', _skewed(rng, (self.n, 3), pool)),
+                     rng.integers(1, 4, self.n))
+
+    def _release_date(self, rng):
+        # every month has a 28th; the year is written with two digits
+        parts = [rng.integers(1, 13, self.n).astype(str), rng.integers(1, 29, self.n).astype(str),
+                 np.char.zfill((self['release_year'] % 100).astype(str), 2)]
+        return _join(np.column_stack(parts).astype(object), np.full(self.n, 3), sep='/')
+
+    def _vote_count(self, rng):
+        return np.maximum(10, rng.lognormal(3.5, 1.6, self.n)).astype(np.int64)
+
+    def _vote_average(self, rng):
+        return np.clip(rng.normal(5.97, 0.93, self.n), 1.5, 9.2).round(1)
+
+    def _release_year(self, rng):
+        years = np.arange(FIRST_YEAR, LAST_YEAR + 1)
+        weights = np.exp(0.05 * (years - FIRST_YEAR))
+        return rng.choice(years, self.n, p=weights / weights.sum()).astype(np.int64)
+
+
+def chunks(n, seed=0, columns=None, chunksize=CHUNKSIZE):
+    """Yield the table of `n` movies as frames of at most `chunksize` rows."""
+    columns = list(SCHEMA if columns is None else columns)
+    unknown = sorted(set(columns) - set(SCHEMA))
+    if unknown:
+        raise ValueError('unknown columns: {}'.format(', '.join(unknown)))
+    for number, start in enumerate(range(0, n, chunksize)):
+        chunk = _Chunk(start, min(chunksize, n - start), n, seed, number)
+        yield pd.DataFrame(OrderedDict((name, chunk[name]) for name in columns),
+                           index=pd.RangeIndex(start, start + chunk.n))
+
+
+def movies(n, seed=0, columns=None, chunksize=CHUNKSIZE):
+    """A synthetic movie table of `n` rows (`columns` defaults to all)."""
+    frames = list(chunks(n, seed, columns, chunksize))
+    if not frames:
+        return pd.DataFrame(columns=list(SCHEMA if columns is None else columns))
+    return pd.concat(frames) if len(frames) > 1 else frames[0]
+
+
+def write_csv(path, n, seed=0, chunksize=CHUNKSIZE):
+    """Write `n` synthetic movies to `path`, one chunk at a time."""
+    for number, frame in enumerate(chunks(n, seed, chunksize=chunksize)):
+        frame.to_csv(path, mode='w' if number == 0 else 'a', header=number == 0, index=False)
+    return path
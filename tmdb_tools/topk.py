@@ -0,0 +1,125 @@
+"""Leaderboards served from one partial selection per metric.
+
+``dataset.sort_values(by=metric, ascending=False).head(n)`` sorts the whole
+frame for every list.  A `TopK` selects the `k` largest rows once with
+``nlargest`` (a partial selection, linear in the number of rows) and serves
+every shorter head, and the summaries of those heads, from that selection.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .multivalue import MultiValueIndex
+from .profiling import stage
+
+
+def ranked_counts(values, sep=None):
+    """Value counts of `values`, most frequent first, ties in order of first appearance.
+
+    ``Series.value_counts`` breaks ties by category order on a categorical
+    column and by first appearance otherwise, so a ranking would change
+    with the dtype; this one does not.  Missing values are not counted.
+    With `sep`, values are split on it and every part is counted, as a
+    movie of ``'A|B'`` counts for both directors (see `MultiValueIndex`).
+    """
+    if sep is not None:
+        index = MultiValueIndex.from_series(
+            values if isinstance(values, pd.Series) else pd.Series(values, dtype=object), sep)
+        codes, uniques = index.codes, index.tokens
+    else:
+        codes, uniques = pd.factorize(values)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    order = np.argsort(-counts, kind='stable')
+    index = pd.Index(np.asarray(uniques, dtype=object)[order], name=getattr(values, 'name', None))
+    return pd.Series(counts[order], index=index, name='count')
+
+
+class TopK(object):
+    """The `k` rows of `frame` with the largest `column`, largest first.
+
+    Ties keep the order of the rows in `frame`.  Summaries are cached per
+    head length, so refreshing a dashboard costs nothing until a new
+    `TopK` is built on new data.
+    """
+
+    def __init__(self, frame, column, k=100):
+        self.column = column
+        self.k = k
+        with stage('top', len(frame)) as record:
+            self.rows = frame.nlargest(k, column)
+            record.rows_out = len(self.rows)
+        self._cache = {}
+
+    def _check(self, n):
+        if n > self.k:
+            raise ValueError('only the top {} rows by {!r} were selected, not {}'
+                             .format(self.k, self.column, n))
+
+    def head(self, n=10):
+        """The `n` rows with the largest values."""
+        self._check(n)
+        return self.rows.iloc[:n]
+
+    def describe(self, n=10):
+        """``describe()`` of the top `n` rows."""
+        self._check(n)
+        key = ('describe', n)
+        if key not in self._cache:
+            self._cache[key] = self.rows.iloc[:n].describe(include='number')
+        return self._cache[key]
+
+    def value_counts(self, by, n=None, sep=None):
+        """Value counts of column `by` among the top `n` rows (default `k`).
+
+        Values that do not occur in the head are left out, also for
+        categorical columns; ties keep the order of the rows.  With `sep`
+        the values are split first (see `ranked_counts`).
+        """
+        n = self.k if n is None else n
+        self._check(n)
+        key = ('value_counts', by, n, sep)
+        if key not in self._cache:
+            self._cache[key] = ranked_counts(self.rows[by].iloc[:n], sep)
+        return self._cache[key]
+
+
+class Leaderboard(object):
+    """Lazily built `TopK` selections of one frame, one per metric.
+
+    ``board.top('popularity', 10)`` selects the largest `k` rows by
+    popularity on first use; any later head of length up to `k` is read
+    from that selection.  Asking for more than `k` rows reselects with the
+    larger `k`.
+    """
+
+    def __init__(self, frame, k=100):
+        self.frame = frame
+        self.k = k
+        self._tops = {}
+
+    def __getitem__(self, column):
+        return self.selection(column)
+
+    def selection(self, column, n=None):
+        """The `TopK` of `column`, covering at least `n` rows."""
+        top = self._tops.get(column)
+        if top is None or (n is not None and n > top.k):
+            top = TopK(self.frame, column, max(self.k, n or 0))
+            self._tops[column] = top
+        return top
+
+    def top(self, column, n=10):
+        """The `n` rows with the largest `column`."""
+        return self.selection(column, n).head(n)
+
+    def describe(self, column, n=10):
+        """``describe()`` of the top `n` rows by `column`."""
+        return self.selection(column, n).describe(n)
+
+    def value_counts(self, column, by, n=None, sep=None):
+        """Value counts of `by` among the top `n` rows by `column`."""
+        return self.selection(column, n).value_counts(by, n, sep)
+
+    def metrics(self):
+        """Metrics selected so far."""
+        return pd.Index(list(self._tops), name='metric')
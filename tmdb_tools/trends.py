@@ -0,0 +1,142 @@
+"""Rolling per-genre trends over release years.
+
+The conclusions of the notebook ask whether a genre is getting more and
+more popular.  `GenreTrends` answers that over rolling windows of any
+number of years: per genre, the number of movies, their share of the
+movies of the window, and their mean popularity and ``revenue_adj``.
+
+The genre column is parsed once and the year x genre matrices of counts
+and sums are built with one bincount each.  Their cumulative sums over the
+years are kept, so the totals of every window of `size` years are the
+difference of two rows, ``cumulative[end] - cumulative[end - size]``, for
+all windows and genres at once; changing the window size never goes back
+to the movies.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .multivalue import MultiValueIndex
+from .profiling import stage
+
+# the statistics of a window, each a window x genre frame
+Window = namedtuple('Window', 'count share popularity revenue_adj')
+
+
+class GenreTrends(object):
+    """Per-genre statistics of `dataset` over rolling windows of years.
+
+    Years without movies inside the range of the dataset count as empty
+    years, so a window of `size` always spans `size` calendar years.
+    ``revenue_adj`` is averaged over the movies with a positive revenue,
+    as in the revenue section of the notebook.  Pass the `MultiValueIndex`
+    of the genre column as `index` to reuse an already parsed column.
+    """
+
+    def __init__(self, dataset, year='release_year', column='genres', sep='|', index=None):
+        with stage('trends', len(dataset)):
+            self._build(dataset, year, column, sep, index)
+
+    def _build(self, dataset, year, column, sep, index):
+        if index is None:
+            index = MultiValueIndex.from_series(dataset[column], sep=sep)
+        years = dataset[year].to_numpy(dtype=np.int64)
+        self.years = pd.RangeIndex(years.min(), years.max() + 1, name=year)
+        revenue = dataset.revenue_adj.to_numpy(dtype=float)
+        earning = revenue > 0
+
+        def matrix(frame):
+            # dense over every year of the range, genres in code order
+            return frame.reindex(self.years, fill_value=0).to_numpy(dtype=float)
+
+        totals = {
+            'count': matrix(index.group_counts(years)),
+            'popularity': matrix(index.group_sums(years, dataset.popularity)),
+            'revenue_adj': matrix(index.group_sums(years, np.where(earning, revenue, 0.0))),
+            'earning': matrix(index.group_sums(years, earning)),
+        }
+        # movies with at least one genre per year, the denominator of the shares
+        counted = index.lengths > 0
+        movies = np.bincount(years[counted] - self.years.start, minlength=len(self.years))
+        totals['movies'] = movies[:, None].astype(float)
+
+        # cumulative sums with a leading row of zeros: the totals of years
+        # [i, j) are cumulative[j] - cumulative[i]
+        self._cumulative = {}
+        for name, values in totals.items():
+            cumulative = np.zeros((len(values) + 1, values.shape[1]))
+            np.cumsum(values, axis=0, out=cumulative[1:])
+            self._cumulative[name] = cumulative
+
+        # genres from the most to the least frequent, as in `genre_year_counts`
+        overall = self._cumulative['count'][-1]
+        self._order = np.argsort(-overall, kind='stable')
+        self._order = self._order[overall[self._order] > 0]
+        self.genres = pd.Index(index.tokens.take(self._order), name='genre')
+        self._windows = {}
+
+    def __repr__(self):
+        return '<GenreTrends {} genres, {}-{}>'.format(len(self.genres), self.years[0],
+                                                       self.years[-1])
+
+    def _totals(self, name, size):
+        cumulative = self._cumulative[name]
+        return cumulative[size:] - cumulative[:-size]
+
+    def window(self, size):
+        """The statistics of every window of `size` years, as a `Window`.
+
+        Windows are labelled by their last year, from the first year with
+        a full window to the last year of the dataset.  Means of genres
+        without movies in a window are NaN.
+        """
+        size = int(size)
+        if not 1 <= size <= len(self.years):
+            raise ValueError('size must be between 1 and {}, got {}'
+                             .format(len(self.years), size))
+        if size not in self._windows:
+            labels = pd.Index(self.years[size - 1:], name=self.years.name)
+            count = self._totals('count', size)[:, self._order]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                share = count / self._totals('movies', size)
+                popularity = self._totals('popularity', size)[:, self._order] / count
+                revenue = (self._totals('revenue_adj', size)[:, self._order] /
+                           self._totals('earning', size)[:, self._order])
+            frames = [pd.DataFrame(values, index=labels, columns=self.genres)
+                      for values in (count, share, popularity, revenue)]
+            frames[0] = frames[0].astype(np.int64)
+            self._windows[size] = Window(*frames)
+        return self._windows[size]
+
+    def ranks(self, size, by='count'):
+        """Rank of every genre in every window by statistic `by` (1 is the largest)."""
+        return getattr(self.window(size), by).rank(axis=1, ascending=False, method='min')
+
+    def leaders(self, size, by='count'):
+        """The genre with the largest `by` in every window.
+
+        Ties go to the genre that is more frequent overall.
+        """
+        values = getattr(self.window(size), by)
+        return values.fillna(-np.inf).idxmax(axis=1).rename('genre')
+
+    def slopes(self, size, by='share'):
+        """Least-squares slope of `by` per year over the windows, steepest rise first.
+
+        A positive slope means the genre gained over the windows of `size`
+        years; windows where `by` is undefined are left out of the fit.
+        """
+        values = getattr(self.window(size), by)
+        x = np.broadcast_to(values.index.to_numpy(dtype=float)[:, None], values.shape)
+        y = values.to_numpy(dtype=float)
+        valid = ~np.isnan(y)
+        n = valid.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            x_mean = np.where(valid, x, 0).sum(axis=0) / n
+            y_mean = np.where(valid, y, 0).sum(axis=0) / n
+            dx = np.where(valid, x - x_mean, 0)
+            slope = (dx * np.where(valid, y - y_mean, 0)).sum(axis=0) / (dx ** 2).sum(axis=0)
+        return (pd.Series(slope, index=self.genres, name='slope')
+                .sort_values(ascending=False, kind='stable'))